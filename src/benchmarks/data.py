@@ -0,0 +1,179 @@
+import random
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+
+'''
+    Gerador de dados sintéticos para as seis coleções da aplicação (users, plans, workouts, exercises,
+    plan_workouts e user_plans), com referências consistentes entre si: ids de referência como string
+    (como gravados pelas rotas) e plans_sold/purchased_plans dos usuários como ObjectId, derivados das
+    compras confirmadas.
+    A escala é a quantidade total aproximada de documentos, distribuída pelas proporções de SHARES.
+    A geração é determinística para uma mesma escala e semente.
+'''
+
+# Proporção da escala total gerada em cada coleção
+SHARES = {
+    "users": 0.10,
+    "plans": 0.05,
+    "workouts": 0.10,
+    "exercises": 0.40,
+    "plan_workouts": 0.20,
+    "user_plans": 0.15,
+}
+
+# Fração dos usuários que vendem planos e das compras confirmadas
+SELLERS_SHARE = 0.2
+PURCHASED_SHARE = 0.7
+
+# Quantidade de documentos por insert_many
+BATCH_SIZE = 10000
+
+# Quantidade de ids de cada coleção guardada para a carga de trabalho
+SAMPLE_SIZE = 1000
+
+TYPES = ["Mensal", "Trimestral", "Semestral", "Anual"]
+CATEGORIES = ["Fitness", "Musculação", "Funcional", "Cardio", "Mobilidade", "Crossfit"]
+WORKOUT_TYPES = ["Força", "Resistência", "Hipertrofia", "Aeróbico"]
+SUBJECTS = ["Treino", "Hipertrofia", "Emagrecimento", "Força", "Condicionamento", "Iniciante", "Avançado", "Definição"]
+EXERCISES = ["Supino", "Agachamento", "Levantamento terra", "Remada", "Desenvolvimento", "Rosca direta", "Tríceps testa", "Prancha", "Burpee", "Afundo"]
+
+# Quantidade de documentos de uma coleção na escala informada
+def collection_size(scale, collection):
+    return max(1, int(scale * SHARES[collection]))
+
+def title(rng, prefix, index):
+    return f"{prefix} {rng.choice(SUBJECTS)} {rng.choice(SUBJECTS).lower()} {index}"
+
+def make_user(index, plans_sold, purchased_plans, created_at):
+    return {
+        "_id": ObjectId(),
+        "name": f"Usuário {index:08d}",
+        "email": f"usuario{index}@example.com",
+        "password": "SenhaSegura123",
+        "cpf": f"{index:011d}",
+        "phone_number": "11987654321",
+        "address": {"cep": "01001000", "street": "Avenida Paulista", "number": "1000", "neighborhood": "Bela Vista", "city": "São Paulo", "state": "SP"},
+        "plans_sold": plans_sold,
+        "purchased_plans": purchased_plans,
+        "created_at": created_at,
+        "updated_at": None,
+    }
+
+def make_plan(rng, index, seller_id, created_at):
+    return {
+        "_id": ObjectId(),
+        "title": title(rng, "Plano", index),
+        "description": "Acesso completo a todos os treinos e acompanhamento semanal. " * rng.randint(1, 5),
+        "type": rng.choice(TYPES),
+        "category": rng.choice(CATEGORIES),
+        "price": round(rng.uniform(10, 600), 2),
+        "seller_id": seller_id,
+        "created_at": created_at,
+        "updated_at": None,
+    }
+
+def make_workout(rng, index, created_at):
+    return {
+        "_id": ObjectId(),
+        "title": title(rng, "Treino", index),
+        "description": "Sequência de exercícios com aquecimento e alongamento. " * rng.randint(1, 3),
+        "rest_time": rng.choice([30, 45, 60, 90, 120]),
+        "type": rng.choice(WORKOUT_TYPES),
+        "category": rng.choice(CATEGORIES),
+        "created_at": created_at,
+        "updated_at": None,
+    }
+
+def make_exercise(rng, index, workout_id, created_at):
+    return {
+        "_id": ObjectId(),
+        "title": f"{rng.choice(EXERCISES)} {index}",
+        "n_sections": rng.randint(2, 5),
+        "n_reps": rng.randint(6, 15),
+        "weight": float(rng.choice([0, 5, 10, 20, 30, 40, 60, 80])),
+        "tutorial_url": None,
+        "workout_id": workout_id,
+        "created_at": created_at,
+        "updated_at": None,
+    }
+
+# Grava os documentos em lotes e devolve uma amostra dos ids gerados
+async def insert_batches(collection, documents):
+    sample = []
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(sample) < SAMPLE_SIZE:
+            sample.append(str(document["_id"]))
+        if len(batch) == BATCH_SIZE:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+    return sample
+
+# Gera os dados no banco informado e devolve a quantidade de documentos e uma amostra dos ids
+# de cada coleção. Os vendedores e compradores são os primeiros usuários da amostra.
+async def generate(db, scale, seed=0):
+    rng = random.Random(seed)
+    sizes = {collection: collection_size(scale, collection) for collection in SHARES}
+    now = datetime.now(timezone.utc)
+
+    def created_at():
+        return now - timedelta(days=rng.randint(0, 730), seconds=rng.randint(0, 86400))
+
+    # Os ids dos usuários e planos são gerados antes para que as referências sejam consistentes
+    user_ids = [ObjectId() for _ in range(sizes["users"])]
+    sellers = user_ids[:max(1, int(len(user_ids) * SELLERS_SHARE))]
+
+    plans = [make_plan(rng, index, str(rng.choice(sellers)), created_at()) for index in range(sizes["plans"])]
+    workouts = [make_workout(rng, index, created_at()) for index in range(sizes["workouts"])]
+    plan_ids = [plan["_id"] for plan in plans]
+    workout_ids = [str(workout["_id"]) for workout in workouts]
+
+    # Compras: o comprador nunca é o vendedor do plano
+    plans_sold = {}
+    purchased_plans = {}
+    user_plans = []
+    for _ in range(sizes["user_plans"]):
+        plan = rng.choice(plans)
+        buyer_id = rng.choice(user_ids)
+        if str(buyer_id) == plan["seller_id"]:
+            continue
+
+        user_plan = {
+            "_id": ObjectId(),
+            "seller_id": plan["seller_id"],
+            "buyer_id": str(buyer_id),
+            "plan_id": str(plan["_id"]),
+            "purchased": rng.random() < PURCHASED_SHARE,
+            "purchased_at": None,
+            "created_at": created_at(),
+        }
+        if user_plan["purchased"]:
+            user_plan.update(purchased_at=now - timedelta(days=rng.randint(0, 365)), price=plan["price"], category=plan["category"])
+            plans_sold.setdefault(plan["seller_id"], set()).add(plan["_id"])
+            purchased_plans.setdefault(str(buyer_id), []).append(plan["_id"])
+        user_plans.append(user_plan)
+
+    samples = {}
+    samples["users"] = await insert_batches(db.users, (
+        {**make_user(index, sorted(plans_sold.get(str(id), ())), purchased_plans.get(str(id), []), created_at()), "_id": id}
+        for index, id in enumerate(user_ids)
+    ))
+    samples["sellers"] = [str(id) for id in sellers[:SAMPLE_SIZE]]
+    samples["plans"] = await insert_batches(db.plans, plans)
+    samples["workouts"] = await insert_batches(db.workouts, workouts)
+    samples["exercises"] = await insert_batches(db.exercises, (
+        make_exercise(rng, index, rng.choice(workout_ids), created_at()) for index in range(sizes["exercises"])
+    ))
+    samples["plan_workouts"] = await insert_batches(db.plan_workouts, (
+        {"_id": ObjectId(), "plan_id": str(rng.choice(plan_ids)), "workout_id": rng.choice(workout_ids), "created_at": created_at()}
+        for _ in range(sizes["plan_workouts"])
+    ))
+    samples["user_plans"] = await insert_batches(db.user_plans, user_plans)
+
+    counts = {collection: await db[collection].estimated_document_count() for collection in SHARES}
+    return counts, samples
@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import contextvars
+import importlib
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+import httpx
+import orjson
+from motor.motor_asyncio import AsyncIOMotorClient
+import database
+from benchmarks.data import generate
+from benchmarks.workload import OPERATIONS, new_state, next_request, record_created
+
+'''
+    Teste de carga reprodutível de todas as rotas da aplicação.
+    1. Gera os dados sintéticos (benchmarks.data) no banco "eliteplans_benchmark", que é recriado a cada execução
+    2. Cria os índices e reconstrói os contadores, os resumos dos planos e os rollups de vendas
+    3. Executa a mistura de operações (benchmarks.workload) com N clientes concorrentes contra a aplicação
+       em processo (httpx + ASGI, sem servidor nem rede), descartando o aquecimento
+    4. Reporta vazão e latências p50/p95/p99 por rota e grava os resultados em JSON (benchmarks/results),
+       opcionalmente comparando com uma execução anterior (--baseline)
+    Usa o MongoDB de MONGO_URI (ex.: mongod local). Se nenhum mongod responder (ou com --mock) usa o
+    mongomock_motor em memória, útil para validar a carga sem um servidor; as latências não representam as
+    de um MongoDB real. As rotas que o mongomock não consegue executar (operadores não implementados ou
+    dados derivados que não puderam ser reconstruídos) são marcadas como "unsupported" nos resultados e não
+    entram no total nem na comparação com a execução anterior.
+    Execução (na pasta src): python -m benchmarks.runner --scale 10000 --duration 30 --concurrency 16 [--mock]
+'''
+
+DATABASE = "eliteplans_benchmark"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Tempo máximo de espera pela resposta do mongod antes de usar o banco em memória
+PROBE_TIMEOUT_MS = 2000
+
+# Trechos das mensagens de erro de recursos que o mongomock não implementa (operadores de agregação,
+# $text e a API de bulk_write do pymongo atual)
+STAND_IN_ERRORS = ("mongomock", "bulkoperationbuilder")
+
+# Loggers dos serviços, que registram os erros das rotas
+SERVICE_LOGGERS = ("users", "plans", "workouts", "exercises", "user_plans", "plan_workouts", "database")
+
+# Rotas que leem cada coleção derivada e não têm resultado significativo quando a reconstrução falha
+DERIVED_ROUTES = {
+    "contadores": ("GET /quantity/exercises/{id}", "GET /quantity/plan_workouts/{id}", "GET /quantity/user_plans/seller/{id}", "GET /quantity/user_plans/buyer/{id}"),
+    "resumos dos planos": ("GET /plan_summaries/{id}", "GET /plan_summaries"),
+    "rollups de vendas": ("GET /analytics/sellers/{id}/revenue", "GET /analytics/sellers/{id}/categories", "GET /analytics/sellers/{id}/top_plans"),
+}
+
+# Rota da requisição em andamento, para associar os erros registrados pelos serviços à rota
+current_route = contextvars.ContextVar("current_route", default=None)
+
+# Coleta as rotas cujos erros vêm de recursos não implementados pelo banco em memória. O handler é
+# adicionado diretamente aos loggers, sendo executado no contexto da requisição (antes da fila do logging assíncrono)
+class StandInErrors(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.routes = set()
+
+    def emit(self, record):
+        route = current_route.get()
+        if route and any(marker in record.getMessage().lower() for marker in STAND_IN_ERRORS):
+            self.routes.add(route)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Teste de carga das rotas da aplicação")
+    parser.add_argument("--scale", type=int, default=10000, help="Quantidade total aproximada de documentos gerados (ex.: 10000 a 10000000)")
+    parser.add_argument("--duration", type=float, default=30, help="Duração da medição em segundos")
+    parser.add_argument("--warmup", type=float, default=5, help="Duração do aquecimento (não medido) em segundos")
+    parser.add_argument("--concurrency", type=int, default=16, help="Quantidade de clientes concorrentes")
+    parser.add_argument("--seed", type=int, default=0, help="Semente dos dados e da carga")
+    parser.add_argument("--mock", action="store_true", help="Usa o mongomock_motor em memória mesmo com um MongoDB disponível")
+    parser.add_argument("--output", help="Arquivo JSON dos resultados (padrão: benchmarks/results/<data>-<backend>-<escala>.json)")
+    parser.add_argument("--baseline", help="Arquivo JSON de uma execução anterior para comparação")
+    return parser.parse_args()
+
+# Verifica se o mongod de MONGO_URI responde
+async def mongodb_available():
+    probe = AsyncIOMotorClient(database.MONGO_URI, serverSelectionTimeoutMS=PROBE_TIMEOUT_MS)
+    try:
+        await probe.admin.command("ping")
+        return True
+    except Exception as e:
+        print(f'Aviso: MongoDB indisponível ({type(e).__name__}), usando o mongomock_motor em memória')
+        return False
+    finally:
+        probe.close()
+
+# Aponta o módulo database para o banco do benchmark antes de importar a aplicação,
+# já que os serviços importam o db de database na inicialização. Retorna a aplicação e o backend usado
+async def use_benchmark_database(mock):
+    if mock or not await mongodb_available():
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("O banco em memória requer o pacote mongomock-motor (pip install mongomock-motor)")
+        database.client = AsyncMongoMockClient()
+        backend = "mongomock"
+    else:
+        backend = "mongodb"
+
+    database.db = database.client[DATABASE]
+    return importlib.import_module("main").app, backend
+
+# Reconstrói as coleções derivadas; falhas são reportadas sem interromper o benchmark.
+# Retorna os nomes das coleções que não puderam ser reconstruídas
+async def rebuild_derived():
+    from utils.counters import reconcile_counters
+    from utils.plan_summaries import rebuild_plan_summaries
+    from utils.sales_rollups import rebuild_sales_rollups
+
+    failed = []
+    for name, rebuild in (("contadores", reconcile_counters), ("resumos dos planos", rebuild_plan_summaries), ("rollups de vendas", rebuild_sales_rollups)):
+        try:
+            await rebuild()
+        except Exception as e:
+            failed.append(name)
+            print(f'Aviso: não foi possível reconstruir os {name}: {e}')
+
+    return failed
+
+async def prepare(args):
+    from services.configs import database_logger
+
+    started_at = time.perf_counter()
+    await database.client.drop_database(DATABASE)
+    counts, samples = await generate(database.db, args.scale, args.seed)
+    await database.ensure_indexes(database_logger)
+    failed = await rebuild_derived()
+
+    print(f'Dados gerados em {time.perf_counter() - started_at:.1f}s: {counts}')
+    return counts, samples, failed
+
+# Cliente da carga: executa requisições até o fim da medição, registrando as que terminam após o aquecimento
+async def worker(client, state, measure_from, stop_at, samples):
+    while time.perf_counter() < stop_at:
+        operation, request = next_request(state)
+        current_route.set(operation["route"])
+        started_at = time.perf_counter()
+        try:
+            response = await client.request(
+                operation["method"], request["path"],
+                params=request.get("params"), json=request.get("json"),
+                content=request.get("content"), headers=request.get("headers")
+            )
+            status = response.status_code
+            record_created(state, operation["route"], status, response.content)
+        except Exception:
+            status = "exception"
+        finished_at = time.perf_counter()
+
+        if finished_at >= measure_from:
+            samples.setdefault(operation["route"], []).append(((finished_at - started_at) * 1000, status))
+
+async def run_workload(app, samples, args):
+    measured = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        measure_from = time.perf_counter() + args.warmup
+        stop_at = measure_from + args.duration
+        await asyncio.gather(*[
+            worker(client, new_state(random.Random(args.seed * 1000 + index), samples, index), measure_from, stop_at, measured)
+            for index in range(args.concurrency)
+        ])
+
+    return measured
+
+# Percentil pelo método do posto mais próximo
+def percentile(sorted_values, p):
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+def route_summary(samples, duration):
+    latencies = sorted(latency for latency, _ in samples)
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, status in samples if status == "exception" or status >= 500),
+        "statuses": statuses,
+        "throughput_rps": round(len(samples) / duration, 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def print_report(results, baseline):
+    if baseline and baseline.get("backend") != results["backend"]:
+        print(f'Aviso: a execução anterior usou {baseline.get("backend")} e esta usa {results["backend"]}; a comparação não é significativa')
+
+    baseline_routes = baseline["routes"] if baseline else {}
+    header = f'{"rota":<42} {"req":>7} {"erros":>6} {"req/s":>9} {"p50 (ms)":>9} {"p95 (ms)":>9} {"p99 (ms)":>9}'
+    print(header + (f' {"p95 vs base":>12}' if baseline else ''))
+
+    for route, summary in list(results["routes"].items()) + [("total", results["total"])]:
+        line = f'{route:<42} {summary["requests"]:>7} {summary["errors"]:>6} {summary["throughput_rps"]:>9.1f} {summary["p50_ms"]:>9.1f} {summary["p95_ms"]:>9.1f} {summary["p99_ms"]:>9.1f}'
+        previous = baseline_routes.get(route) if route != "total" else (baseline or {}).get("total")
+        if summary.get("unsupported"):
+            line += f' {"não suportada":>12}'
+        elif previous and previous["p95_ms"] and not previous.get("unsupported"):
+            line += f' {(summary["p95_ms"] / previous["p95_ms"] - 1) * 100:>+11.1f}%'
+        print(line)
+
+    missing = [operation["route"] for operation in OPERATIONS if operation["route"] not in results["routes"]]
+    if missing:
+        print(f'Rotas sem requisições medidas: {", ".join(missing)}')
+
+async def benchmark(args):
+    app, backend = await use_benchmark_database(args.mock)
+    counts, samples, failed = await prepare(args)
+
+    stand_in_errors = StandInErrors()
+    for name in SERVICE_LOGGERS:
+        logging.getLogger(name).addHandler(stand_in_errors)
+
+    print(f'Executando a carga: {args.concurrency} clientes, {args.warmup:.0f}s de aquecimento e {args.duration:.0f}s de medição')
+    measured = await run_workload(app, samples, args)
+    await database.client.drop_database(DATABASE)
+
+    # Com o banco em memória, rotas com recursos não implementados ou que leem dados derivados não reconstruídos
+    unsupported = set()
+    if backend == "mongomock":
+        unsupported = stand_in_errors.routes | {route for name in failed for route in DERIVED_ROUTES[name]}
+
+    ordered = [operation["route"] for operation in OPERATIONS if operation["route"] in measured]
+    routes = {route: route_summary(measured[route], args.duration) for route in ordered}
+    for route in unsupported & routes.keys():
+        routes[route]["unsupported"] = True
+
+    supported = [route for route in ordered if route not in unsupported]
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "backend": backend,
+        "python": platform.python_version(),
+        "parameters": {"scale": args.scale, "duration": args.duration, "warmup": args.warmup, "concurrency": args.concurrency, "seed": args.seed},
+        "documents": counts,
+        "unsupported_routes": [route for route in ordered if route in unsupported],
+        "routes": routes,
+        "total": route_summary([sample for route in supported for sample in measured[route]], args.duration),
+    }
+
+def main():
+    args = parse_args()
+    results = asyncio.run(benchmark(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "rb") as file:
+            baseline = orjson.loads(file.read())
+    print_report(results, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{datetime.now():%Y%m%d-%H%M%S}-{results["backend"]}-{args.scale}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "wb") as file:
+        file.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    print(f'Resultados gravados em {output}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import asyncio
+import random
+import statistics
+import sys
+import time
+from bson import ObjectId
+from pymongo import InsertOne
+from database import client
+from services.users import plans_lookup_pipeline
+from utils.projection import EMBEDDED_PLAN_PROJECTION, SELLER_PROJECTION
+
+'''
+    Benchmark da rota /seller_plans com coleções de usuários de tamanhos crescentes.
+    - antes: $match, $lookup (planos completos de todos os vendedores), $project, $skip/$limit e $sort por último
+    - depois: $match, $sort, $skip/$limit, $project e $lookup limitado apenas para os vendedores da página
+    Com o pipeline atual o custo da junção por página deve permanecer constante enquanto a coleção cresce.
+    Requer um MongoDB (MONGO_URI); os dados são gerados no banco "eliteplans_benchmark".
+    Execução (na pasta src): python -m benchmarks.seller_plans [tamanhos...]
+'''
+
+SIZES = [1000, 5000, 20000]
+PLANS = 500
+PLANS_PER_SELLER = 30
+PAGE_SIZE = 10
+RUNS = 15
+
+db = client["eliteplans_benchmark"]
+
+# Pipeline anterior das rotas de vendedores
+def pipeline_before(page, limit):
+    return [
+        {"$match": {"plans_sold": {"$exists": True, "$ne": []}}},
+        {"$lookup": {"from": "plans", "localField": "plans_sold", "foreignField": "_id", "as": "plans_sold_details"}},
+        {"$project": {"purchased_plans": 0}},
+        {"$skip": (page - 1) * limit},
+        {"$limit": limit},
+        {"$sort": {"name": 1}}
+    ]
+
+# Pipeline atual (o mesmo usado pela rota)
+def pipeline_after(page, limit):
+    page_stages = [{"$sort": {"name": 1, "_id": 1}}, {"$skip": (page - 1) * limit}, {"$limit": limit}]
+    query = {"$and": [{"plans_sold": {"$exists": True, "$ne": []}}]}
+    return plans_lookup_pipeline(query, page_stages, "plans_sold", SELLER_PROJECTION, EMBEDDED_PLAN_PROJECTION, 20)
+
+# Gera os planos uma única vez e completa a coleção de usuários até o tamanho informado
+async def seed(size, plan_ids):
+    existing = await db.users.count_documents({})
+    operations = [
+        InsertOne({
+            "name": f"Vendedor {index:07d}",
+            "email": f"vendedor{index}@example.com",
+            "password": "SenhaSegura123",
+            "cpf": "12345678901",
+            "phone_number": "11987654321",
+            "address": {"cep": "01001000", "street": "Avenida Paulista", "number": "1000", "neighborhood": "Bela Vista", "city": "São Paulo", "state": "SP"},
+            "plans_sold": random.sample(plan_ids, PLANS_PER_SELLER),
+            "purchased_plans": [],
+        })
+        for index in range(existing, size)
+    ]
+    if operations:
+        await db.users.bulk_write(operations, ordered=False)
+
+async def measure(pipeline):
+    timings = []
+    for _ in range(RUNS):
+        started_at = time.perf_counter()
+        await db.users.aggregate(pipeline).to_list(length=None)
+        timings.append((time.perf_counter() - started_at) * 1000)
+
+    return statistics.median(timings)
+
+async def main(sizes):
+    await client.drop_database("eliteplans_benchmark")
+    plans = [{"_id": ObjectId(), "title": f"Plano {index}", "description": "Acesso completo. " * 50, "type": "Mensal", "category": "Fitness", "price": 99.99} for index in range(PLANS)]
+    await db.plans.insert_many(plans)
+    await db.users.create_index([("name", 1), ("_id", 1)])
+    plan_ids = [plan["_id"] for plan in plans]
+
+    print(f'{"usuários":>10} {"antes (ms)":>12} {"depois (ms)":>12} {"depois, página 50 (ms)":>24}')
+    for size in sorted(sizes):
+        await seed(size, plan_ids)
+        before = await measure(pipeline_before(1, PAGE_SIZE))
+        after = await measure(pipeline_after(1, PAGE_SIZE))
+        deep = await measure(pipeline_after(50, PAGE_SIZE))
+        print(f'{size:>10} {before:>12.1f} {after:>12.1f} {deep:>24.1f}')
+
+    await client.drop_database("eliteplans_benchmark")
+
+if __name__ == "__main__":
+    asyncio.run(main([int(size) for size in sys.argv[1:]] or SIZES))
@@ -0,0 +1,80 @@
+import json
+import timeit
+from datetime import datetime
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from utils.responses import MongoJSONResponse
+
+'''
+    Microbenchmark da serialização de uma página de 100 documentos.
+    - antes: laço convertendo ObjectId em string + jsonable_encoder + json.dumps (JSONResponse)
+    - depois: MongoJSONResponse (orjson com conversão de ObjectId durante a serialização)
+    Execução (na pasta src): python -m benchmarks.serialization
+'''
+
+PAGE_SIZE = 100
+REPEAT = 5
+NUMBER = 200
+
+def make_plan():
+    return {
+        "_id": ObjectId(),
+        "title": "Treino Premium",
+        "description": "Acesso completo a todas as funcionalidades. " * 5,
+        "type": "Mensal",
+        "category": "Fitness",
+        "price": 99.99,
+        "seller_id": str(ObjectId()),
+        "created_at": datetime.now(),
+        "updated_at": datetime.now(),
+    }
+
+def make_user():
+    return {
+        "_id": ObjectId(),
+        "name": "João Silva",
+        "email": "joao.silva@example.com",
+        "password": "SenhaSegura123",
+        "cpf": "12345678901",
+        "phone_number": "11987654321",
+        "address": {
+            "cep": "01001000",
+            "street": "Avenida Paulista",
+            "number": "1000",
+            "neighborhood": "Bela Vista",
+            "city": "São Paulo",
+            "state": "SP",
+        },
+        "plans_sold": [ObjectId() for _ in range(20)],
+        "purchased_plans": [ObjectId() for _ in range(20)],
+        "created_at": datetime.now(),
+        "updated_at": None,
+    }
+
+# Fluxo anterior: conversões em Python seguidas do encoder genérico do FastAPI
+def serialize_before(documents):
+    documents = [dict(document) for document in documents]
+    for document in documents:
+        document["_id"] = str(document["_id"])
+        for field in ("plans_sold", "purchased_plans"):
+            if field in document:
+                document[field] = [str(plan_id) for plan_id in document[field]]
+
+    return json.dumps(jsonable_encoder(documents), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# Fluxo atual: documentos serializados diretamente pela resposta
+def serialize_after(documents):
+    return MongoJSONResponse(documents).body
+
+def measure(name, documents):
+    results = {}
+    for label, function in (("before", serialize_before), ("after", serialize_after)):
+        timings = timeit.repeat(lambda: function(documents), repeat=REPEAT, number=NUMBER)
+        results[label] = min(timings) / NUMBER * 1000
+
+    print(f'{name}: antes {results["before"]:.3f} ms/página, depois {results["after"]:.3f} ms/página '
+          f'({results["before"] / results["after"]:.1f}x)')
+
+if __name__ == "__main__":
+    measure("planos", [make_plan() for _ in range(PAGE_SIZE)])
+    measure("usuários", [make_user() for _ in range(PAGE_SIZE)])
@@ -0,0 +1,180 @@
+from itertools import accumulate
+import orjson
+
+'''
+    Mistura de operações da carga de trabalho, cobrindo as rotas de todos os roteadores incluídos em main.py.
+    Cada operação tem um peso (frequência relativa), o método, a rota (modelo usado para agrupar os resultados)
+    e uma função que monta a requisição a partir do estado da execução (gerador aleatório, amostras de ids
+    geradas por benchmarks.data e ids criados pela própria carga). A função devolve None quando a operação
+    não pode ser montada (ex.: exclusão sem documentos criados), e outra operação é sorteada.
+    As escritas alteram apenas documentos criados pela própria carga, de modo que os dados gerados
+    permanecem estáveis entre as rotas de leitura.
+'''
+
+# Rotas de criação e a coleção em que o id criado é guardado
+CREATES = {
+    "POST /users": "users",
+    "POST /plans": "plans",
+    "POST /workouts": "workouts",
+    "POST /exercises": "exercises",
+    "POST /plan_workouts": "plan_workouts",
+    "POST /user_plans": "user_plans",
+}
+
+# Estado de um cliente da carga; o número do cliente torna únicos os valores gerados entre clientes concorrentes
+def new_state(rng, samples, worker=0):
+    return {"rng": rng, "samples": samples, "created": {collection: [] for collection in CREATES.values()}, "worker": worker, "sequence": 0}
+
+# Guarda o id do documento criado por uma requisição bem-sucedida
+def record_created(state, route, status_code, body):
+    collection = CREATES.get(route)
+    if collection and status_code == 200:
+        document = orjson.loads(body)
+        state["created"][collection].append({"_id": document["_id"], **{key: document[key] for key in ("seller_id", "buyer_id", "plan_id") if key in document}})
+
+def sample(state, collection):
+    return state["rng"].choice(state["samples"][collection])
+
+# Próximo número da sequência, usado para gerar valores únicos
+def sequence(state):
+    state["sequence"] += 1
+    return state["sequence"]
+
+# Documento criado pela carga (removido da lista quando take=True)
+def created(state, collection, take=False):
+    documents = state["created"][collection]
+    if not documents:
+        return None
+    index = state["rng"].randrange(len(documents))
+    return documents.pop(index) if take else documents[index]
+
+def user_body(state):
+    number = sequence(state)
+    return {
+        "name": f"Usuário carga {state['worker']}-{number}",
+        "email": f"carga{state['worker']}-{number}@example.com",
+        "password": "SenhaSegura123",
+        "cpf": f"{state['worker']:03d}{number:08d}",
+        "phone_number": "11987654321",
+        "address": {"cep": "01001000", "street": "Avenida Paulista", "number": "1000", "neighborhood": "Bela Vista", "city": "São Paulo", "state": "SP"},
+    }
+
+def plan_body(state):
+    rng = state["rng"]
+    return {
+        "title": f"Plano carga {sequence(state)}",
+        "description": "Plano criado pela carga de trabalho",
+        "type": rng.choice(["Mensal", "Anual"]),
+        "category": rng.choice(["Fitness", "Cardio"]),
+        "price": round(rng.uniform(10, 600), 2),
+        "seller_id": sample(state, "sellers"),
+    }
+
+def workout_body(state):
+    return {"title": f"Treino carga {sequence(state)}", "description": "Treino criado pela carga de trabalho", "rest_time": 60, "type": "Força", "category": "Fitness"}
+
+def exercise_body(state):
+    return {"title": f"Exercício carga {sequence(state)}", "n_sections": 3, "n_reps": 12, "weight": 20.0, "workout_id": sample(state, "workouts")}
+
+def user_plan_body(state, purchased=False):
+    return {"seller_id": sample(state, "sellers"), "buyer_id": sample(state, "users"), "plan_id": sample(state, "plans"), "purchased": purchased}
+
+def with_created(state, collection, build, take=False):
+    document = created(state, collection, take)
+    return build(document) if document else None
+
+def bulk_exercises(state):
+    rows = [exercise_body(state) for _ in range(100)]
+    return {"path": "/bulk/exercises", "content": b"\n".join(orjson.dumps(row) for row in rows), "headers": {"Content-Type": "application/x-ndjson"}}
+
+def op(weight, method, route, build):
+    return {"weight": weight, "method": method, "route": f"{method} {route}", "build": build}
+
+# Mistura de operações: leituras por id e listagens predominam, seguidas de agregações e escritas
+OPERATIONS = [
+    # Aplicação
+    op(1, "GET", "/", lambda state: {"path": "/"}),
+    op(1, "GET", "/cache/stats", lambda state: {"path": "/cache/stats"}),
+
+    # Usuários
+    op(8, "GET", "/users/{id}", lambda state: {"path": f"/users/{sample(state, 'users')}"}),
+    op(4, "GET", "/users", lambda state: {"path": "/users", "params": {"sort_by": "name", "limit": 20}}),
+    op(1, "GET", "/quantity/users", lambda state: {"path": "/quantity/users"}),
+    op(3, "GET", "/seller_plans/{id}", lambda state: {"path": f"/seller_plans/{sample(state, 'sellers')}"}),
+    op(2, "GET", "/seller_plans", lambda state: {"path": "/seller_plans", "params": {"limit": 10}}),
+    op(2, "GET", "/buyer_plans/{id}", lambda state: {"path": f"/buyer_plans/{sample(state, 'users')}"}),
+    op(2, "GET", "/buyer_plans", lambda state: {"path": "/buyer_plans", "params": {"limit": 10}}),
+    op(1, "POST", "/users", lambda state: {"path": "/users", "json": user_body(state)}),
+    op(1, "PUT", "/users/{id}", lambda state: with_created(state, "users", lambda user: {"path": f"/users/{user['_id']}", "json": user_body(state)})),
+    op(1, "DELETE", "/users/{id}", lambda state: with_created(state, "users", lambda user: {"path": f"/users/{user['_id']}"}, take=True)),
+
+    # Planos
+    op(12, "GET", "/plans/{id}", lambda state: {"path": f"/plans/{sample(state, 'plans')}"}),
+    op(4, "GET", "/plans/{id}/full", lambda state: {"path": f"/plans/{sample(state, 'plans')}/full"}),
+    op(2, "POST", "/plans/_mget", lambda state: {"path": "/plans/_mget", "json": {"ids": state["rng"].sample(state["samples"]["plans"], min(50, len(state["samples"]["plans"])))}}),
+    op(8, "GET", "/plans", lambda state: {"path": "/plans", "params": {"category": state["rng"].choice(["Fitness", "Cardio", "Musculação"]), "sort_by": "price", "limit": 20}}),
+    op(4, "GET", "/search/plans", lambda state: {"path": "/search/plans", "params": {"subject": state["rng"].choice(["hipertrofia", "força", "iniciante"])}}),
+    op(1, "GET", "/quantity/plans", lambda state: {"path": "/quantity/plans"}),
+    op(1, "POST", "/plans", lambda state: {"path": "/plans", "json": plan_body(state)}),
+    op(1, "PUT", "/plans/{id}", lambda state: with_created(state, "plans", lambda plan: {"path": f"/plans/{plan['_id']}", "json": plan_body(state)})),
+    op(1, "DELETE", "/plans/{id}", lambda state: with_created(state, "plans", lambda plan: {"path": f"/plans/{plan['_id']}"}, take=True)),
+
+    # Treinos
+    op(8, "GET", "/workouts/{id}", lambda state: {"path": f"/workouts/{sample(state, 'workouts')}"}),
+    op(4, "GET", "/workouts", lambda state: {"path": "/workouts", "params": {"type": "Força", "sort_by": "rest_time", "limit": 20}}),
+    op(1, "GET", "/quantity/workouts", lambda state: {"path": "/quantity/workouts"}),
+    op(1, "POST", "/workouts", lambda state: {"path": "/workouts", "json": workout_body(state)}),
+    op(1, "PUT", "/workouts/{id}", lambda state: with_created(state, "workouts", lambda workout: {"path": f"/workouts/{workout['_id']}", "json": workout_body(state)})),
+    op(1, "DELETE", "/workouts/{id}", lambda state: with_created(state, "workouts", lambda workout: {"path": f"/workouts/{workout['_id']}"}, take=True)),
+
+    # Exercícios
+    op(8, "GET", "/exercises/{id}", lambda state: {"path": f"/exercises/{sample(state, 'exercises')}"}),
+    op(4, "GET", "/exercises", lambda state: {"path": "/exercises", "params": {"min_weight": 20, "sort_by": "weight", "limit": 20}}),
+    op(1, "GET", "/quantity/exercises", lambda state: {"path": "/quantity/exercises"}),
+    op(2, "GET", "/quantity/exercises/{id}", lambda state: {"path": f"/quantity/exercises/{sample(state, 'workouts')}"}),
+    op(2, "POST", "/exercises", lambda state: {"path": "/exercises", "json": exercise_body(state)}),
+    op(1, "PUT", "/exercises/{id}", lambda state: with_created(state, "exercises", lambda exercise: {"path": f"/exercises/{exercise['_id']}", "json": exercise_body(state)})),
+    op(1, "DELETE", "/exercises/{id}", lambda state: with_created(state, "exercises", lambda exercise: {"path": f"/exercises/{exercise['_id']}"}, take=True)),
+
+    # Treinos dos planos
+    op(1, "GET", "/quantity/plan_workouts", lambda state: {"path": "/quantity/plan_workouts"}),
+    op(2, "GET", "/quantity/plan_workouts/{id}", lambda state: {"path": f"/quantity/plan_workouts/{sample(state, 'plans')}"}),
+    op(1, "POST", "/plan_workouts", lambda state: {"path": "/plan_workouts", "json": {"plan_id": sample(state, "plans"), "workout_id": sample(state, "workouts")}}),
+    op(1, "DELETE", "/plan_workouts/{id}", lambda state: with_created(state, "plan_workouts", lambda plan_workout: {"path": f"/plan_workouts/{plan_workout['_id']}"}, take=True)),
+
+    # Planos dos usuários
+    op(1, "GET", "/quantity/user_plans", lambda state: {"path": "/quantity/user_plans"}),
+    op(2, "GET", "/quantity/user_plans/seller/{id}", lambda state: {"path": f"/quantity/user_plans/seller/{sample(state, 'sellers')}"}),
+    op(2, "GET", "/quantity/user_plans/buyer/{id}", lambda state: {"path": f"/quantity/user_plans/buyer/{sample(state, 'users')}"}),
+    op(1, "POST", "/user_plans", lambda state: {"path": "/user_plans", "json": user_plan_body(state)}),
+    op(1, "PUT", "/user_plans/{id}", lambda state: with_created(state, "user_plans", lambda user_plan: {
+        "path": f"/user_plans/{user_plan['_id']}",
+        "json": {"seller_id": user_plan["seller_id"], "buyer_id": user_plan["buyer_id"], "plan_id": user_plan["plan_id"], "purchased": True}
+    }, take=True)),
+    op(1, "DELETE", "/user_plans/{id}", lambda state: with_created(state, "user_plans", lambda user_plan: {"path": f"/user_plans/{user_plan['_id']}"}, take=True)),
+
+    # Exportação e importação em massa
+    op(1, "GET", "/export/plans", lambda state: {"path": "/export/plans", "params": {"category": "Cardio"}}),
+    op(1, "GET", "/export/workouts", lambda state: {"path": "/export/workouts", "params": {"type": "Aeróbico", "format": "csv"}}),
+    op(1, "GET", "/export/exercises", lambda state: {"path": "/export/exercises", "params": {"min_weight": 80}}),
+    op(1, "POST", "/bulk/{collection}", bulk_exercises),
+
+    # Resumos dos planos
+    op(4, "GET", "/plan_summaries/{id}", lambda state: {"path": f"/plan_summaries/{sample(state, 'plans')}"}),
+    op(4, "GET", "/plan_summaries", lambda state: {"path": "/plan_summaries", "params": {"sort_by": "buyers", "order_by": "desc", "limit": 20}}),
+
+    # Análises de vendas
+    op(2, "GET", "/analytics/sellers/{id}/revenue", lambda state: {"path": f"/analytics/sellers/{sample(state, 'sellers')}/revenue", "params": {"granularity": "month"}}),
+    op(1, "GET", "/analytics/sellers/{id}/categories", lambda state: {"path": f"/analytics/sellers/{sample(state, 'sellers')}/categories"}),
+    op(1, "GET", "/analytics/sellers/{id}/top_plans", lambda state: {"path": f"/analytics/sellers/{sample(state, 'sellers')}/top_plans"}),
+]
+
+CUMULATIVE_WEIGHTS = list(accumulate(operation["weight"] for operation in OPERATIONS))
+
+# Sorteia uma operação pelo peso e monta a requisição
+def next_request(state):
+    while True:
+        operation = state["rng"].choices(OPERATIONS, cum_weights=CUMULATIVE_WEIGHTS)[0]
+        request = operation["build"](state)
+        if request is not None:
+            return operation, request
@@ -1,6 +1,11 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel
+import asyncio
 import os
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+from utils.metrics import MONGO_LISTENERS
+from utils.slow_queries import slow_query_listener
 
 # Carrega variáveis de ambiente do arquivo .env, se presente
 load_dotenv()
@@ -8,22 +13,129 @@ load_dotenv()
 # Obtém a URI do MongoDB a partir das variáveis de ambiente
 MONGO_URI = os.getenv("MONGO_URI")
 
-# Criação de um cliente assíncrono para o MongoDB
-client = AsyncIOMotorClient(MONGO_URI)
+# Criação de um cliente assíncrono para o MongoDB, com os listeners das métricas de comandos e do pool de conexões
+# e do registro de consultas lentas
+client = AsyncIOMotorClient(MONGO_URI, event_listeners=[*MONGO_LISTENERS, slow_query_listener])
 
 # Definição do banco de dados que será utilizado no projeto
 db = client["eliteplans"]
 
-# Criação de índices para performance das consultas mais relevantes
-db.users.create_index([("name", "text")], weights={"name": 1})
-db.user_plans.create_index([('seller_id', 1), ('plan_id', 1)])     # Busca de ids de planos de um vendedor
-db.user_plans.create_index([('buyer_id', 1), ('plan_id', 1)])      # Busca de ids de planos de um comprador
-db.plan_workouts.create_index([('plan_id', 1), ('workout_id', 1)]) # Busca de ids de treinos de um plano
-db.exercises.create_index("workout_id")                           # Busca de exercícios de um treino
+# Índices de texto das buscas por assunto/título. Índices de texto (versão 3) ignoram acentos;
+# o idioma "portuguese" adiciona radicalização e stop words, "none" busca apenas termos exatos
+TEXT_SEARCH_LANGUAGE = os.getenv("TEXT_SEARCH_LANGUAGE", "portuguese")
+
+# Tempo mínimo de acompanhamento (em dias) antes de um índice sem acessos ser reportado. O $indexStats
+# reinicia os contadores a cada reinício do mongod e começa a contar quando o índice é criado
+INDEX_UNUSED_DAYS = float(os.getenv("INDEX_UNUSED_DAYS", "7"))
+
+# Declaração de um índice. Índices obrigatórios impedem a inicialização da aplicação se não puderem ser criados
+def index(keys, required=True, **options):
+    return {"model": IndexModel(keys, **options), "required": required}
+
+# Especificação dos índices de cada coleção, criados e verificados na inicialização (ensure_indexes)
+INDEXES = {
+    "users": [
+        index([("name", "text")], weights={"name": 1}),
+        index([("name", 1), ("_id", 1)]),                       # Ordenação e cursor por nome
+        index([("email", 1)]),                                  # Verificação de email já cadastrado
+    ],
+    "plans": [
+        index([("title", "text"), ("description", "text")], weights={"title": 10, "description": 2}, default_language=TEXT_SEARCH_LANGUAGE),
+        index([("title", 1), ("_id", 1)]),
+        index([("type", 1), ("_id", 1)]),                       # Filtro e ordenação por tipo
+        index([("category", 1), ("_id", 1)]),                   # Filtro e ordenação por categoria
+        index([("price", 1), ("_id", 1)]),                      # Faixa e ordenação por preço
+    ],
+    "workouts": [
+        index([("title", "text"), ("description", "text")], weights={"title": 10, "description": 2}, default_language=TEXT_SEARCH_LANGUAGE),
+        index([("title", 1), ("_id", 1)]),
+        index([("type", 1), ("_id", 1)]),
+        index([("category", 1), ("_id", 1)]),
+        index([("rest_time", 1), ("_id", 1)]),                  # Faixa e ordenação por tempo de descanso
+    ],
+    "exercises": [
+        index([("title", "text")], default_language=TEXT_SEARCH_LANGUAGE),
+        index([("workout_id", 1)]),                             # Busca de exercícios de um treino
+        index([("title", 1), ("_id", 1)]),
+        index([("n_sections", 1), ("_id", 1)]),                 # Faixa e ordenação por séries
+        index([("n_reps", 1), ("_id", 1)]),                     # Faixa e ordenação por repetições
+        index([("weight", 1), ("_id", 1)]),                     # Faixa e ordenação por peso
+    ],
+    "user_plans": [
+        index([("seller_id", 1), ("plan_id", 1)]),              # Busca de ids de planos de um vendedor
+        index([("buyer_id", 1), ("plan_id", 1)]),               # Busca de ids de planos de um comprador
+        index([("plan_id", 1), ("purchased", 1)]),              # Compradores de um plano (resumos)
+    ],
+    "plan_workouts": [
+        index([("plan_id", 1), ("workout_id", 1)]),             # Busca de ids de treinos de um plano
+        index([("workout_id", 1), ("plan_id", 1)]),             # Planos que contêm um treino (resumos)
+    ],
+    "plan_summaries": [
+        index([("title", "text")], default_language=TEXT_SEARCH_LANGUAGE),
+        index([("title", 1), ("_id", 1)]),
+        index([("type", 1), ("_id", 1)]),
+        index([("category", 1), ("_id", 1)]),
+        index([("price", 1), ("_id", 1)]),
+        index([("buyers", 1), ("_id", 1)]),                     # Ordenação por quantidade de compradores
+        index([("volume", 1), ("_id", 1)]),                     # Ordenação por volume de treino
+    ],
+    "sales_rollups": [
+        index([("seller_id", 1), ("date", 1)]),                 # Rollups de um vendedor em um período
+    ],
+}
 
 '''
-    Obs: consultas menos comuns como usuários de um plano e planos de um treino não possuem índices de otimização.
+    Obs: consultas menos comuns como usuários de um plano não possuem índices de otimização.
 '''
 
+# Cria os índices declarados, verifica se existem e reporta índices ausentes ou sem uso
+async def ensure_indexes(logger):
+    specs = [(collection, spec) for collection, indexes in INDEXES.items() for spec in indexes]
+    results = await asyncio.gather(
+        *[db[collection].create_indexes([spec["model"]]) for collection, spec in specs],
+        return_exceptions=True
+    )
+
+    failures = []
+    for (collection, spec), result in zip(specs, results):
+        if isinstance(result, Exception):
+            name = spec["model"].document["name"]
+            logger.error('Erro ao criar índice %s.%s: %s', collection, name, result)
+            if spec["required"]:
+                failures.append(f'{collection}.{name}')
+
+    if failures:
+        raise RuntimeError(f'Não foi possível criar os índices obrigatórios: {", ".join(failures)}')
+
+    missing = []
+    for collection, indexes in INDEXES.items():
+        existing = await db[collection].index_information()
+        declared = {spec["model"].document["name"] for spec in indexes}
+
+        for spec in indexes:
+            name = spec["model"].document["name"]
+            if name not in existing:
+                logger.error('Índice ausente: %s.%s', collection, name)
+                if spec["required"]:
+                    missing.append(f'{collection}.{name}')
+
+        for name in set(existing) - declared - {"_id_"}:
+            logger.warning('Índice não declarado: %s.%s', collection, name)
+
+        try:
+            # Datas sem fuso devolvidas pelo MongoDB estão em UTC
+            unused_before = (datetime.now(timezone.utc) - timedelta(days=INDEX_UNUSED_DAYS)).replace(tzinfo=None)
+            async for stats in db[collection].aggregate([{"$indexStats": {}}]):
+                accesses = stats["accesses"]
+                if stats["name"] != "_id_" and accesses["ops"] == 0 and accesses["since"].replace(tzinfo=None) < unused_before:
+                    logger.warning('Índice sem uso desde %s: %s.%s', accesses["since"], collection, stats["name"])
+        except Exception as e:
+            logger.warning('Não foi possível obter o uso dos índices de %s: %s', collection, e)
+
+    if missing:
+        raise RuntimeError(f'Índices obrigatórios ausentes: {", ".join(missing)}')
+
+    logger.info('Índices verificados: %s', {collection: len(indexes) for collection, indexes in INDEXES.items()})
+
 def get_db():
-    return db
\ No newline at end of file
+    return db
@@ -1,13 +1,46 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
-from database import get_db
+from fastapi.responses import PlainTextResponse
+from database import db, ensure_indexes, get_db
+from services.configs import database_logger
 from services.users import router as users_router
 from services.exercises import router as exercises_router
 from services.workouts import router as workouts_router
 from services.plans import router as plans_router
 from services.plan_workouts import router as plan_workouts_router
 from services.user_plans import router as user_plans_router
+from services.export import router as export_router
+from services.bulk import router as bulk_router
+from services.plan_summaries import router as plan_summaries_router
+from services.analytics import router as analytics_router
+from services.slow_queries import router as slow_queries_router
+from utils.admission import AdmissionMiddleware, get_admission_stats
+from utils.cache import get_cache_stats
+from utils.metrics import MetricsMiddleware, render_metrics
+from utils.responses import MongoJSONResponse
+from utils.single_flight import get_single_flight_stats
+from utils.slow_queries import ensure_slow_queries_collection, slow_query_listener
 
-app = FastAPI()
+# Criação e verificação dos índices na inicialização (MANAGE_INDEXES=false desativa)
+# e ativação do registro de consultas lentas
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("MANAGE_INDEXES", "true").lower() in ("1", "true", "yes"):
+        await ensure_indexes(database_logger)
+    await ensure_slow_queries_collection(db, database_logger)
+    slow_query_listener.start(asyncio.get_running_loop(), db, database_logger)
+    yield
+
+app = FastAPI(lifespan=lifespan, default_response_class=MongoJSONResponse)
+
+# Controle de admissão por classe de rota
+app.add_middleware(AdmissionMiddleware)
+
+# Métricas de requisições por rota (expostas em /metrics). Adicionado por último para ser o middleware
+# mais externo e registrar também as requisições recusadas pelo controle de admissão
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 async def get_db(db = Depends(get_db)):
@@ -17,6 +50,26 @@ async def get_db(db = Depends(get_db)):
     except Exception as e:
         return {"message": "Ops! Erro ao conectar-se ao banco de dados..."}
 
+# Estatísticas dos caches de busca por id
+@app.get("/cache/stats")
+async def get_cache_statistics():
+    return get_cache_stats()
+
+# Estatísticas da coalescência de leituras idênticas
+@app.get("/single_flight/stats")
+async def get_single_flight_statistics():
+    return get_single_flight_stats()
+
+# Requisições em andamento e na fila de cada classe do controle de admissão
+@app.get("/admission/stats")
+async def get_admission_statistics():
+    return get_admission_stats()
+
+# Métricas no formato de texto do Prometheus
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Adicionando rotas de usuários
 app.include_router(users_router)
 
@@ -33,4 +86,19 @@ app.include_router(plans_router)
 app.include_router(plan_workouts_router)
 
 # Adicionando rotas de planos para usuários
-app.include_router(user_plans_router)
\ No newline at end of file
+app.include_router(user_plans_router)
+
+# Adicionando rotas de exportação
+app.include_router(export_router)
+
+# Adicionando rotas de importação em massa
+app.include_router(bulk_router)
+
+# Adicionando rotas dos resumos dos planos
+app.include_router(plan_summaries_router)
+
+# Adicionando rotas de análises de vendas
+app.include_router(analytics_router)
+
+# Adicionando rotas de consultas lentas
+app.include_router(slow_queries_router)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import BaseModel, Field
 from typing import Optional
 
@@ -11,5 +11,5 @@ class Exercise(BaseModel):
     weight: float = Field(ge=0)
     tutorial_url: Optional[str] = Field(default=None)
     workout_id: str
-    created_at: datetime = Field(default_factory=datetime.now)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: Optional[datetime] = Field(default=None)
\ No newline at end of file
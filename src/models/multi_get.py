@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+
+# Quantidade máxima de ids por busca múltipla
+MAX_IDS = 1000
+
+class MultiGet(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=MAX_IDS)
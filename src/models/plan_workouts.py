@@ -1,5 +1,5 @@
 from __future__ import annotations
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import BaseModel, Field
 from typing import Optional
 
@@ -7,4 +7,4 @@ class PlanWorkouts(BaseModel):
     id: Optional[str] = Field(None, alias="_id")
     plan_id: str
     workout_id: str
-    created_at: datetime = Field(default_factory=datetime.now)
\ No newline at end of file
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
\ No newline at end of file
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import BaseModel, Field
 from typing import Optional
 
@@ -20,5 +20,5 @@ class User(BaseModel):
     address: Address
     plans_sold: Optional[list[str]] = []
     purchased_plans: Optional[list[str]] = []
-    created_at: datetime = Field(default_factory=datetime.now)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: Optional[datetime] = Field(default=None)
\ No newline at end of file
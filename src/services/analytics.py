@@ -0,0 +1,135 @@
+import time
+from datetime import date, datetime, time as day_time
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Query
+from database import db
+from services.configs import user_plans_logger
+from utils.responses import MongoJSONResponse
+
+'''
+    Análises de vendas por vendedor, servidas a partir dos rollups diários (utils/sales_rollups.py).
+    O custo de cada consulta depende apenas da quantidade de dias e planos do período.
+'''
+
+# Criar roteador
+router = APIRouter()
+
+# Filtro dos rollups de um vendedor no período informado (datas inclusivas)
+def rollup_filter(id, start=None, end=None):
+    match = {"seller_id": id}
+
+    period = {}
+    if start:
+        period["$gte"] = datetime.combine(start, day_time.min)
+    if end:
+        period["$lte"] = datetime.combine(end, day_time.min)
+    if period:
+        match["date"] = period
+
+    return match
+
+# Rota de receita e vendas de um vendedor ao longo do tempo
+@router.get('/analytics/sellers/{id}/revenue')
+async def get_seller_revenue(
+    id: str,
+    granularity: Optional[Literal["day", "week", "month"]] = Query("day", description="Period of each point of the series"),
+    start: Optional[date] = Query(None, description="First day of the period (inclusive)"),
+    end: Optional[date] = Query(None, description="Last day of the period (inclusive)")
+):
+    try:
+        started_at = time.perf_counter()
+        user_plans_logger.info('Buscando receita do vendedor: %s', id)
+
+        period = {"date": "$date", "unit": granularity}
+        if granularity == "week":
+            period["startOfWeek"] = "monday"
+
+        pipeline = [
+            {"$match": rollup_filter(id, start, end)},
+            {"$group": {"_id": {"$dateTrunc": period}, "sales": {"$sum": "$sales"}, "revenue": {"$sum": "$revenue"}}},
+            {"$sort": {"_id": 1}},
+            {"$project": {"_id": 0, "period": "$_id", "sales": 1, "revenue": 1}}
+        ]
+        series = await db.sales_rollups.aggregate(pipeline).to_list(length=None)
+
+        revenue = {
+            "seller_id": id,
+            "granularity": granularity,
+            "sales": sum(point["sales"] for point in series),
+            "revenue": sum(point["revenue"] for point in series),
+            "series": series
+        }
+
+        user_plans_logger.info('Receita do vendedor encontrada: points=%d latency_ms=%.1f', len(series), (time.perf_counter() - started_at) * 1000)
+        return MongoJSONResponse(revenue)
+
+    except Exception as e:
+        user_plans_logger.error('Erro ao buscar receita do vendedor: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar receita do vendedor')
+
+# Rota de receita e vendas de um vendedor por categoria
+@router.get('/analytics/sellers/{id}/categories')
+async def get_seller_categories(
+    id: str,
+    start: Optional[date] = Query(None, description="First day of the period (inclusive)"),
+    end: Optional[date] = Query(None, description="Last day of the period (inclusive)")
+):
+    try:
+        started_at = time.perf_counter()
+        user_plans_logger.info('Buscando vendas por categoria do vendedor: %s', id)
+
+        pipeline = [
+            {"$match": rollup_filter(id, start, end)},
+            {"$group": {"_id": "$category", "sales": {"$sum": "$sales"}, "revenue": {"$sum": "$revenue"}}},
+            {"$sort": {"revenue": -1, "_id": 1}},
+            {"$project": {"_id": 0, "category": "$_id", "sales": 1, "revenue": 1}}
+        ]
+        categories = await db.sales_rollups.aggregate(pipeline).to_list(length=None)
+
+        user_plans_logger.info('Vendas por categoria do vendedor encontradas: count=%d latency_ms=%.1f', len(categories), (time.perf_counter() - started_at) * 1000)
+        return MongoJSONResponse(categories)
+
+    except Exception as e:
+        user_plans_logger.error('Erro ao buscar vendas por categoria do vendedor: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar vendas por categoria do vendedor')
+
+# Rota dos planos mais vendidos de um vendedor
+@router.get('/analytics/sellers/{id}/top_plans')
+async def get_seller_top_plans(
+    id: str,
+    start: Optional[date] = Query(None, description="First day of the period (inclusive)"),
+    end: Optional[date] = Query(None, description="Last day of the period (inclusive)"),
+    sort_by: Optional[Literal["revenue", "sales"]] = Query("revenue", description="Sort by field"),
+    limit: Optional[int] = Query(10, ge=1, le=100, description="Number of plans")
+):
+    try:
+        started_at = time.perf_counter()
+        user_plans_logger.info('Buscando planos mais vendidos do vendedor: %s', id)
+
+        pipeline = [
+            {"$match": rollup_filter(id, start, end)},
+            {"$group": {"_id": "$plan_id", "sales": {"$sum": "$sales"}, "revenue": {"$sum": "$revenue"}}},
+            {"$sort": {sort_by: -1, "_id": 1}},
+            {"$limit": limit},
+            # O título é buscado apenas para os planos retornados
+            {
+                "$lookup": {
+                    "from": "plans",
+                    "let": {"plan_id": {"$convert": {"input": "$_id", "to": "objectId", "onError": None}}},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$eq": ["$_id", "$$plan_id"]}}},
+                        {"$project": {"title": 1}}
+                    ],
+                    "as": "plan"
+                }
+            },
+            {"$project": {"_id": 0, "plan_id": "$_id", "title": {"$arrayElemAt": ["$plan.title", 0]}, "sales": 1, "revenue": 1}}
+        ]
+        plans = await db.sales_rollups.aggregate(pipeline).to_list(length=limit)
+
+        user_plans_logger.info('Planos mais vendidos do vendedor encontrados: count=%d latency_ms=%.1f', len(plans), (time.perf_counter() - started_at) * 1000)
+        return MongoJSONResponse(plans)
+
+    except Exception as e:
+        user_plans_logger.error('Erro ao buscar planos mais vendidos do vendedor: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar planos mais vendidos do vendedor')
@@ -0,0 +1,210 @@
+import asyncio
+import time
+from typing import Literal, Optional
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from database import db
+from models.exercise import Exercise
+from models.plan import Plan
+from models.plan_workouts import PlanWorkouts
+from models.workout import Workout
+from services.configs import exercises_logger, plan_workouts_logger, plans_logger, workouts_logger
+from utils.conditional import bump_version
+from utils.counters import COUNTED_RELATIONS, document_counter_keys, increment_counters
+from utils.plan_summaries import refresh_plan_summaries, refresh_workout_summaries, schedule_refresh
+from utils.references import find_existing_ids
+
+'''
+    Importação em massa. O corpo pode ser um array JSON ou NDJSON (Content-Type application/x-ndjson),
+    que é lido em fluxo. As linhas são processadas em lotes de batch_size: cada lote é validado com os
+    modelos, as referências são resolvidas com uma consulta $in por coleção referenciada e os documentos
+    válidos são gravados com um único insert_many não ordenado. Linhas inválidas não interrompem a
+    importação e são reportadas individualmente pela posição (a partir de 0).
+'''
+
+# Criar roteador
+router = APIRouter()
+
+# Modelo, referências (campo -> coleção), logger e atualização dos resumos dos planos
+# (função e campo com os ids afetados) de cada coleção importável
+BULK_COLLECTIONS = {
+    "plans": {"model": Plan, "references": {"seller_id": "users"}, "logger": plans_logger, "summaries": (refresh_plan_summaries, "_id")},
+    "workouts": {"model": Workout, "references": {}, "logger": workouts_logger, "summaries": None},
+    "exercises": {"model": Exercise, "references": {"workout_id": "workouts"}, "logger": exercises_logger, "summaries": (refresh_workout_summaries, "workout_id")},
+    "plan_workouts": {"model": PlanWorkouts, "references": {"plan_id": "plans", "workout_id": "workouts"}, "logger": plan_workouts_logger, "summaries": (refresh_plan_summaries, "plan_id")},
+}
+
+# Tipos de conteúdo lidos como NDJSON
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-lines")
+
+# Resumo de um erro de validação do Pydantic
+def validation_messages(error):
+    return [{"field": ".".join(str(part) for part in item["loc"]), "message": item["msg"]} for item in error.errors()]
+
+# Lê as linhas do corpo: NDJSON em fluxo ou array JSON completo
+async def read_rows(request):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if content_type in NDJSON_TYPES:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+
+        if buffer.strip():
+            yield buffer
+        return
+
+    # O array é validado antes de qualquer lote ser gravado
+    try:
+        rows = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f'JSON inválido: {e}')
+
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail='O corpo deve ser um array JSON ou NDJSON')
+
+    for row in rows:
+        yield row
+
+# Importa um lote: validação, resolução das referências e insert_many não ordenado
+async def import_batch(collection, rows, offset):
+    config = BULK_COLLECTIONS[collection]
+    errors = []
+    documents = []
+    positions = []
+
+    for position, row in enumerate(rows, start=offset):
+        try:
+            if isinstance(row, bytes):
+                row = orjson.loads(row)
+        except orjson.JSONDecodeError as e:
+            errors.append({"row": position, "errors": [{"field": None, "message": f'JSON inválido: {e}'}]})
+            continue
+
+        if not isinstance(row, dict):
+            errors.append({"row": position, "errors": [{"field": None, "message": 'A linha deve ser um objeto JSON'}]})
+            continue
+
+        try:
+            document = config["model"](**row).dict(by_alias=True, exclude={"id"})
+        except ValidationError as e:
+            errors.append({"row": position, "errors": validation_messages(e)})
+            continue
+
+        documents.append(document)
+        positions.append(position)
+
+    # Uma consulta $in por coleção referenciada, com os ids de todo o lote
+    references = config["references"]
+    ids_by_collection = {}
+    for document in documents:
+        for field, referenced in references.items():
+            try:
+                ids_by_collection.setdefault(referenced, set()).add(ObjectId(document[field]))
+            except (InvalidId, TypeError):
+                pass
+
+    referenced_collections = list(ids_by_collection)
+    results = await asyncio.gather(*[find_existing_ids(referenced, ids_by_collection[referenced]) for referenced in referenced_collections])
+    existing = {referenced: {str(id) for id in ids} for referenced, ids in zip(referenced_collections, results)}
+
+    valid_documents = []
+    valid_positions = []
+    for document, position in zip(documents, positions):
+        missing = [field for field, referenced in references.items() if document[field] not in existing.get(referenced, ())]
+        if missing:
+            errors.append({"row": position, "errors": [{"field": field, "message": f'Referência não encontrada: {document[field]}'} for field in missing]})
+            continue
+
+        valid_documents.append(document)
+        valid_positions.append(position)
+
+    if not valid_documents:
+        return [], errors
+
+    failed = set()
+    try:
+        await db[collection].insert_many(valid_documents, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            failed.add(write_error["index"])
+            errors.append({"row": valid_positions[write_error["index"]], "errors": [{"field": None, "message": write_error["errmsg"]}]})
+
+    inserted = [document for index, document in enumerate(valid_documents) if index not in failed]
+    return inserted, errors
+
+# Rota de importação em massa
+@router.post('/bulk/{collection}')
+async def bulk_import(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    collection: Literal["plans", "workouts", "exercises", "plan_workouts"],
+    batch_size: Optional[int] = Query(1000, ge=1, le=10000, description="Number of rows validated and inserted per batch"),
+    max_errors: Optional[int] = Query(1000, ge=0, le=100000, description="Maximum number of row errors returned")
+):
+    logger = BULK_COLLECTIONS[collection]["logger"]
+    summaries = BULK_COLLECTIONS[collection]["summaries"]
+
+    try:
+        started_at = time.perf_counter()
+        logger.info('Importando %s em massa', collection)
+
+        inserted = 0
+        failed = 0
+        errors = []
+        affected_ids = set()
+
+        # Contadores e versão da coleção são atualizados a cada lote gravado
+        async def flush(batch, offset):
+            nonlocal inserted, failed
+            documents, batch_errors = await import_batch(collection, batch, offset)
+            inserted += len(documents)
+            failed += len(batch_errors)
+            errors.extend(sorted(batch_errors, key=lambda error: error["row"])[:max(max_errors - len(errors), 0)])
+
+            if documents:
+                amounts = {}
+                if collection in COUNTED_RELATIONS:
+                    for document in documents:
+                        for key in document_counter_keys(collection, document):
+                            amounts[key] = amounts.get(key, 0) + 1
+
+                await asyncio.gather(increment_counters(amounts), bump_version(collection))
+
+                if summaries:
+                    affected_ids.update(document[summaries[1]] for document in documents)
+
+        offset = 0
+        batch = []
+        async for row in read_rows(request):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await flush(batch, offset)
+                offset += len(batch)
+                batch = []
+
+        if batch:
+            await flush(batch, offset)
+
+        # Os resumos dos planos afetados são atualizados uma única vez, após a resposta
+        if affected_ids:
+            schedule_refresh(background_tasks, logger, summaries[0], affected_ids)
+
+        logger.info('Importação de %s concluída: inserted=%d failed=%d latency_ms=%.1f', collection, inserted, failed, (time.perf_counter() - started_at) * 1000)
+        return {"inserted": inserted, "failed": failed, "errors": errors}
+
+    except HTTPException as e:
+        logger.warning('Corpo inválido na importação de %s em massa: %s', collection, e.detail)
+        raise
+
+    except Exception as e:
+        logger.error('Erro ao importar %s em massa: %s', collection, e)
+        raise HTTPException(status_code=500, detail=f'Erro ao importar {collection} em massa')
@@ -1,7 +1,10 @@
 import logging
 import logging.config
+import os
 import yaml
+from utils.async_logging import setup_queue_logging
 from utils.generate_logs import generate_logs
+from utils.log_summary import PAYLOAD_POLICIES
 
 # Inicializando arquivos de logs
 generate_logs();
@@ -9,6 +12,8 @@ generate_logs();
 # Carregar configuração do arquivo YAML
 with open('./services/configs.logs.yaml', 'r') as file:
     config = yaml.safe_load(file)
+    async_logging = config.pop("async_logging", True)
+    PAYLOAD_POLICIES.update(config.pop("payload_policies", {}))
     logging.config.dictConfig(config)
 
 # Criar loggers específicos
@@ -17,4 +22,9 @@ plans_logger = logging.getLogger("plans")
 workouts_logger = logging.getLogger("workouts")
 exercises_logger = logging.getLogger("exercises")
 user_plans_logger = logging.getLogger("user_plans")
-plan_workouts_logger = logging.getLogger("plan_workouts")
\ No newline at end of file
+plan_workouts_logger = logging.getLogger("plan_workouts")
+database_logger = logging.getLogger("database")
+
+# Modo assíncrono: a variável de ambiente LOG_ASYNC sobrescreve a configuração do YAML
+if os.getenv("LOG_ASYNC", str(async_logging)).lower() in ("1", "true", "yes"):
+    log_listener = setup_queue_logging(config.get("loggers", {}).keys())
@@ -1,112 +1,171 @@
+import time
+from datetime import datetime, timezone
 from typing import Literal, Optional
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from pymongo import ReturnDocument
 from database import db
 from models.exercise import Exercise
+from models.multi_get import MultiGet
 from services.configs import exercises_logger
+from utils.cache import get_cache
+from utils.conditional import bump_version, document_validators, is_not_modified, list_validators, not_modified_response, validator_headers
+from utils.counters import count_document, get_counter
+from utils.log_summary import log_documents, log_payload
+from utils.multi_get import find_by_ids
+from utils.pagination import find_page, has_text_search
+from utils.plan_summaries import refresh_workout_summaries, schedule_refresh
+from utils.projection import apply_projection, detail_projection, list_projection
+from utils.references import validate_references
+from utils.responses import MongoJSONResponse, as_stored
+from utils.single_flight import flight_key, get_single_flight
 
 # Criar roteador
 router = APIRouter()
 
+# Cache das buscas por id
+exercises_cache = get_cache("exercises")
+
+# Coalescência das leituras idênticas concorrentes
+exercises_flight = get_single_flight("exercises")
+
 # Rota de criação de um novo exercício
 @router.post('/exercises')
-async def create_exercise(exercise: Exercise):
+async def create_exercise(exercise: Exercise, background_tasks: BackgroundTasks):
     try:
-        exercises_logger.info(f'Criando exercício: {exercise}')
-        workout = await db.workouts.find_one({"_id": ObjectId(exercise.workout_id)})
-        if not workout:
-            exercises_logger.warning(f'Treino não encontrado: {exercise.workout_id}')
-            raise HTTPException(status_code=404, detail='Treino não encontrado')
+        started_at = time.perf_counter()
+        log_payload(exercises_logger, 'Criando exercício', exercise)
+        await validate_references([("workouts", exercise.workout_id, 'Treino não encontrado')], exercises_logger)
         
         exercise_dict = exercise.dict(by_alias=True, exclude={"id"})
         new_exercise = await db.exercises.insert_one(exercise_dict)
-
-        created_exercise = await db.exercises.find_one({"_id": new_exercise.inserted_id})
-        if not created_exercise:
-            raise HTTPException(status_code=500, detail='Erro ao criar exercício')
-
-        created_exercise["_id"] = str(created_exercise["_id"])
-        exercises_logger.info(f'Exercício criado com sucesso: {created_exercise}')
-        return created_exercise
+        await count_document("exercises", exercise_dict)
+        await bump_version("exercises")
+        schedule_refresh(background_tasks, exercises_logger, refresh_workout_summaries, [exercise.workout_id])
+        
+        created_exercise = as_stored({**exercise_dict, "_id": new_exercise.inserted_id})
+        log_documents(exercises_logger, 'Exercício criado com sucesso', created_exercise, started_at)
+        return MongoJSONResponse(created_exercise)
 
     except Exception as e:
-        exercises_logger.error(f'Erro ao criar exercício: {e}')
+        exercises_logger.error('Erro ao criar exercício: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao criar exercício')
     
 # Rota de atualização de um exercício
 @router.put('/exercises/{id}')
-async def update_exercise(id: str, exercise: Exercise):
+async def update_exercise(id: str, exercise: Exercise, background_tasks: BackgroundTasks):
     try:
-        exercises_logger.info(f'Atualizando exercício: {exercise}')
-        workout = await db.workouts.find_one({"_id": ObjectId(exercise.workout_id)})
-        if not workout:
-            exercises_logger.warning(f'Treino não encontrado: {exercise.workout_id}')
-            raise HTTPException(status_code=404, detail='Treino não encontrado')
+        started_at = time.perf_counter()
+        log_payload(exercises_logger, 'Atualizando exercício', exercise, id)
+        await validate_references([("workouts", exercise.workout_id, 'Treino não encontrado')], exercises_logger)
         
-        exercise_dict = exercise.dict(by_alias=True, exclude={"id"})
-        response = await db.exercises.update_one({"_id": ObjectId(id)}, {"$set": exercise_dict})
-
-        if response.matched_count == 0:
-            exercises_logger.warning(f'Exercício não encontrado: {id}')
+        # A data de criação é mantida e a de atualização é definida pelo servidor
+        exercise_dict = exercise.dict(by_alias=True, exclude={"id", "created_at"})
+        exercise_dict["updated_at"] = datetime.now(timezone.utc)
+        previous_exercise = await db.exercises.find_one_and_update({"_id": ObjectId(id)}, {"$set": exercise_dict}, return_document=ReturnDocument.BEFORE)
+        exercises_cache.invalidate(id)
+        await bump_version("exercises")
+        
+        if not previous_exercise:
+            exercises_logger.warning('Exercício não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Exercício não encontrado')
         
-        if response.modified_count == 0:
-            exercises_logger.warning(f'Nenhuma alteração foi feita no exercício: {exercise}')
-            raise HTTPException(status_code=500, detail='Nenhuma alteração foi feita no exercício')
-
-        updated_exercise = await db.exercises.find_one({"_id": ObjectId(id)})
-        updated_exercise["_id"] = str(updated_exercise["_id"])
-        exercises_logger.info(f'Exercício atualizado com sucesso: {updated_exercise}')
-        return updated_exercise
+        # O documento anterior é usado para mover o exercício entre os contadores de treino
+        if previous_exercise.get("workout_id") != exercise.workout_id:
+            await count_document("exercises", previous_exercise, -1)
+            await count_document("exercises", exercise_dict)
+        
+        schedule_refresh(background_tasks, exercises_logger, refresh_workout_summaries, {previous_exercise.get("workout_id"), exercise.workout_id})
+        
+        updated_exercise = {**previous_exercise, **exercise_dict}
+        log_documents(exercises_logger, 'Exercício atualizado com sucesso', updated_exercise, started_at)
+        return MongoJSONResponse(updated_exercise)
 
     except Exception as e:
-        exercises_logger.error(f'Erro ao atualizar exercício: {e}')
+        exercises_logger.error('Erro ao atualizar exercício: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao atualizar exercício')
     
 # Rota de exclusão de um exercício
 @router.delete('/exercises/{id}')
-async def delete_exercise(id: str):
+async def delete_exercise(id: str, background_tasks: BackgroundTasks):
     try:
-        exercises_logger.info(f'Excluindo exercício: {id}')
-        response = await db.exercises.delete_one({"_id": ObjectId(id)})
+        exercises_logger.info('Excluindo exercício: %s', id)
+        deleted_exercise = await db.exercises.find_one_and_delete({"_id": ObjectId(id)})
+        exercises_cache.invalidate(id)
+        await bump_version("exercises")
 
-        if response.deleted_count == 0:
-            exercises_logger.warning(f'Exercício não encontrado: {id}')
+        if not deleted_exercise:
+            exercises_logger.warning('Exercício não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Exercício não encontrado')
         
-        exercises_logger.info(f'Exercício excluído com sucesso: {id}')
+        await count_document("exercises", deleted_exercise, -1)
+        schedule_refresh(background_tasks, exercises_logger, refresh_workout_summaries, [deleted_exercise.get("workout_id")])
+        
+        exercises_logger.info('Exercício excluído com sucesso: %s', id)
         return {"message": "Exercício excluído com sucesso"}
 
     except Exception as e:
-        exercises_logger.error(f'Erro ao excluir exercício: {e}')
+        exercises_logger.error('Erro ao excluir exercício: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao excluir exercício')
     
 # Rota de busca de um exercício por id
 @router.get('/exercises/{id}')
-async def get_exercise(id: str):
+async def get_exercise(
+    request: Request,
+    id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
     try:
-        exercises_logger.info(f'Buscando exercício: {id}')
-        exercise = await db.exercises.find_one({"_id": ObjectId(id)})
-
-        if not exercise:
-            exercises_logger.warning(f'Exercício não encontrado: {id}')
-            raise HTTPException(status_code=404, detail='Exercício não encontrado')
+        started_at = time.perf_counter()
+        exercises_logger.info('Buscando exercício: %s', id)
+        exercise = exercises_cache.get(id)
+        if exercise is None:
+            generation = exercises_cache.generation(id)
+            exercise = await exercises_flight.do(flight_key("GET /exercises/{id}", id), lambda: db.exercises.find_one({"_id": ObjectId(id)}))
+            
+            if not exercise:
+                exercises_logger.warning('Exercício não encontrado: %s', id)
+                raise HTTPException(status_code=404, detail='Exercício não encontrado')
+            
+            exercises_cache.set(id, exercise, generation)
         
-        exercise["_id"] = str(exercise["_id"])
-        exercises_logger.info(f'Exercício encontrado com sucesso: {exercise}')
-        return exercise
+        # Validadores calculados sobre o documento completo (os campos solicitados fazem parte do ETag);
+        # a resposta 304 dispensa a projeção e a serialização do corpo
+        etag, last_modified = document_validators(request, exercise)
+        headers = validator_headers(etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(headers)
+        
+        # O cache guarda o documento completo; a projeção é aplicada na resposta
+        exercise = apply_projection(exercise, detail_projection("exercises", fields))
+        
+        log_documents(exercises_logger, 'Exercício encontrado com sucesso', exercise, started_at)
+        return MongoJSONResponse(exercise, headers=headers)
 
     except Exception as e:
-        exercises_logger.error(f'Erro ao buscar exercício: {e}')
+        exercises_logger.error('Erro ao buscar exercício: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar exercício')
 
-# Rota de listagem de exercícios
-@router.get('/exercises')
-async def get_exercises(
-    page: Optional[int] = Query(1, ge=1, description="Page number, starting from 1"),
-    limit: Optional[int] = Query(10, ge=1, le=100, description="Number of results per page (max 100)"),
-    sort_by: Optional[Literal["title", "n_sections", "n_reps", "weight"]] = Query(None, description="Sort by field"),
-    order_by: Optional[Literal["asc", "desc"]] = Query(None, description="Order by field"),
+# Rota de busca de vários exercícios por id em uma única consulta
+@router.post('/exercises/_mget')
+async def get_exercises_by_ids(
+    body: MultiGet,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
+    try:
+        started_at = time.perf_counter()
+        exercises_logger.info('Buscando exercícios por ids: %d', len(body.ids))
+        exercises = await find_by_ids(db.exercises, body.ids, detail_projection("exercises", fields), cache=exercises_cache)
+        
+        log_documents(exercises_logger, 'Exercícios encontrados por ids', exercises["results"], started_at)
+        return MongoJSONResponse(exercises)
+    
+    except Exception as e:
+        exercises_logger.error('Erro ao buscar exercícios por ids: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar exercícios por ids')
+    
+# Filtros da listagem de exercícios, compartilhados com a exportação
+def exercise_filters(
     title: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by title"),
     min_sections: Optional[int] = Query(None, ge=0, description="Filter by minimum number of sections"),
     max_sections: Optional[int] = Query(None, ge=0, description="Filter by maximum number of sections"),
@@ -114,35 +173,53 @@ async def get_exercises(
     max_reps: Optional[int] = Query(None, ge=0, description="Filter by maximum number of repetitions"),
     min_weight: Optional[float] = Query(None, ge=0, description="Filter by minimum weight"),
     max_weight: Optional[float] = Query(None, ge=0, description="Filter by maximum weight")
+):
+    filters = []
+    
+    if title:
+        filters.append({"$text": {"$search": title}})
+    
+    if min_sections:
+        filters.append({"n_sections": {"$gte": min_sections}})
+    
+    if max_sections:
+        filters.append({"n_sections": {"$lte": max_sections}})
+    
+    if min_reps:
+        filters.append({"n_reps": {"$gte": min_reps}})
+    
+    if max_reps:
+        filters.append({"n_reps": {"$lte": max_reps}})
+    
+    if min_weight:
+        filters.append({"weight": {"$gte": min_weight}})
+    
+    if max_weight:
+        filters.append({"weight": {"$lte": max_weight}})
+    
+    return filters
+
+# Rota de listagem de exercícios
+@router.get('/exercises')
+async def get_exercises(
+    request: Request,
+    page: Optional[int] = Query(1, ge=1, description="Page number, starting from 1"),
+    limit: Optional[int] = Query(10, ge=1, le=100, description="Number of results per page (max 100)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    sort_by: Optional[Literal["title", "n_sections", "n_reps", "weight"]] = Query(None, description="Sort by field"),
+    order_by: Optional[Literal["asc", "desc"]] = Query(None, description="Order by field"),
+    filters: list = Depends(exercise_filters),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
 ):
     try:
-        exercises_logger.info(f'Buscando exercícios')
-        filters = []
-        
-        if title:
-            filters.append({"title": {"$regex": title, "$options": "i"}})
-      
-        if min_sections:
-            filters.append({"n_sections": {"$gte": min_sections}})
-        
-        if max_sections:
-            filters.append({"n_sections": {"$lte": max_sections}})
-        
-        if min_reps:
-            filters.append({"n_reps": {"$gte": min_reps}})
+        started_at = time.perf_counter()
+        exercises_logger.info('Buscando exercícios')
         
-        if max_reps:
-            filters.append({"n_reps": {"$lte": max_reps}})
-        
-        if min_weight:
-            filters.append({"weight": {"$gte": min_weight}})
-        
-        if max_weight:
-            filters.append({"weight": {"$lte": max_weight}})
-        
-        query = {"$and": filters} if filters else {}
-        
-        skip = (page - 1) * limit
+        # A versão da coleção permite responder 304 antes de consultar a coleção
+        etag, last_modified = await list_validators(request, "exercises")
+        validators = validator_headers(etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(validators)
         
         order_direction = None
         if order_by == "asc":
@@ -150,50 +227,52 @@ async def get_exercises(
         elif order_by == "desc":
             order_direction = -1
         
-        exercises = []
-        if sort_by and order_direction:
-            exercises = await db.exercises.find(query).sort(sort_by, order_direction).skip(skip).limit(limit).to_list(length=limit)
-        else:
-            exercises = await db.exercises.find(query).skip(skip).limit(limit).to_list(length=limit)
-        
-        for exercise in exercises:
-            exercise["_id"] = str(exercise["_id"])
+        projection = list_projection("exercises", fields, required=[sort_by])
+        exercises, next_cursor = await exercises_flight.do(
+            flight_key("GET /exercises", filters, page, limit, sort_by, order_direction, cursor, projection),
+            lambda: find_page(db.exercises, filters, page, limit, sort_by, order_direction, cursor, relevance=has_text_search(filters), projection=projection)
+        )
+        headers = {**validators, "X-Next-Cursor": next_cursor} if next_cursor else validators
         
         if len(exercises) > 0:
-            exercises_logger.info(f'Exercícios encontrados com sucesso: {exercises}')
-            return exercises
+            log_documents(exercises_logger, 'Exercícios encontrados com sucesso', exercises, started_at)
+            return MongoJSONResponse(exercises, headers=headers)
         else:
-            exercises_logger.warning(f'Nenhum exercício encontrado')
+            exercises_logger.warning('Nenhum exercício encontrado')
             raise HTTPException(status_code=404, detail='Nenhum exercício encontrado')
     
+    # Erros da requisição (ex.: cursor inválido) são mantidos
+    except HTTPException:
+        raise
+
     except Exception as e:
-        exercises_logger.error(f'Erro ao buscar exercícios: {e}')
+        exercises_logger.error('Erro ao buscar exercícios: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar exercícios')
     
 # Rota de quantidade de exercícios
 @router.get('/quantity/exercises')
 async def get_exercises_quantity():
     try:
-        exercises_logger.info(f'Buscando quantidade de exercícios')
-        quantity = await db.exercises.count_documents({})
+        exercises_logger.info('Buscando quantidade de exercícios')
+        quantity = await db.exercises.estimated_document_count()
 
-        exercises_logger.info(f'Quantidade de exercícios encontrada com sucesso: {quantity}')
+        exercises_logger.info('Quantidade de exercícios encontrada com sucesso: %s', quantity)
         return {"quantity": quantity}
 
     except Exception as e:
-        exercises_logger.error(f'Erro ao buscar quantidade de exercícios: {e}')
+        exercises_logger.error('Erro ao buscar quantidade de exercícios: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar quantidade de exercícios')
     
 # Rota de quantidade de exercícios por treino
 @router.get('/quantity/exercises/{id}')
 async def get_exercises_quantity_by_workout(id: str):
     try:
-        exercises_logger.info(f'Buscando quantidade de exercícios por treino: {id}')
-        quantity = await db.exercises.count_documents({"workout_id": id})
+        exercises_logger.info('Buscando quantidade de exercícios por treino: %s', id)
+        quantity = await get_counter("exercises", "workout_id", id)
 
-        exercises_logger.info(f'Quantidade de exercícios por treino encontrada com sucesso: {quantity}')
+        exercises_logger.info('Quantidade de exercícios por treino encontrada com sucesso: %s', quantity)
         return {"quantity": quantity}
 
     except Exception as e:
-        exercises_logger.error(f'Erro ao buscar quantidade de exercícios por treino: {e}')
+        exercises_logger.error('Erro ao buscar quantidade de exercícios por treino: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar quantidade de exercícios por treino')
\ No newline at end of file
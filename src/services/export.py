@@ -0,0 +1,139 @@
+import csv
+import io
+import time
+from datetime import datetime
+from typing import Literal, Optional
+import orjson
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from database import db
+from services.configs import exercises_logger, plans_logger, workouts_logger
+from services.exercises import exercise_filters
+from services.plans import plan_filters
+from services.workouts import workout_filters
+from utils.projection import ALLOWED_FIELDS, build_projection
+from utils.responses import encode_mongo_types
+
+'''
+    Exportação de coleções completas. Os documentos são lidos de um cursor do Motor em lotes de
+    batch_size e enviados à medida que chegam (NDJSON ou CSV), sem carregar a coleção em memória.
+    Cada rota aceita os mesmos filtros da listagem correspondente.
+'''
+
+# Criar roteador
+router = APIRouter()
+
+# Tipos de conteúdo de cada formato
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Conversão de um valor para uma célula do CSV
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value, default=encode_mongo_types).decode()
+    return value
+
+# Lotes em NDJSON: um documento JSON por linha
+def ndjson_batch(documents, columns):
+    return b"".join(orjson.dumps(document, default=encode_mongo_types) + b"\n" for document in documents)
+
+# Lotes em CSV, com as colunas na ordem dos campos do modelo
+def csv_batch(documents, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([csv_value(document.get(column)) for column in columns] for document in documents)
+    return buffer.getvalue().encode()
+
+# Lê o cursor em lotes e gera o conteúdo de cada lote
+async def stream_documents(cursor, format, columns, batch_size, logger, collection):
+    started_at = time.perf_counter()
+    encode = ndjson_batch if format == "ndjson" else csv_batch
+    exported = 0
+
+    try:
+        if format == "csv":
+            yield csv_batch([{column: column for column in columns}], columns)
+
+        batch = []
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                exported += len(batch)
+                yield encode(batch, columns)
+                batch = []
+
+        if batch:
+            exported += len(batch)
+            yield encode(batch, columns)
+
+        logger.info('Exportação de %s concluída: count=%d latency_ms=%.1f', collection, exported, (time.perf_counter() - started_at) * 1000)
+
+    except Exception as e:
+        # O status da resposta já foi enviado; a falha interrompe o conteúdo e é registrada
+        logger.error('Erro ao exportar %s após %d documentos: %s', collection, exported, e)
+        raise
+
+    finally:
+        await cursor.close()
+
+# Monta a resposta de exportação de uma coleção
+def export_collection(collection, filters, format, batch_size, fields, logger):
+    projection = build_projection(fields, ALLOWED_FIELDS[collection])
+    columns = [column for column in ALLOWED_FIELDS[collection] if not projection or column == "_id" or column in projection]
+
+    query = {"$and": filters} if filters else {}
+    cursor = db[collection].find(query, projection).sort("_id", 1).batch_size(batch_size)
+
+    logger.info('Exportando %s em %s', collection, format)
+    return StreamingResponse(
+        stream_documents(cursor, format, columns, batch_size, logger, collection),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{format}"'}
+    )
+
+# Parâmetros comuns das rotas de exportação
+def export_options(
+    format: Optional[Literal["ndjson", "csv"]] = Query("ndjson", description="Export format"),
+    batch_size: Optional[int] = Query(500, ge=1, le=10000, description="Number of documents read from the database per batch"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to export (default: all)")
+):
+    return {"format": format, "batch_size": batch_size, "fields": fields}
+
+# Rota de exportação de planos
+@router.get('/export/plans')
+async def export_plans(filters: list = Depends(plan_filters), options: dict = Depends(export_options)):
+    try:
+        return export_collection("plans", filters, logger=plans_logger, **options)
+
+    except Exception as e:
+        plans_logger.error('Erro ao exportar planos: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao exportar planos')
+
+# Rota de exportação de treinos
+@router.get('/export/workouts')
+async def export_workouts(filters: list = Depends(workout_filters), options: dict = Depends(export_options)):
+    try:
+        return export_collection("workouts", filters, logger=workouts_logger, **options)
+
+    except Exception as e:
+        workouts_logger.error('Erro ao exportar treinos: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao exportar treinos')
+
+# Rota de exportação de exercícios
+@router.get('/export/exercises')
+async def export_exercises(filters: list = Depends(exercise_filters), options: dict = Depends(export_options)):
+    try:
+        return export_collection("exercises", filters, logger=exercises_logger, **options)
+
+    except Exception as e:
+        exercises_logger.error('Erro ao exportar exercícios: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao exportar exercícios')
@@ -0,0 +1,70 @@
+import time
+from typing import Literal, Optional
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from database import db
+from services.configs import plans_logger
+from services.plans import plan_filters
+from utils.log_summary import log_documents
+from utils.pagination import find_page, has_text_search
+from utils.responses import MongoJSONResponse
+
+# Criar roteador
+router = APIRouter()
+
+# Rota de busca do resumo de um plano por id
+@router.get('/plan_summaries/{id}')
+async def get_plan_summary(id: str):
+    try:
+        started_at = time.perf_counter()
+        plans_logger.info('Buscando resumo do plano: %s', id)
+        summary = await db.plan_summaries.find_one({"_id": ObjectId(id)})
+
+        if not summary:
+            plans_logger.warning('Resumo do plano não encontrado: %s', id)
+            raise HTTPException(status_code=404, detail='Resumo do plano não encontrado')
+
+        log_documents(plans_logger, 'Resumo do plano encontrado', summary, started_at)
+        return MongoJSONResponse(summary)
+
+    except Exception as e:
+        plans_logger.error('Erro ao buscar resumo do plano: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar resumo do plano')
+
+# Rota de listagem dos resumos dos planos (catálogo)
+@router.get('/plan_summaries')
+async def get_plan_summaries(
+    page: Optional[int] = Query(1, ge=1, description="Page number, starting from 1"),
+    limit: Optional[int] = Query(10, ge=1, le=100, description="Number of results per page (max 100)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    sort_by: Optional[Literal["title", "price", "buyers", "volume"]] = Query(None, description="Sort by field"),
+    order_by: Optional[Literal["asc", "desc"]] = Query(None, description="Order by field"),
+    filters: list = Depends(plan_filters)
+):
+    try:
+        started_at = time.perf_counter()
+        plans_logger.info('Buscando resumos dos planos')
+
+        order_direction = None
+        if order_by == "asc":
+            order_direction = 1
+        elif order_by == "desc":
+            order_direction = -1
+
+        summaries, next_cursor = await find_page(db.plan_summaries, filters, page, limit, sort_by, order_direction, cursor, relevance=has_text_search(filters))
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+
+        if len(summaries) > 0:
+            log_documents(plans_logger, 'Resumos dos planos encontrados com sucesso', summaries, started_at)
+            return MongoJSONResponse(summaries, headers=headers)
+        else:
+            plans_logger.warning('Nenhum resumo de plano encontrado')
+            raise HTTPException(status_code=404, detail='Nenhum resumo de plano encontrado')
+
+    # Erros da requisição (ex.: cursor inválido) são mantidos
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        plans_logger.error('Erro ao buscar resumos dos planos: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar resumos dos planos')
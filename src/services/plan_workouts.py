@@ -1,86 +1,91 @@
+import time
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 from database import db
 from models.plan_workouts import PlanWorkouts
 from services.configs import plan_workouts_logger
+from utils.counters import count_document, get_counter
+from utils.log_summary import log_documents, log_payload
+from utils.plan_summaries import refresh_plan_summaries, schedule_refresh
+from utils.references import validate_references
+from utils.responses import MongoJSONResponse, as_stored
+from utils.single_flight import forget_flights
 
 # Criar roteador
 router = APIRouter()
 
 # Rota de criação de um novo treino do plano
 @router.post('/plan_workouts')
-async def create_plan_workout(plan_workout: PlanWorkouts):
+async def create_plan_workout(plan_workout: PlanWorkouts, background_tasks: BackgroundTasks):
     try:
-        plan_workouts_logger.info(f'Criando treino do plano: {plan_workout}')
+        started_at = time.perf_counter()
+        log_payload(plan_workouts_logger, 'Criando treino do plano', plan_workout)
         
-        plan = await db.plans.find_one({"_id": ObjectId(plan_workout.plan_id)})
-        if not plan:
-            plan_workouts_logger.warning(f'Plano não encontrado: {plan_workout.plan_id}')
-            raise HTTPException(status_code=404, detail='Plano não encontrado')
-        
-        workout = await db.workouts.find_one({"_id": ObjectId(plan_workout.workout_id)})
-        if not workout:
-            plan_workouts_logger.warning(f'Treino não encontrado: {plan_workout.workout_id}')
-            raise HTTPException(status_code=404, detail='Treino não encontrado')
+        await validate_references([
+            ("plans", plan_workout.plan_id, 'Plano não encontrado'),
+            ("workouts", plan_workout.workout_id, 'Treino não encontrado')
+        ], plan_workouts_logger)
         
         plan_workout_dict = plan_workout.dict(by_alias=True, exclude={"id"})
         response = await db.plan_workouts.insert_one(plan_workout_dict)
-
-        created_plan_workout = await db.plan_workouts.find_one({"_id": response.inserted_id})
-        if not created_plan_workout:
-            plan_workouts_logger.error(f'Erro ao criar treino do plano: {plan_workout}')
-            raise HTTPException(status_code=500, detail='Erro ao criar treino do plano')
-
-        created_plan_workout["_id"] = str(created_plan_workout["_id"])
-        plan_workouts_logger.info(f'Treino do plano criado com sucesso: {created_plan_workout}')
-        return created_plan_workout
+        await count_document("plan_workouts", plan_workout_dict)
+        forget_flights("plan_workouts")
+        schedule_refresh(background_tasks, plan_workouts_logger, refresh_plan_summaries, [plan_workout.plan_id])
+        
+        created_plan_workout = as_stored({**plan_workout_dict, "_id": response.inserted_id})
+        log_documents(plan_workouts_logger, 'Treino do plano criado com sucesso', created_plan_workout, started_at)
+        return MongoJSONResponse(created_plan_workout)
 
     except Exception as e:
-        plan_workouts_logger.error(f'Erro ao criar treino do plano: {e}')
+        plan_workouts_logger.error('Erro ao criar treino do plano: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao criar treino do plano')
     
 # Rota de remoção de treino de plano
 @router.delete('/plan_workouts/{id}')
-async def delete_plan_workout(id: str):
+async def delete_plan_workout(id: str, background_tasks: BackgroundTasks):
     try:
-        plan_workouts_logger.info(f'Excluindo treino do plano: {id}')
-        response = await db.plan_workouts.delete_one({"_id": ObjectId(id)})
+        plan_workouts_logger.info('Excluindo treino do plano: %s', id)
+        deleted_plan_workout = await db.plan_workouts.find_one_and_delete({"_id": ObjectId(id)})
 
-        if response.deleted_count == 0:
-            plan_workouts_logger.warning(f'Treino do plano não encontrado: {id}')
+        if not deleted_plan_workout:
+            plan_workouts_logger.warning('Treino do plano não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Treino do plano não encontrado')
+        
+        await count_document("plan_workouts", deleted_plan_workout, -1)
+        forget_flights("plan_workouts")
+        schedule_refresh(background_tasks, plan_workouts_logger, refresh_plan_summaries, [deleted_plan_workout["plan_id"]])
 
-        plan_workouts_logger.info(f'Treino do plano excluído com sucesso: {id}')
+        plan_workouts_logger.info('Treino do plano excluído com sucesso: %s', id)
         return {"message": "Treino do plano excluído com sucesso"}
 
     except Exception as e:
-        plan_workouts_logger.error(f'Erro ao excluir treino do plano: {e}')
+        plan_workouts_logger.error('Erro ao excluir treino do plano: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao excluir treino do plano')
     
 # Rota de quantidade de treinos dos planos
 @router.get('/quantity/plan_workouts')
 async def get_plan_workouts_quantity():
     try:
-        plan_workouts_logger.info(f'Buscando quantidade de treinos dos planos')
-        quantity = await db.plan_workouts.count_documents({})
+        plan_workouts_logger.info('Buscando quantidade de treinos dos planos')
+        quantity = await db.plan_workouts.estimated_document_count()
 
-        plan_workouts_logger.info(f'Quantidade de treinos dos planos encontrada com sucesso: {quantity}')
+        plan_workouts_logger.info('Quantidade de treinos dos planos encontrada com sucesso: %s', quantity)
         return {"quantity": quantity}
 
     except Exception as e:
-        plan_workouts_logger.error(f'Erro ao buscar quantidade de treinos dos planos: {e}')
+        plan_workouts_logger.error('Erro ao buscar quantidade de treinos dos planos: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar quantidade de treinos dos planos')
     
 # Rota de quantidade de treinos do plano
 @router.get('/quantity/plan_workouts/{id}')
 async def get_workouts_quantity_by_plan(id: str):
     try:
-        plan_workouts_logger.info(f'Buscando quantidade de treinos do plano: {id}')
-        quantity = await db.plan_workouts.count_documents({"plan_id": id})
+        plan_workouts_logger.info('Buscando quantidade de treinos do plano: %s', id)
+        quantity = await get_counter("plan_workouts", "plan_id", id)
 
-        plan_workouts_logger.info(f'Quantidade de treinos do plano encontrada com sucesso: {quantity}')
+        plan_workouts_logger.info('Quantidade de treinos do plano encontrada com sucesso: %s', quantity)
         return {"quantity": quantity}
 
     except Exception as e:
-        plan_workouts_logger.error(f'Erro ao buscar quantidade de treinos do plano: {e}')
+        plan_workouts_logger.error('Erro ao buscar quantidade de treinos do plano: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar quantidade de treinos do plano')
\ No newline at end of file
@@ -1,144 +1,361 @@
+import time
+from datetime import datetime, timezone
 from typing import Literal, Optional
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from pymongo import ReturnDocument
 from database import db
+from models.multi_get import MultiGet
 from models.plan import Plan
 from services.configs import plans_logger
+from utils.cache import get_cache
+from utils.conditional import bump_version, document_validators, is_not_modified, list_validators, not_modified_response, validator_headers
+from utils.counters import discount_matching
+from utils.log_summary import log_documents, log_payload
+from utils.multi_get import find_by_ids
+from utils.pagination import find_page, has_text_search, sort_keys
+from utils.plan_summaries import refresh_plan_summaries, schedule_refresh
+from utils.projection import ALLOWED_FIELDS, apply_projection, build_projection, detail_projection, list_projection
+from utils.references import validate_references
+from utils.responses import MongoJSONResponse, as_stored
+from utils.single_flight import flight_key, get_single_flight
 
 # Criar roteador
 router = APIRouter()
 
+# Cache das buscas por id
+plans_cache = get_cache("plans")
+
+# Coalescência das leituras idênticas concorrentes
+plans_flight = get_single_flight("plans")
+
 # Rota de criação de um novo plano
 @router.post('/plans')
-async def create_plan(plan: Plan):
+async def create_plan(plan: Plan, background_tasks: BackgroundTasks):
     try:
-        plans_logger.info(f'Criando plano: {plan}')
+        started_at = time.perf_counter()
+        log_payload(plans_logger, 'Criando plano', plan)
         
-        seller = await db.users.find_one({"_id": ObjectId(plan.seller_id)})
-        if not seller:
-            plans_logger.warning(f'Vendedor não encontrado: {plan.seller_id}')
-            raise HTTPException(status_code=404, detail='Vendedor não encontrado')
+        await validate_references([("users", plan.seller_id, 'Vendedor não encontrado')], plans_logger)
         
         plan_dict = plan.dict(by_alias=True, exclude={"id"})
         response = await db.plans.insert_one(plan_dict)
+        await bump_version("plans")
+        schedule_refresh(background_tasks, plans_logger, refresh_plan_summaries, [response.inserted_id])
         
-        created_plan = await db.plans.find_one({"_id": response.inserted_id})
-        if not created_plan:
-            plans_logger.error(f'Erro ao criar plano: {plan}')
-            raise HTTPException(status_code=500, detail='Erro ao criar plano')
-        
-        created_plan["_id"] = str(created_plan["_id"])
-        plans_logger.info(f'Plano criado com sucesso: {created_plan}')
-        return created_plan
+        created_plan = as_stored({**plan_dict, "_id": response.inserted_id})
+        log_documents(plans_logger, 'Plano criado com sucesso', created_plan, started_at)
+        return MongoJSONResponse(created_plan)
     
     except Exception as e:
-        plans_logger.error(f'Erro ao criar plano: {e}')
+        plans_logger.error('Erro ao criar plano: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao criar plano')
     
 # Rota de atualização de um plano
 @router.put('/plans/{id}')
-async def update_plan(id: str, plan: Plan):
+async def update_plan(id: str, plan: Plan, background_tasks: BackgroundTasks):
     try:
-        plans_logger.info(f'Atualizando plano: {plan}')
+        started_at = time.perf_counter()
+        log_payload(plans_logger, 'Atualizando plano', plan, id)
         
-        seller = await db.users.find_one({"_id": ObjectId(plan.seller_id)})
-        if not seller:
-            plans_logger.warning(f'Vendedor não encontrado: {plan.seller_id}')
-            raise HTTPException(status_code=404, detail='Vendedor não encontrado')
+        await validate_references([("users", plan.seller_id, 'Vendedor não encontrado')], plans_logger)
         
-        plan_dict = plan.dict(by_alias=True, exclude={"id"})
-        response = await db.plans.update_one({"_id": ObjectId(id)}, {"$set": plan_dict})
+        # A data de criação é mantida e a de atualização é definida pelo servidor
+        plan_dict = plan.dict(by_alias=True, exclude={"id", "created_at"})
+        plan_dict["updated_at"] = datetime.now(timezone.utc)
+        updated_plan = await db.plans.find_one_and_update({"_id": ObjectId(id)}, {"$set": plan_dict}, return_document=ReturnDocument.AFTER)
+        plans_cache.invalidate(id)
+        await bump_version("plans")
         
-        if response.matched_count == 0:
-            plans_logger.warning(f'Plano não encontrado: {id}')
+        if not updated_plan:
+            plans_logger.warning('Plano não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Plano não encontrado')
         
-        if response.modified_count == 0:
-            plans_logger.warning(f'Nenhuma alteração foi feita no plano: {plan}')
-            raise HTTPException(status_code=500, detail='Nenhuma alteração foi feita no plano')
+        schedule_refresh(background_tasks, plans_logger, refresh_plan_summaries, [id])
         
-        updated_plan = await db.plans.find_one({"_id": ObjectId(id)})
-        updated_plan["_id"] = str(updated_plan["_id"])
-        plans_logger.info(f'Plano atualizado com sucesso: {updated_plan}')
-        return updated_plan
+        log_documents(plans_logger, 'Plano atualizado com sucesso', updated_plan, started_at)
+        return MongoJSONResponse(updated_plan)
     
     except Exception as e:
-        plans_logger.error(f'Erro ao atualizar plano: {e}')
+        plans_logger.error('Erro ao atualizar plano: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao atualizar plano')
     
 # Rota de exclusão de um plano
 @router.delete('/plans/{id}')
-async def delete_plan(id: str):
+async def delete_plan(id: str, background_tasks: BackgroundTasks):
     try:
-        plans_logger.info(f'Excluindo plano: {id}')
+        plans_logger.info('Excluindo plano: %s', id)
+        await discount_matching("user_plans", {"plan_id": ObjectId(id)})
         await db.user_plans.delete_many({"plan_id": ObjectId(id)})
         response = await db.plans.delete_one({"_id": ObjectId(id)})
+        plans_cache.invalidate(id)
+        await bump_version("plans")
         
         if response.deleted_count == 0:
-            plans_logger.warning(f'Plano não encontrado: {id}')
+            plans_logger.warning('Plano não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Plano não encontrado')
         
-        plans_logger.info(f'Plano excluído com sucesso: {id}')
+        schedule_refresh(background_tasks, plans_logger, refresh_plan_summaries, [id])
+        
+        plans_logger.info('Plano excluído com sucesso: %s', id)
         return {"message": "Plano excluído com sucesso"}
     
     except Exception as e:
-        plans_logger.error(f'Erro ao excluir plano: {e}')
+        plans_logger.error('Erro ao excluir plano: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao excluir plano')
     
 # Rota de busca de um plano por id
 @router.get('/plans/{id}')
-async def get_plan(id: str):
+async def get_plan(
+    request: Request,
+    id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
     try:
-        plans_logger.info(f'Buscando plano: {id}')
-        plan = await db.plans.find_one({"_id": ObjectId(id)})
+        started_at = time.perf_counter()
+        plans_logger.info('Buscando plano: %s', id)
+        plan = plans_cache.get(id)
+        if plan is None:
+            generation = plans_cache.generation(id)
+            plan = await plans_flight.do(flight_key("GET /plans/{id}", id), lambda: db.plans.find_one({"_id": ObjectId(id)}))
+            
+            if not plan:
+                plans_logger.warning('Plano não encontrado: %s', id)
+                raise HTTPException(status_code=404, detail='Plano não encontrado')
+            
+            plans_cache.set(id, plan, generation)
         
-        if not plan:
-            plans_logger.warning(f'Plano não encontrado: {id}')
-            raise HTTPException(status_code=404, detail='Plano não encontrado')
+        # Validadores calculados sobre o documento completo (os campos solicitados fazem parte do ETag);
+        # a resposta 304 dispensa a projeção e a serialização do corpo
+        etag, last_modified = document_validators(request, plan)
+        headers = validator_headers(etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(headers)
+        
+        # O cache guarda o documento completo; a projeção é aplicada na resposta
+        plan = apply_projection(plan, detail_projection("plans", fields))
         
-        plan["_id"] = str(plan["_id"])
-        plans_logger.info(f'Plano encontrado: {plan}')
-        return plan
+        log_documents(plans_logger, 'Plano encontrado', plan, started_at)
+        return MongoJSONResponse(plan, headers=headers)
     
     except Exception as e:
-        plans_logger.error(f'Erro ao buscar plano: {e}')
+        plans_logger.error('Erro ao buscar plano: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar plano')
     
+# Rota de busca de vários planos por id em uma única consulta
+@router.post('/plans/_mget')
+async def get_plans_by_ids(
+    body: MultiGet,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
+    try:
+        started_at = time.perf_counter()
+        plans_logger.info('Buscando planos por ids: %d', len(body.ids))
+        plans = await find_by_ids(db.plans, body.ids, detail_projection("plans", fields), cache=plans_cache)
+        
+        log_documents(plans_logger, 'Planos encontrados por ids', plans["results"], started_at)
+        return MongoJSONResponse(plans)
+    
+    except Exception as e:
+        plans_logger.error('Erro ao buscar planos por ids: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar planos por ids')
+    
+# Rota de busca de um plano completo (treinos e exercícios) em uma única agregação
+@router.get('/plans/{id}/full')
+async def get_full_plan(
+    id: str,
+    depth: Optional[int] = Query(2, ge=0, le=2, description="0: plan only, 1: plan and workouts, 2: plan, workouts and exercises"),
+    fields: Optional[str] = Query(None, description="Comma-separated plan fields to return"),
+    workout_fields: Optional[str] = Query(None, description="Comma-separated workout fields to return"),
+    exercise_fields: Optional[str] = Query(None, description="Comma-separated exercise fields to return"),
+    workouts_limit: Optional[int] = Query(50, ge=1, le=200, description="Maximum number of workouts"),
+    exercises_limit: Optional[int] = Query(50, ge=1, le=200, description="Maximum number of exercises per workout")
+):
+    try:
+        started_at = time.perf_counter()
+        plans_logger.info('Buscando plano completo: %s', id)
+        
+        pipeline = [{"$match": {"_id": ObjectId(id)}}]
+        
+        projection = detail_projection("plans", fields)
+        if projection:
+            pipeline.append({"$project": projection})
+        
+        if depth >= 1:
+            # Os ids de plan_workouts e exercises são armazenados como string
+            workout_pipeline = [{"$match": {"$expr": {"$eq": ["$_id", "$$workout_id"]}}}]
+            
+            projection = build_projection(workout_fields, ALLOWED_FIELDS["workouts"])
+            if projection:
+                workout_pipeline.append({"$project": projection})
+            
+            if depth >= 2:
+                exercise_pipeline = [
+                    {"$match": {"$expr": {"$eq": ["$workout_id", "$$workout_id"]}}},
+                    {"$limit": exercises_limit}
+                ]
+                
+                projection = build_projection(exercise_fields, ALLOWED_FIELDS["exercises"])
+                if projection:
+                    exercise_pipeline.append({"$project": projection})
+                
+                workout_pipeline.append({
+                    "$lookup": {
+                        "from": "exercises",
+                        "let": {"workout_id": {"$toString": "$_id"}},
+                        "pipeline": exercise_pipeline,
+                        "as": "exercises"
+                    }
+                })
+            
+            pipeline.append({
+                "$lookup": {
+                    "from": "plan_workouts",
+                    "let": {"plan_id": {"$toString": "$_id"}},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$eq": ["$plan_id", "$$plan_id"]}}},
+                        {"$limit": workouts_limit},
+                        {
+                            "$lookup": {
+                                "from": "workouts",
+                                "let": {"workout_id": {"$convert": {"input": "$workout_id", "to": "objectId", "onError": None}}},
+                                "pipeline": workout_pipeline,
+                                "as": "workout"
+                            }
+                        },
+                        {"$unwind": "$workout"},
+                        {"$replaceRoot": {"newRoot": "$workout"}}
+                    ],
+                    "as": "workouts"
+                }
+            })
+        
+        plans = await plans_flight.do(flight_key("GET /plans/{id}/full", pipeline), lambda: db.plans.aggregate(pipeline).to_list(length=1))
+        
+        if not plans:
+            plans_logger.warning('Plano não encontrado: %s', id)
+            raise HTTPException(status_code=404, detail='Plano não encontrado')
+        
+        plan = plans[0]
+        
+        log_documents(plans_logger, 'Plano completo encontrado', plan, started_at)
+        return MongoJSONResponse(plan)
+    
+    except Exception as e:
+        plans_logger.error('Erro ao buscar plano completo: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar plano completo')
+    
+# Filtros da listagem de planos, compartilhados com a exportação
+def plan_filters(
+    subject: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by subject"),
+    type: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by type"),
+    category: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by category"),
+    min_price: Optional[float] = Query(None, ge=0, description="Filter by minimum price"),
+    max_price: Optional[float] = Query(None, ge=0, description="Filter by maximum price")
+):
+    filters = []
+    
+    if subject:
+        filters.append({"$text": {"$search": subject}})
+    
+    if type:
+        filters.append({"type": type})
+    
+    if category:
+        filters.append({"category": category})
+    
+    if min_price:
+        filters.append({"price": {"$gte": min_price}})
+    
+    if max_price:
+        filters.append({"price": {"$lte": max_price}})
+    
+    return filters
+
 # Rota de lista de planos
 @router.get('/plans')
 async def get_plans(
+    request: Request,
     page: Optional[int] = Query(1, ge=1, description="Page number, starting from 1"),
     limit: Optional[int] = Query(10, ge=1, le=100, description="Number of results per page (max 100)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
     sort_by: Optional[Literal["title", "type", "category", "price"]] = Query(None, description="Sort by field"),
     order_by: Optional[Literal["asc", "desc"]] = Query(None, description="Order by field"),
-    subject: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by subject"),
-    type: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by type"),
-    category: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by category"),
-    min_price: Optional[float] = Query(None, ge=0, description="Filter by minimum price"),
-    max_price: Optional[float] = Query(None, ge=0, description="Filter by maximum price")
+    filters: list = Depends(plan_filters),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all but description)")
 ):
     try:
-        plans_logger.info(f'Buscando planos')
-        filters = []
+        started_at = time.perf_counter()
+        plans_logger.info('Buscando planos')
         
-        if subject:
-            filters.append({"$or": [{"title": {"$regex": subject, "$options": "i"}}, {"description": {"$regex": subject, "$options": "i"}}]})
+        # A versão da coleção permite responder 304 antes de consultar a coleção
+        etag, last_modified = await list_validators(request, "plans")
+        validators = validator_headers(etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(validators)
         
-        if type:
-            filters.append({"type": type})
-        
-        if category:
-            filters.append({"category": category})
-        
-        if min_price:
-            filters.append({"price": {"$gte": min_price}})
+        order_direction = None
+        if order_by == "asc":
+            order_direction = 1
+        elif order_by == "desc":
+            order_direction = -1
         
-        if max_price:
-            filters.append({"price": {"$lte": max_price}})
+        projection = list_projection("plans", fields, required=[sort_by])
+        plans, next_cursor = await plans_flight.do(
+            flight_key("GET /plans", filters, page, limit, sort_by, order_direction, cursor, projection),
+            lambda: find_page(db.plans, filters, page, limit, sort_by, order_direction, cursor, relevance=has_text_search(filters), projection=projection)
+        )
+        headers = {**validators, "X-Next-Cursor": next_cursor} if next_cursor else validators
         
-        query = {"$and": filters} if filters else {}
+        if len(plans) > 0:
+            log_documents(plans_logger, 'Planos encontrados com sucesso', plans, started_at)
+            return MongoJSONResponse(plans, headers=headers)
+        else:
+            plans_logger.warning('Nenhum plano encontrado')
+            raise HTTPException(status_code=404, detail='Nenhum plano encontrado')
+    
+    # Erros da requisição (ex.: cursor inválido) são mantidos
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        plans_logger.error('Erro ao buscar planos: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar planos')
+    
+# Faixas de preço das facetas: limites crescentes separados por vírgula
+def price_boundaries(
+    price_buckets: Optional[str] = Query("0,50,100,200,500", description="Comma-separated ascending price boundaries for the price facet")
+):
+    try:
+        boundaries = [float(value) for value in price_buckets.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail='Faixas de preço inválidas')
+    
+    if len(boundaries) < 2 or boundaries != sorted(set(boundaries)):
+        raise HTTPException(status_code=400, detail='As faixas de preço devem ter ao menos dois limites crescentes')
+    
+    return boundaries
+
+# Rota de busca facetada de planos: resultados, total e contagens por tipo, categoria e faixa de preço em uma única agregação
+@router.get('/search/plans')
+async def search_plans(
+    request: Request,
+    page: Optional[int] = Query(1, ge=1, description="Page number, starting from 1"),
+    limit: Optional[int] = Query(10, ge=1, le=100, description="Number of results per page (max 100)"),
+    sort_by: Optional[Literal["title", "type", "category", "price"]] = Query(None, description="Sort by field"),
+    order_by: Optional[Literal["asc", "desc"]] = Query(None, description="Order by field"),
+    filters: list = Depends(plan_filters),
+    boundaries: list = Depends(price_boundaries),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all but description)")
+):
+    try:
+        started_at = time.perf_counter()
+        plans_logger.info('Buscando planos com facetas')
         
-        skip = (page - 1) * limit
+        etag, last_modified = await list_validators(request, "plans")
+        validators = validator_headers(etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(validators)
         
         order_direction = None
         if order_by == "asc":
@@ -146,36 +363,83 @@ async def get_plans(
         elif order_by == "desc":
             order_direction = -1
         
-        plans = []
-        if sort_by and order_direction:
-            plans = await db.plans.find(query).sort(sort_by, order_direction).skip(skip).limit(limit).to_list(length=limit)
-        else:
-            plans = await db.plans.find(query).skip(skip).limit(limit).to_list(length=limit)
+        pipeline = [{"$match": {"$and": filters} if filters else {}}]
         
-        for plan in plans:
-            plan["_id"] = str(plan["_id"])
+        results = []
         
-        if len(plans) > 0:
-            plans_logger.info(f'Planos encontrados com sucesso: {plans}')
-            return plans
+        # Buscas textuais sem ordenação explícita são ordenadas pela relevância
+        ranked = has_text_search(filters) and not (sort_by and order_direction)
+        if ranked:
+            pipeline.append({"$set": {"score": {"$meta": "textScore"}}})
+            results.append({"$sort": {"score": -1, "_id": 1}})
         else:
-            plans_logger.warning(f'Nenhum plano encontrado')
-            raise HTTPException(status_code=404, detail='Nenhum plano encontrado')
+            results.append({"$sort": dict(sort_keys(sort_by, order_direction))})
+        
+        results += [{"$skip": (page - 1) * limit}, {"$limit": limit}]
+        
+        if ranked:
+            results.append({"$unset": "score"})
+        
+        projection = list_projection("plans", fields)
+        if projection:
+            results.append({"$project": projection})
+        
+        pipeline.append({
+            "$facet": {
+                "results": results,
+                "total": [{"$count": "count"}],
+                "types": [{"$group": {"_id": "$type", "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}],
+                "categories": [{"$group": {"_id": "$category", "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}],
+                "prices": [{
+                    "$bucket": {
+                        "groupBy": "$price",
+                        "boundaries": boundaries,
+                        "default": "other",
+                        "output": {"count": {"$sum": 1}}
+                    }
+                }]
+            }
+        })
+        
+        facets = (await plans_flight.do(flight_key("GET /search/plans", pipeline), lambda: db.plans.aggregate(pipeline).to_list(length=1)))[0]
+        
+        # Cada faixa é identificada pelo limite inferior; preços fora dos limites ficam na faixa sem limites
+        upper_bounds = dict(zip(boundaries, boundaries[1:]))
+        prices = [
+            {"min": None, "max": None, "count": bucket["count"]} if bucket["_id"] == "other"
+            else {"min": bucket["_id"], "max": upper_bounds[bucket["_id"]], "count": bucket["count"]}
+            for bucket in facets["prices"]
+        ]
+        
+        search = {
+            "results": facets["results"],
+            "total": facets["total"][0]["count"] if facets["total"] else 0,
+            "page": page,
+            "limit": limit,
+            "facets": {
+                "types": [{"value": group["_id"], "count": group["count"]} for group in facets["types"]],
+                "categories": [{"value": group["_id"], "count": group["count"]} for group in facets["categories"]],
+                "prices": prices
+            }
+        }
+        
+        log_documents(plans_logger, 'Busca facetada de planos concluída', search["results"], started_at)
+        return MongoJSONResponse(search, headers=validators)
     
     except Exception as e:
-        plans_logger.error(f'Erro ao buscar planos: {e}')
-        raise HTTPException(status_code=500, detail='Erro ao buscar planos')
+        plans_logger.error('Erro ao buscar planos com facetas: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar planos com facetas')
     
 # Rota de quantidade de planos
 @router.get('/quantity/plans')
 async def get_plans_quantity():
     try:
-        plans_logger.info(f'Buscando quantidade de planos')
-        quantity = await db.plans.count_documents({})
+        plans_logger.info('Buscando quantidade de planos')
+        quantity = await db.plans.estimated_document_count()
 
-        plans_logger.info(f'Quantidade de planos encontrada com sucesso: {quantity}')
+        plans_logger.info('Quantidade de planos encontrada com sucesso: %s', quantity)
         return {"quantity": quantity}
 
     except Exception as e:
-        plans_logger.error(f'Erro ao buscar quantidade de planos: {e}')
+        plans_logger.error('Erro ao buscar quantidade de planos: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar quantidade de planos')
\ No newline at end of file
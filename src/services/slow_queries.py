@@ -0,0 +1,41 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Query
+from database import db
+from services.configs import database_logger
+from utils.responses import MongoJSONResponse
+from utils.slow_queries import SLOW_QUERIES_COLLECTION
+
+# Criar roteador
+router = APIRouter()
+
+# Rota de listagem das consultas lentas registradas, das mais recentes para as mais antigas
+@router.get('/slow_queries')
+async def get_slow_queries(
+    collection: Optional[str] = Query(None, description="Filter by collection"),
+    command: Optional[Literal["find", "aggregate", "count"]] = Query(None, description="Filter by command"),
+    collscan: Optional[bool] = Query(None, description="Filter by collection scan"),
+    min_duration_ms: Optional[float] = Query(None, ge=0, description="Filter by minimum duration in milliseconds"),
+    limit: Optional[int] = Query(50, ge=1, le=500, description="Number of results (max 500)")
+):
+    try:
+        database_logger.info('Buscando consultas lentas')
+
+        query = {}
+        if collection:
+            query["collection"] = collection
+        if command:
+            query["command"] = command
+        if collscan is not None:
+            query["collscan"] = collscan
+        if min_duration_ms:
+            query["duration_ms"] = {"$gte": min_duration_ms}
+
+        # Em uma coleção limitada a ordem natural é a ordem de inserção
+        slow_queries = await db[SLOW_QUERIES_COLLECTION].find(query, {"_id": 0}).sort("$natural", -1).limit(limit).to_list(length=limit)
+
+        database_logger.info('Consultas lentas encontradas: %d', len(slow_queries))
+        return MongoJSONResponse(slow_queries)
+
+    except Exception as e:
+        database_logger.error('Erro ao buscar consultas lentas: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar consultas lentas')
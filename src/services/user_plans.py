@@ -1,163 +1,191 @@
-from datetime import datetime
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
-from database import db
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from pymongo import ReturnDocument
+from database import client, db
 from models.user_plans import UserPlans
 from services.configs import user_plans_logger
+from utils.counters import count_document, get_counter
+from utils.log_summary import log_documents, log_payload
+from utils.plan_summaries import refresh_plan_summaries, schedule_refresh
+from utils.references import validate_references
+from utils.sales_rollups import record_sale
+from utils.responses import MongoJSONResponse, as_stored
 
 # Criar roteador
 router = APIRouter()
 
+# Executa a confirmação de compra em uma transação (requer replica set)
+use_transactions = os.getenv("MONGO_TRANSACTIONS", "false").lower() in ("1", "true", "yes")
+
 # Rota de criação de um plano de treino para um usuário
 @router.post('/user_plans')
-async def create_user_plan(user_plan: UserPlans):
+async def create_user_plan(user_plan: UserPlans, background_tasks: BackgroundTasks):
     try:
-        user_plans_logger.info(f'Criando plano de treino para usuário: {user_plan}')
-        seller = await db.users.find_one({"_id": ObjectId(user_plan.seller_id)})
-        if not seller:
-            user_plans_logger.warning(f'Vendedor não encontrado: {user_plan.seller_id}')
-            raise HTTPException(status_code=404, detail='Vendedor não encontrado')
-        
-        buyer = await db.users.find_one({"_id": ObjectId(user_plan.buyer_id)})
-        if not buyer:
-            user_plans_logger.warning(f'Comprador não encontrado: {user_plan.buyer_id}')
-            raise HTTPException(status_code=404, detail='Comprador não encontrado')
-        
-        plan = await db.plans.find_one({"_id": ObjectId(user_plan.plan_id)})
-        if not plan:
-            user_plans_logger.warning(f'Plano não encontrado: {user_plan.plan_id}')
-            raise HTTPException(status_code=404, detail='Plano não encontrado')
+        started_at = time.perf_counter()
+        log_payload(user_plans_logger, 'Criando plano de treino para usuário', user_plan)
+        await validate_references([
+            ("users", user_plan.seller_id, 'Vendedor não encontrado'),
+            ("users", user_plan.buyer_id, 'Comprador não encontrado'),
+            ("plans", user_plan.plan_id, 'Plano não encontrado')
+        ], user_plans_logger)
         
         user_plan_dict = user_plan.dict(by_alias=True, exclude={"id"})
         new_user_plan = await db.user_plans.insert_one(user_plan_dict)
-
-        created_user_plan = await db.user_plans.find_one({"_id": new_user_plan.inserted_id})
-        if not created_user_plan:
-            raise HTTPException(status_code=500, detail='Erro ao criar plano de treino para usuário')
-
-        created_user_plan["_id"] = str(created_user_plan["_id"])
-        user_plans_logger.info(f'Plano de treino para usuário criado com sucesso: {created_user_plan}')
-        return created_user_plan
+        await count_document("user_plans", user_plan_dict)
+        schedule_refresh(background_tasks, user_plans_logger, refresh_plan_summaries, [user_plan.plan_id])
+        
+        created_user_plan = as_stored({**user_plan_dict, "_id": new_user_plan.inserted_id})
+        log_documents(user_plans_logger, 'Plano de treino para usuário criado com sucesso', created_user_plan, started_at)
+        return MongoJSONResponse(created_user_plan)
 
     except Exception as e:
-        user_plans_logger.error(f'Erro ao criar plano de treino para usuário: {e}')
+        user_plans_logger.error('Erro ao criar plano de treino para usuário: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao criar plano de treino para usuário')
     
+# Filtro de um plano de treino com o vendedor, comprador e plano informados
+def purchase_filter(id, user_plan):
+    return {
+        "_id": ObjectId(id),
+        "seller_id": user_plan.seller_id,
+        "buyer_id": user_plan.buyer_id,
+        "plan_id": user_plan.plan_id
+    }
+
+# Confirma a compra de um plano de treino.
+# A condição purchased = False torna a troca de estado um compare-and-set: entre requisições
+# concorrentes apenas uma registra a venda, e só ela atualiza vendedor, comprador e rollups de vendas.
+# O preço e a categoria do plano são copiados para o registro da compra.
+async def confirm_purchase(id, user_plan, plan, session=None):
+    update_data = {"purchased": True, "purchased_at": datetime.now(timezone.utc), "price": plan.get("price"), "category": plan.get("category")}
+    updated_user_plan = await db.user_plans.find_one_and_update(
+        {**purchase_filter(id, user_plan), "purchased": False},
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    
+    if not updated_user_plan:
+        return None
+    
+    plan_id = ObjectId(user_plan.plan_id)
+    seller_update = db.users.update_one({"_id": ObjectId(user_plan.seller_id)}, {"$addToSet": {"plans_sold": plan_id}}, session=session)
+    buyer_update = db.users.update_one({"_id": ObjectId(user_plan.buyer_id)}, {"$push": {"purchased_plans": plan_id}}, session=session)
+    rollup_update = record_sale(updated_user_plan, session=session)
+    
+    if session:
+        # Operações de uma mesma sessão não podem ser executadas em paralelo
+        await seller_update
+        await buyer_update
+        await rollup_update
+    else:
+        await asyncio.gather(seller_update, buyer_update, rollup_update)
+    
+    return updated_user_plan
+
 # Rota de atualização de um plano de treino para um usuário
 @router.put('/user_plans/{id}')
-async def update_user_plan(id: str, user_plan: UserPlans):
+async def update_user_plan(id: str, user_plan: UserPlans, background_tasks: BackgroundTasks):
     try:
-        user_plans_logger.info(f'Atualizando plano de treino para usuário: {user_plan}')
-        seller = await db.users.find_one({"_id": ObjectId(user_plan.seller_id)})
-        if not seller:
-            user_plans_logger.warning(f'Vendedor não encontrado: {user_plan.seller_id}')
-            raise HTTPException(status_code=404, detail='Vendedor não encontrado')
-        
-        buyer = await db.users.find_one({"_id": ObjectId(user_plan.buyer_id)})
-        if not buyer:
-            user_plans_logger.warning(f'Comprador não encontrado: {user_plan.buyer_id}')
-            raise HTTPException(status_code=404, detail='Comprador não encontrado')
-        
-        plan = await db.plans.find_one({"_id": ObjectId(user_plan.plan_id)})
-        if not plan:
-            user_plans_logger.warning(f'Plano não encontrado: {user_plan.plan_id}')
-            raise HTTPException(status_code=404, detail='Plano não encontrado')
-        
-        exists_plan = await db.user_plans.find_one({"_id": ObjectId(id)})
-        if (not exists_plan) or (exists_plan["seller_id"] != user_plan.seller_id) or (exists_plan["buyer_id"] != user_plan.buyer_id) or (exists_plan["plan_id"] != user_plan.plan_id):
-            user_plans_logger.warning(f'Plano de treino não encontrado: {id}')
-            raise HTTPException(status_code=404, detail='Plano de treino não encontrado')
+        started_at = time.perf_counter()
+        log_payload(user_plans_logger, 'Atualizando plano de treino para usuário', user_plan, id)
+        await validate_references([
+            ("users", user_plan.seller_id, 'Vendedor não encontrado'),
+            ("users", user_plan.buyer_id, 'Comprador não encontrado'),
+            ("plans", user_plan.plan_id, 'Plano não encontrado')
+        ], user_plans_logger)
         
-        if user_plan.purchased and  not exists_plan["purchased"]:
-            update_data = {"purchased": user_plan.purchased, "purchased_at": datetime.now()}
-            response = await db.user_plans.update_one({"_id": ObjectId(id)}, {"$set": update_data})
+        if user_plan.purchased:
+            plan = await db.plans.find_one({"_id": ObjectId(user_plan.plan_id)}, {"price": 1, "category": 1}) or {}
             
-            if response.matched_count == 0:
-                user_plans_logger.warning(f'Plano de treino para usuário não encontrado: {id}')
-                raise HTTPException(status_code=404, detail='Plano de treino para usuário não encontrado')
-            elif response.modified_count == 0:
-                user_plans_logger.warning(f'Nenhuma alteração foi feita no plano de treino para usuário: {plan}')
-                raise HTTPException(status_code=500, detail='Nenhuma alteração foi feita no plano de treino para usuário')
+            if use_transactions:
+                async with await client.start_session() as session:
+                    async with session.start_transaction():
+                        updated_user_plan = await confirm_purchase(id, user_plan, plan, session)
             else:
-                updated_user_plan = await db.user_plans.find_one({"_id": ObjectId(id)})
-                updated_user_plan["_id"] = str(updated_user_plan["_id"])
-                    
-                seller_dict = dict(seller)
-                seller_dict.pop("_id")
-                seller_dict["plans_sold"].append(ObjectId(user_plan.plan_id))
-                await db.users.update_one({"_id": ObjectId(user_plan.seller_id)}, {"$set": seller_dict})
-                
-                buyer_dict = dict(buyer)
-                buyer_dict.pop("_id")
-                buyer_dict["purchased_plans"].append(ObjectId(user_plan.plan_id))
-                await db.users.update_one({"_id": ObjectId(user_plan.buyer_id)}, {"$set": buyer_dict})
-                
-                user_plans_logger.info(f'Plano de treino para usuário atualizado com sucesso: {updated_user_plan}')
-                return updated_user_plan
+                updated_user_plan = await confirm_purchase(id, user_plan, plan)
+            
+            if updated_user_plan:
+                schedule_refresh(background_tasks, user_plans_logger, refresh_plan_summaries, [user_plan.plan_id])
+                log_documents(user_plans_logger, 'Plano de treino para usuário atualizado com sucesso', updated_user_plan, started_at)
+                return MongoJSONResponse(updated_user_plan)
         
-        user_plans_logger.warning(f'Nenhuma alteração foi feita no plano de treino para usuário: {plan}')
+        # A busca só é feita quando a compra não foi registrada, para diferenciar o motivo
+        exists_plan = await db.user_plans.find_one(purchase_filter(id, user_plan), {"_id": 1})
+        if not exists_plan:
+            user_plans_logger.warning('Plano de treino não encontrado: %s', id)
+            raise HTTPException(status_code=404, detail='Plano de treino não encontrado')
+        
+        user_plans_logger.warning('Nenhuma alteração foi feita no plano de treino para usuário: %s', id)
         raise HTTPException(status_code=500, detail='Nenhuma alteração foi feita no plano de treino para usuário')
     
     except Exception as e:
-        user_plans_logger.error(f'Erro ao atualizar plano de treino para usuário: {e}')
+        user_plans_logger.error('Erro ao atualizar plano de treino para usuário: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao atualizar plano de treino para usuário')
     
 # Rota de exclusão de um plano de treino para um usuário
 @router.delete('/user_plans/{id}')
-async def delete_user_plan(id: str):
+async def delete_user_plan(id: str, background_tasks: BackgroundTasks):
     try:
-        user_plans_logger.info(f'Excluindo plano de treino para usuário: {id}')
-        response = await db.user_plans.delete_one({"_id": ObjectId(id)})
+        user_plans_logger.info('Excluindo plano de treino para usuário: %s', id)
+        deleted_user_plan = await db.user_plans.find_one_and_delete({"_id": ObjectId(id)})
         
-        if response.deleted_count == 0:
-            user_plans_logger.warning(f'Plano de treino para usuário não encontrado: {id}')
+        if not deleted_user_plan:
+            user_plans_logger.warning('Plano de treino para usuário não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Plano de treino para usuário não encontrado')
         
-        user_plans_logger.info(f'Plano de treino para usuário excluído com sucesso: {id}')
+        await count_document("user_plans", deleted_user_plan, -1)
+        await record_sale(deleted_user_plan, -1)
+        schedule_refresh(background_tasks, user_plans_logger, refresh_plan_summaries, [deleted_user_plan["plan_id"]])
+        
+        user_plans_logger.info('Plano de treino para usuário excluído com sucesso: %s', id)
         return {"message": "Plano de treino para usuário excluído com sucesso"}
     
     except Exception as e:
-        user_plans_logger.error(f'Erro ao excluir plano de treino para usuário: {e}')
+        user_plans_logger.error('Erro ao excluir plano de treino para usuário: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao excluir plano de treino para usuário')
     
 # Rota de quantidade de planos dos usuários
 @router.get('/quantity/user_plans')
 async def get_user_plans_quantity():
     try:
-        user_plans_logger.info(f'Buscando quantidade de planos dos usuários')
-        quantity = await db.user_plans.count_documents({})
+        user_plans_logger.info('Buscando quantidade de planos dos usuários')
+        quantity = await db.user_plans.estimated_document_count()
 
-        user_plans_logger.info(f'Quantidade de planos dos usuários encontrada com sucesso: {quantity}')
+        user_plans_logger.info('Quantidade de planos dos usuários encontrada com sucesso: %s', quantity)
         return {"quantity": quantity}
 
     except Exception as e:
-        user_plans_logger.error(f'Erro ao buscar quantidade de planos dos usuários: {e}')
+        user_plans_logger.error('Erro ao buscar quantidade de planos dos usuários: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar quantidade de planos dos usuários')
     
 # Rota de quantidade de planos de um vendedor
 @router.get('/quantity/user_plans/seller/{id}')
 async def get_user_plans_quantity_by_seller(id: str):
     try:
-        user_plans_logger.info(f'Buscando quantidade de planos do vendedor: {id}')
-        quantity = await db.user_plans.count_documents({"seller_id": id})
+        user_plans_logger.info('Buscando quantidade de planos do vendedor: %s', id)
+        quantity = await get_counter("user_plans", "seller_id", id)
 
-        user_plans_logger.info(f'Quantidade de planos do vendedor encontrada com sucesso: {quantity}')
+        user_plans_logger.info('Quantidade de planos do vendedor encontrada com sucesso: %s', quantity)
         return {"quantity": quantity}
 
     except Exception as e:
-        user_plans_logger.error(f'Erro ao buscar quantidade de planos do vendedor: {e}')
+        user_plans_logger.error('Erro ao buscar quantidade de planos do vendedor: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar quantidade de planos do vendedor')
     
 # Rota de quantidade de planos de um comprador
 @router.get('/quantity/user_plans/buyer/{id}')
 async def get_user_plans_quantity_by_buyer(id: str):
     try:
-        user_plans_logger.info(f'Buscando quantidade de planos do comprador: {id}')
-        quantity = await db.user_plans.count_documents({"buyer_id": id})
+        user_plans_logger.info('Buscando quantidade de planos do comprador: %s', id)
+        quantity = await get_counter("user_plans", "buyer_id", id)
 
-        user_plans_logger.info(f'Quantidade de planos do comprador encontrada com sucesso: {quantity}')
+        user_plans_logger.info('Quantidade de planos do comprador encontrada com sucesso: %s', quantity)
         return {"quantity": quantity}
 
     except Exception as e:
-        user_plans_logger.error(f'Erro ao buscar quantidade de planos do comprador: {e}')
+        user_plans_logger.error('Erro ao buscar quantidade de planos do comprador: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar quantidade de planos do comprador')
\ No newline at end of file
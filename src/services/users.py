@@ -1,9 +1,20 @@
+import time
+from datetime import datetime, timezone
 from typing import Literal, Optional
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from pymongo import ReturnDocument
 from database import db
+from models.multi_get import MultiGet
 from models.user import User
 from services.configs import users_logger
+from utils.counters import discount_matching
+from utils.log_summary import log_documents, log_payload
+from utils.multi_get import find_by_ids
+from utils.pagination import encode_cursor, find_page, keyset_filter, sort_keys
+from utils.plan_summaries import refresh_seller_summaries, schedule_refresh
+from utils.projection import ALLOWED_FIELDS, BUYER_PROJECTION, EMBEDDED_PLAN_PROJECTION, SELLER_PROJECTION, build_projection, detail_projection, is_requested, list_projection
+from utils.responses import MongoJSONResponse, as_stored
 
 # Criar roteador
 router = APIRouter()
@@ -12,103 +23,127 @@ router = APIRouter()
 @router.post('/users')
 async def create_user(user: User):
     try:
-        users_logger.info(f'Criando usuário: {user}')
+        started_at = time.perf_counter()
+        log_payload(users_logger, 'Criando usuário', user)
         response = await db.users.find_one({"email": user.email})
         if response:
-            users_logger.warning(f'Usuário com email {user.email} já cadastrado')
+            users_logger.warning('Usuário com email %s já cadastrado', user.email)
             raise HTTPException(status_code=409, detail='Usuário com email já cadastrado')
         
         user_dict = user.dict(by_alias=True, exclude={"id"})
         response = await db.users.insert_one(user_dict)
         
-        created_user = await db.users.find_one({"_id": response.inserted_id})
-        if not created_user:
-            raise HTTPException(status_code=500, detail='Erro ao criar usuário')
-        
-        created_user["_id"] = str(created_user["_id"])
-        users_logger.info(f'Usuário criado com sucesso: {created_user}')
-        return created_user
+        created_user = as_stored({**user_dict, "_id": response.inserted_id})
+        log_documents(users_logger, 'Usuário criado com sucesso', created_user, started_at)
+        return MongoJSONResponse(created_user)
     
     except Exception as e:
-        users_logger.error(f'Erro ao criar usuário: {e}')
+        users_logger.error('Erro ao criar usuário: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao criar usuário')
     
 # Rota de atualização de um usuário
 @router.put('/users/{id}')
-async def update_user(id: str, user: User):
+async def update_user(id: str, user: User, background_tasks: BackgroundTasks):
     try:
-        users_logger.info(f'Atualizando usuário: {user}')
-        user_dict = user.dict(by_alias=True, exclude={"id"})
-        response = await db.users.update_one({"_id": ObjectId(id)}, {"$set": user_dict})
-        
-        if response.matched_count == 0:
-            users_logger.warning(f'Usuário não encontrado: {id}')
+        started_at = time.perf_counter()
+        log_payload(users_logger, 'Atualizando usuário', user, id)
+        # A data de criação é mantida e a de atualização é definida pelo servidor
+        user_dict = user.dict(by_alias=True, exclude={"id", "created_at"})
+        user_dict["updated_at"] = datetime.now(timezone.utc)
+        updated_user = await db.users.find_one_and_update({"_id": ObjectId(id)}, {"$set": user_dict}, return_document=ReturnDocument.AFTER)
+        
+        if not updated_user:
+            users_logger.warning('Usuário não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Usuário não encontrado')
         
-        if response.modified_count == 0:
-            users_logger.warning(f'Nenhuma alteração foi feita no usuário: {user}')
-            raise HTTPException(status_code=500, detail='Nenhuma alteração foi feita no usuário')
+        # O nome do vendedor faz parte dos resumos dos seus planos
+        schedule_refresh(background_tasks, users_logger, refresh_seller_summaries, id)
         
-        updated_user = await db.users.find_one({"_id": ObjectId(id)})
-        updated_user["_id"] = str(updated_user["_id"])
-        users_logger.info(f'Usuário atualizado com sucesso: {updated_user}')
-        return updated_user
+        log_documents(users_logger, 'Usuário atualizado com sucesso', updated_user, started_at)
+        return MongoJSONResponse(updated_user)
     
     except Exception as e:
-        users_logger.error(f'Erro ao atualizar usuário: {e}')
+        users_logger.error('Erro ao atualizar usuário: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao atualizar usuário')
     
 # Rota de exclusão de um usuário
 @router.delete('/users/{id}')
-async def delete_user(id: str):
+async def delete_user(id: str, background_tasks: BackgroundTasks):
     try:
-        users_logger.info(f'Excluindo usuário: {id}')
+        users_logger.info('Excluindo usuário: %s', id)
+        await discount_matching("user_plans", {"user_id": ObjectId(id)})
         await db.user_plans.delete_many({"user_id": ObjectId(id)})
         response = await db.users.delete_one({"_id": ObjectId(id)})
         
         if response.deleted_count == 0:
-            users_logger.warning(f'Usuário não encontrado: {id}')
+            users_logger.warning('Usuário não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Usuário não encontrado')
         
-        users_logger.info(f'Usuário excluído com sucesso: {id}')
+        schedule_refresh(background_tasks, users_logger, refresh_seller_summaries, id)
+        
+        users_logger.info('Usuário excluído com sucesso: %s', id)
         return {"message": "Usuário excluído com sucesso"}
     
     except Exception as e:
-        users_logger.error(f'Erro ao excluir usuário: {e}')
+        users_logger.error('Erro ao excluir usuário: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao excluir usuário')
     
 # Rota de busca de um usuário por id
 @router.get('/users/{id}')
-async def get_user(id: str):
+async def get_user(
+    id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
     try:
-        users_logger.info(f'Buscando usuário: {id}')
-        user = await db.users.find_one({"_id": ObjectId(id)})
+        started_at = time.perf_counter()
+        users_logger.info('Buscando usuário: %s', id)
+        user = await db.users.find_one({"_id": ObjectId(id)}, detail_projection("users", fields))
         
         if not user:
-            users_logger.warning(f'Usuário não encontrado: {id}')
+            users_logger.warning('Usuário não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Usuário não encontrado')
         
-        user["_id"] = str(user["_id"])
-        users_logger.info(f'Usuário encontrado: {user}')
-        return user
+        log_documents(users_logger, 'Usuário encontrado', user, started_at)
+        return MongoJSONResponse(user)
     
     except Exception as e:
-        users_logger.error(f'Erro ao buscar usuário: {e}')
+        users_logger.error('Erro ao buscar usuário: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar usuário')
     
+# Rota de busca de vários usuários por id em uma única consulta
+@router.post('/users/_mget')
+async def get_users_by_ids(
+    body: MultiGet,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
+    try:
+        started_at = time.perf_counter()
+        users_logger.info('Buscando usuários por ids: %d', len(body.ids))
+        users = await find_by_ids(db.users, body.ids, detail_projection("users", fields))
+        
+        log_documents(users_logger, 'Usuários encontrados por ids', users["results"], started_at)
+        return MongoJSONResponse(users)
+    
+    except Exception as e:
+        users_logger.error('Erro ao buscar usuários por ids: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar usuários por ids')
+    
 # Rota de listagem de usuários
 @router.get('/users')
 async def get_users(
     page: Optional[int] = Query(1, ge=1, description="Page number, starting from 1"),
     limit: Optional[int] = Query(10, ge=1, le=100, description="Number of results per page (max 100)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
     sort_by: Optional[Literal["name"]] = Query(None, description="Sort by field"),
     order_by: Optional[Literal["asc", "desc"]] = Query(None, description="Order by field"),
     name: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by name"),
     email: Optional[str] = Query(None, min_length=3, max_length=80, description="Filter by email"),
     password: Optional[str] = Query(None, min_length=8, max_length=16, description="Filter by password"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: name, email, phone_number and dates)"),
 ):
     try:
-        users_logger.info(f'Buscando usuários')
+        started_at = time.perf_counter()
+        users_logger.info('Buscando usuários')
         filters = []
         
         if name:
@@ -117,57 +152,83 @@ async def get_users(
         if email and password:
             filters.append({"email": email, "password": password})
 
-        query = {"$and": filters} if filters else {}
-        
-        skip = (page - 1) * limit
-        
         order_direction = None
         if sort_by and order_by == "asc":
             order_direction = 1
         elif sort_by and order_by == "desc":
             order_direction = -1
         
-        users = []
-        if sort_by and order_direction:
-            users = await db.users.find(query).sort(sort_by, order_direction).skip(skip).limit(limit).to_list(length=limit)
-        else:
-            users = await db.users.find(query).skip(skip).limit(limit).to_list(length=limit)
-        
-        for user in users:
-            user["_id"] = str(user["_id"])
-            user["plans_sold"] = [str(plan_id) for plan_id in user["plans_sold"]]
-            user["purchased_plans"] = [str(plan_id) for plan_id in user["purchased_plans"]]
+        projection = list_projection("users", fields, required=[sort_by])
+        users, next_cursor = await find_page(db.users, filters, page, limit, sort_by, order_direction, cursor, projection=projection)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
         
         if len(users) > 0:
-            users_logger.info(f'Usuários encontrados com sucesso: {users}')
-            return users
+            log_documents(users_logger, 'Usuários encontrados com sucesso', users, started_at)
+            return MongoJSONResponse(users, headers=headers)
         else:
-            users_logger.warning(f'Nenhum usuário encontrado')
+            users_logger.warning('Nenhum usuário encontrado')
             raise HTTPException(status_code=404, detail='Nenhum usuário encontrado')
     
+    # Erros da requisição (ex.: cursor inválido) são mantidos
+    except HTTPException:
+        raise
+
     except Exception as e:
-        users_logger.error(f'Erro ao buscar usuários: {e}')
+        users_logger.error('Erro ao buscar usuários: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar usuários')
     
 # Rota de quantidade de usuários
 @router.get('/quantity/users')
 async def get_users_quantity():
     try:
-        users_logger.info(f'Buscando quantidade de usuários')
-        quantity = await db.users.count_documents({})
+        users_logger.info('Buscando quantidade de usuários')
+        quantity = await db.users.estimated_document_count()
 
-        users_logger.info(f'Quantidade de usuários encontrada com sucesso: {quantity}')
+        users_logger.info('Quantidade de usuários encontrada com sucesso: %s', quantity)
         return {"quantity": quantity}
 
     except Exception as e:
-        users_logger.error(f'Erro ao buscar quantidade de usuários: {e}')
+        users_logger.error('Erro ao buscar quantidade de usuários: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar quantidade de usuários')
     
+# Pipeline das rotas de vendedores e compradores: $match, etapas da página ($sort, $skip/$limit),
+# projeção do usuário e, por último, o $lookup dos planos, executado apenas para os usuários da página.
+# O sub-pipeline projeta os planos incorporados e limita a quantidade por usuário; o total de ids é
+# retornado em <campo>_count. O array de ids, sem limite de tamanho, só é mantido na resposta quando
+# solicitado em fields (keep_ids), permitindo obter os ids além de plans_limit.
+def plans_lookup_pipeline(query, page_stages, ids_field, user_projection, plan_projection, plans_limit, keep_ids=False):
+    return [
+        {"$match": query},
+        *page_stages,
+        {"$project": user_projection},
+        {
+            "$lookup": {
+                "from": "plans",
+                "localField": ids_field,
+                "foreignField": "_id",
+                "pipeline": [
+                    {"$sort": {"_id": -1}},
+                    {"$limit": plans_limit},
+                    {"$project": plan_projection}
+                ],
+                "as": f"{ids_field}_details"
+            }
+        },
+        {"$set": {f"{ids_field}_count": {"$size": f"${ids_field}"}}},
+        *([] if keep_ids else [{"$unset": ids_field}])
+    ]
+
 # Rota de listagem dos planos de um vendedor
 @router.get('/seller_plans/{id}')
-async def get_seller_plans_by_id(id: str):
+async def get_seller_plans_by_id(
+    id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated user fields to return"),
+    plan_fields: Optional[str] = Query(None, description="Comma-separated plan fields to return (default: title, type, category and price)"),
+    plans_limit: Optional[int] = Query(50, ge=1, le=500, description="Maximum number of embedded plans")
+):
     try:
-        users_logger.info(f'Buscando planos do vendedor')
+        started_at = time.perf_counter()
+        users_logger.info('Buscando planos do vendedor')
         
         filters = []
         filters.append({"_id": ObjectId(id)})
@@ -175,39 +236,22 @@ async def get_seller_plans_by_id(id: str):
         
         query = {"$and": filters}
         
-        pipeline = [
-            {"$match": query},
-            {
-                "$lookup": {
-                    "from": "plans",
-                    "localField": "plans_sold",
-                    "foreignField": "_id",
-                    "as": "plans_sold_details"
-                }
-            },
-            {
-                "$project": {"purchased_plans": 0}
-            }
-        ]
+        user_projection = build_projection(fields, ALLOWED_FIELDS["users"], SELLER_PROJECTION, required=["plans_sold"])
+        plan_projection = build_projection(plan_fields, ALLOWED_FIELDS["plans"], EMBEDDED_PLAN_PROJECTION)
+        pipeline = plans_lookup_pipeline(query, [], "plans_sold", user_projection, plan_projection, plans_limit, is_requested(fields, "plans_sold"))
         
         user = await db.users.aggregate(pipeline).to_list(length=1)
             
         if user:
             user_dict = dict(user[0])
-            user_dict["_id"] = str(user_dict["_id"])
-            user_dict["plans_sold"] = [str(plan_id) for plan_id in user_dict["plans_sold"]]
-            
-            for plan in user_dict["plans_sold_details"]:
-                plan["_id"] = str(plan["_id"])
-            
-            users_logger.info(f'Vendedor encontrado com sucesso: {user_dict}')
-            return user_dict
+            log_documents(users_logger, 'Vendedor encontrado com sucesso', user_dict, started_at)
+            return MongoJSONResponse(user_dict)
         else:
-            users_logger.warning(f'Nenhum vendedor encontrado')
+            users_logger.warning('Nenhum vendedor encontrado')
             raise HTTPException(status_code=404, detail='Nenhum vendedor encontrado')
 
     except Exception as e:
-        users_logger.error(f'Erro ao buscar planos do vendedor: {e}')
+        users_logger.error('Erro ao buscar planos do vendedor: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar planos do vendedor')
     
 # Rota de listagem dos planos dos vendedores
@@ -215,14 +259,19 @@ async def get_seller_plans_by_id(id: str):
 async def get_seller_plans(
     page: Optional[int] = Query(1, ge=1, description="Page number, starting from 1"),
     limit: Optional[int] = Query(10, ge=1, le=100, description="Number of results per page (max 100)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
     sort_by: Optional[Literal["name"]] = Query(None, description="Sort by field"),
     order_by: Optional[Literal["asc", "desc"]] = Query(None, description="Order by field"),
     name: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by name"),
     email: Optional[str] = Query(None, min_length=3, max_length=80, description="Filter by email"),
     password: Optional[str] = Query(None, min_length=8, max_length=16, description="Filter by password"),
+    fields: Optional[str] = Query(None, description="Comma-separated user fields to return"),
+    plan_fields: Optional[str] = Query(None, description="Comma-separated plan fields to return (default: title, type, category and price)"),
+    plans_limit: Optional[int] = Query(20, ge=1, le=100, description="Maximum number of embedded plans per user")
 ):
     try:
-        users_logger.info(f'Buscando planos dos vendedores')
+        started_at = time.perf_counter()
+        users_logger.info('Buscando planos dos vendedores')
         
         filters = []
         
@@ -234,62 +283,59 @@ async def get_seller_plans(
             
         filters.append({ "plans_sold": { "$exists": True, "$ne": [] }})
         
-        query = {"$and": filters}
-        
-        pipeline = [
-            {"$match": query},
-            {
-                "$lookup": {
-                    "from": "plans",
-                    "localField": "plans_sold",
-                    "foreignField": "_id",
-                    "as": "plans_sold_details"
-                }
-            },
-            {
-                "$project": {"purchased_plans": 0}
-            }
-        ]
-        
-        skip = (page - 1) * limit
-        pipeline.append({"$skip": skip})
-        pipeline.append({"$limit": limit})
-        
         order_direction = None
         if sort_by and order_by == "asc":
             order_direction = 1
         elif sort_by and order_by == "desc":
             order_direction = -1
         
-        if sort_by and order_direction:
-            pipeline.append({"$sort": {sort_by: order_direction}})
+        if cursor:
+            filters.append(keyset_filter(cursor, sort_by, order_direction))
         
-        users = await db.users.aggregate(pipeline).to_list(length=None)
+        query = {"$and": filters}
+        
+        # A página é definida antes do $lookup, que é executado apenas para os usuários retornados
+        page_stages = [{"$sort": dict(sort_keys(sort_by, order_direction))}]
+        if not cursor:
+            page_stages.append({"$skip": (page - 1) * limit})
+        page_stages.append({"$limit": limit})
+        
+        user_projection = build_projection(fields, ALLOWED_FIELDS["users"], SELLER_PROJECTION, required=["plans_sold", sort_by])
+        plan_projection = build_projection(plan_fields, ALLOWED_FIELDS["plans"], EMBEDDED_PLAN_PROJECTION)
+        pipeline = plans_lookup_pipeline(query, page_stages, "plans_sold", user_projection, plan_projection, plans_limit, is_requested(fields, "plans_sold"))
+        
+        users = await db.users.aggregate(pipeline).to_list(length=limit)
+        
+        next_cursor = encode_cursor(users[-1], sort_by, order_direction) if len(users) == limit else None
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
         
-        for user in users:
-            user["_id"] = str(user["_id"])
-            user["plans_sold"] = [str(plan_id) for plan_id in user["plans_sold"]]
-            
-            for plan in user["plans_sold_details"]:
-                plan["_id"] = str(plan["_id"])
-            
         if len(users) > 0:
-            users_logger.info(f'Vendedores encontrados com sucesso: {users}')
-            return users
+            log_documents(users_logger, 'Vendedores encontrados com sucesso', users, started_at)
+            return MongoJSONResponse(users, headers=headers)
         else:
-            users_logger.warning(f'Nenhum vendedor encontrado')
-            raise HTTPException(status_code=404, detail='Nenhum vendedor encontrado')
+            users_logger.warning('Nenhum vendedore encontrado')
+            raise HTTPException(status_code=404, detail='Nenhum vendedore encontrado')
+
+    # Erros da requisição (ex.: cursor inválido) são mantidos
+    except HTTPException:
+        raise
 
     except Exception as e:
-        users_logger.error(f'Erro ao buscar planos dos vendedores: {e}')
+        users_logger.error('Erro ao buscar planos dos vendedores: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar planos dos vendedores')
     
 
 # Rota de listagem dos planos de um comprador
 @router.get('/buyer_plans/{id}')
-async def get_buyer_plans_by_id(id: str):
+async def get_buyer_plans_by_id(
+    id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated user fields to return"),
+    plan_fields: Optional[str] = Query(None, description="Comma-separated plan fields to return (default: title, type, category and price)"),
+    plans_limit: Optional[int] = Query(50, ge=1, le=500, description="Maximum number of embedded plans")
+):
     try:
-        users_logger.info(f'Buscando planos do comprador')
+        started_at = time.perf_counter()
+        users_logger.info('Buscando planos do comprador')
         
         filters = []
         filters.append({"_id": ObjectId(id)})
@@ -297,39 +343,22 @@ async def get_buyer_plans_by_id(id: str):
         
         query = {"$and": filters}
         
-        pipeline = [
-            {"$match": query},
-            {
-                "$lookup": {
-                    "from": "plans",
-                    "localField": "purchased_plans",
-                    "foreignField": "_id",
-                    "as": "purchased_plans_details"
-                }
-            },
-            {
-                "$project": {"plans_sold": 0}
-            }
-        ]
+        user_projection = build_projection(fields, ALLOWED_FIELDS["users"], BUYER_PROJECTION, required=["purchased_plans"])
+        plan_projection = build_projection(plan_fields, ALLOWED_FIELDS["plans"], EMBEDDED_PLAN_PROJECTION)
+        pipeline = plans_lookup_pipeline(query, [], "purchased_plans", user_projection, plan_projection, plans_limit, is_requested(fields, "purchased_plans"))
         
         user = await db.users.aggregate(pipeline).to_list(length=1)
             
         if user:
             user_dict = dict(user[0])
-            user_dict["_id"] = str(user_dict["_id"])
-            user_dict["purchased_plans"] = [str(plan_id) for plan_id in user_dict["purchased_plans"]]
-            
-            for plan in user_dict["purchased_plans_details"]:
-                plan["_id"] = str(plan["_id"])
-            
-            users_logger.info(f'Comprador encontrado com sucesso: {user_dict}')
-            return user_dict
+            log_documents(users_logger, 'Comprador encontrado com sucesso', user_dict, started_at)
+            return MongoJSONResponse(user_dict)
         else:
-            users_logger.warning(f'Nenhum comprador encontrado')
+            users_logger.warning('Nenhum comprador encontrado')
             raise HTTPException(status_code=404, detail='Nenhum comprador encontrado')
 
     except Exception as e:
-        users_logger.error(f'Erro ao buscar planos do comprador: {e}')
+        users_logger.error('Erro ao buscar planos do comprador: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar planos do comprador')
     
 # Rota de listagem dos planos dos compradores
@@ -337,14 +366,19 @@ async def get_buyer_plans_by_id(id: str):
 async def get_buyer_plans(
     page: Optional[int] = Query(1, ge=1, description="Page number, starting from 1"),
     limit: Optional[int] = Query(10, ge=1, le=100, description="Number of results per page (max 100)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
     sort_by: Optional[Literal["name"]] = Query(None, description="Sort by field"),
     order_by: Optional[Literal["asc", "desc"]] = Query(None, description="Order by field"),
     name: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by name"),
     email: Optional[str] = Query(None, min_length=3, max_length=80, description="Filter by email"),
     password: Optional[str] = Query(None, min_length=8, max_length=16, description="Filter by password"),
+    fields: Optional[str] = Query(None, description="Comma-separated user fields to return"),
+    plan_fields: Optional[str] = Query(None, description="Comma-separated plan fields to return (default: title, type, category and price)"),
+    plans_limit: Optional[int] = Query(20, ge=1, le=100, description="Maximum number of embedded plans per user")
 ):
     try:
-        users_logger.info(f'Buscando planos dos compradores')
+        started_at = time.perf_counter()
+        users_logger.info('Buscando planos dos compradores')
         
         filters = []
         
@@ -356,52 +390,43 @@ async def get_buyer_plans(
             
         filters.append({ "purchased_plans": { "$exists": True, "$ne": [] }})
         
-        query = {"$and": filters}
-        
-        pipeline = [
-            {"$match": query},
-            {
-                "$lookup": {
-                    "from": "plans",
-                    "localField": "purchased_plans",
-                    "foreignField": "_id",
-                    "as": "purchased_plans_details"
-                }
-            },
-            {
-                "$project": {"plans_sold": 0}
-            }
-        ]
-        
-        skip = (page - 1) * limit
-        pipeline.append({"$skip": skip})
-        pipeline.append({"$limit": limit})
-        
         order_direction = None
         if sort_by and order_by == "asc":
             order_direction = 1
         elif sort_by and order_by == "desc":
             order_direction = -1
         
-        if sort_by and order_direction:
-            pipeline.append({"$sort": {sort_by: order_direction}})
+        if cursor:
+            filters.append(keyset_filter(cursor, sort_by, order_direction))
         
-        users = await db.users.aggregate(pipeline).to_list(length=None)
+        query = {"$and": filters}
+        
+        # A página é definida antes do $lookup, que é executado apenas para os usuários retornados
+        page_stages = [{"$sort": dict(sort_keys(sort_by, order_direction))}]
+        if not cursor:
+            page_stages.append({"$skip": (page - 1) * limit})
+        page_stages.append({"$limit": limit})
+        
+        user_projection = build_projection(fields, ALLOWED_FIELDS["users"], BUYER_PROJECTION, required=["purchased_plans", sort_by])
+        plan_projection = build_projection(plan_fields, ALLOWED_FIELDS["plans"], EMBEDDED_PLAN_PROJECTION)
+        pipeline = plans_lookup_pipeline(query, page_stages, "purchased_plans", user_projection, plan_projection, plans_limit, is_requested(fields, "purchased_plans"))
+        
+        users = await db.users.aggregate(pipeline).to_list(length=limit)
+        
+        next_cursor = encode_cursor(users[-1], sort_by, order_direction) if len(users) == limit else None
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
         
-        for user in users:
-            user["_id"] = str(user["_id"])
-            user["purchased_plans"] = [str(plan_id) for plan_id in user["purchased_plans"]]
-            
-            for plan in user["purchased_plans_details"]:
-                plan["_id"] = str(plan["_id"])
-            
         if len(users) > 0:
-            users_logger.info(f'Compradores encontrados com sucesso: {users}')
-            return users
+            log_documents(users_logger, 'Compradores encontrados com sucesso', users, started_at)
+            return MongoJSONResponse(users, headers=headers)
         else:
-            users_logger.warning(f'Nenhum comprador encontrado')
-            raise HTTPException(status_code=404, detail='Nenhum comprador encontrado')
+            users_logger.warning('Nenhum compradore encontrado')
+            raise HTTPException(status_code=404, detail='Nenhum compradore encontrado')
+
+    # Erros da requisição (ex.: cursor inválido) são mantidos
+    except HTTPException:
+        raise
 
     except Exception as e:
-        users_logger.error(f'Erro ao buscar planos dos compradores: {e}')
+        users_logger.error('Erro ao buscar planos dos compradores: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar planos dos compradores')
\ No newline at end of file
@@ -1,131 +1,206 @@
+import asyncio
+import time
+from datetime import datetime, timezone
 from typing import Literal, Optional
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from pymongo import ReturnDocument
 from database import db
+from models.multi_get import MultiGet
 from models.workout import Workout
 from services.configs import workouts_logger
+from utils.cache import get_cache
+from utils.conditional import bump_version, document_validators, is_not_modified, list_validators, not_modified_response, validator_headers
+from utils.counters import discount_matching
+from utils.log_summary import log_documents, log_payload
+from utils.multi_get import find_by_ids
+from utils.pagination import find_page, has_text_search
+from utils.plan_summaries import refresh_workout_summaries, schedule_refresh
+from utils.projection import apply_projection, detail_projection, list_projection
+from utils.responses import MongoJSONResponse, as_stored
+from utils.single_flight import flight_key, get_single_flight
 
 # Criar roteador
 router = APIRouter()
 
+# Cache das buscas por id
+workouts_cache = get_cache("workouts")
+
+# Coalescência das leituras idênticas concorrentes
+workouts_flight = get_single_flight("workouts")
+
 # Rota de criação de um novo treino
 @router.post('/workouts')
 async def create_workout(workout: Workout):
     try:
-        workouts_logger.info(f'Criando treino: {workout}')
+        started_at = time.perf_counter()
+        log_payload(workouts_logger, 'Criando treino', workout)
         workout_dict = workout.dict(by_alias=True, exclude={"id"})
         response = await db.workouts.insert_one(workout_dict)
-
-        created_workout = await db.workouts.find_one({"_id": response.inserted_id})
-        if not created_workout:
-            raise HTTPException(status_code=500, detail='Erro ao criar treino')
-
-        created_workout["_id"] = str(created_workout["_id"])
-        workouts_logger.info(f'Treino criado com sucesso: {created_workout}')
-        return created_workout
+        await bump_version("workouts")
+        
+        created_workout = as_stored({**workout_dict, "_id": response.inserted_id})
+        log_documents(workouts_logger, 'Treino criado com sucesso', created_workout, started_at)
+        return MongoJSONResponse(created_workout)
 
     except Exception as e:
-        workouts_logger.error(f'Erro ao criar treino: {e}')
+        workouts_logger.error('Erro ao criar treino: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao criar treino')
     
 # Rota de atualização de um treino
 @router.put('/workouts/{id}')
 async def update_workout(id: str, workout: Workout):
     try:
-        workouts_logger.info(f'Atualizando treino: {workout}')
-        workout_dict = workout.dict(by_alias=True, exclude={"id"})
-        response = await db.workouts.update_one({"_id": ObjectId(id)}, {"$set": workout_dict})
-
-        if response.matched_count == 0:
-            workouts_logger.warning(f'Treino não encontrado: {id}')
+        started_at = time.perf_counter()
+        log_payload(workouts_logger, 'Atualizando treino', workout, id)
+        # A data de criação é mantida e a de atualização é definida pelo servidor
+        workout_dict = workout.dict(by_alias=True, exclude={"id", "created_at"})
+        workout_dict["updated_at"] = datetime.now(timezone.utc)
+        updated_workout = await db.workouts.find_one_and_update({"_id": ObjectId(id)}, {"$set": workout_dict}, return_document=ReturnDocument.AFTER)
+        workouts_cache.invalidate(id)
+        await bump_version("workouts")
+        
+        if not updated_workout:
+            workouts_logger.warning('Treino não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Treino não encontrado')
         
-        if response.modified_count == 0:
-            workouts_logger.warning(f'Nenhuma alteração foi feita no treino: {workout}')
-            raise HTTPException(status_code=500, detail='Nenhuma alteração foi feita no treino')
-
-        updated_workout = await db.workouts.find_one({"_id": ObjectId(id)})
-        updated_workout["_id"] = str(updated_workout["_id"])
-        workouts_logger.info(f'Treino atualizado com sucesso: {updated_workout}')
-        return updated_workout
+        log_documents(workouts_logger, 'Treino atualizado com sucesso', updated_workout, started_at)
+        return MongoJSONResponse(updated_workout)
 
     except Exception as e:
-        workouts_logger.error(f'Erro ao atualizar treino: {e}')
+        workouts_logger.error('Erro ao atualizar treino: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao atualizar treino')
     
 # Rota de exclusão de um treino
 @router.delete('/workouts/{id}')
-async def delete_workout(id: str):
+async def delete_workout(id: str, background_tasks: BackgroundTasks):
     try:
-        workouts_logger.info(f'Excluindo treino: {id}')
+        workouts_logger.info('Excluindo treino: %s', id)
+        await discount_matching("exercises", {"workout_id": ObjectId(id)})
         await db.exercises.delete_many({"workout_id": ObjectId(id)})
+        get_cache("exercises").clear()
         response = await db.workouts.delete_one({"_id": ObjectId(id)})
+        workouts_cache.invalidate(id)
+        await asyncio.gather(bump_version("workouts"), bump_version("exercises"))
 
         if response.deleted_count == 0:
-            workouts_logger.warning(f'Treino não encontrado: {id}')
+            workouts_logger.warning('Treino não encontrado: %s', id)
             raise HTTPException(status_code=404, detail='Treino não encontrado')
         
-        workouts_logger.info(f'Treino excluído com sucesso: {id}')
+        # Os exercícios do treino foram removidos dos planos que o contêm
+        schedule_refresh(background_tasks, workouts_logger, refresh_workout_summaries, [id])
+        
+        workouts_logger.info('Treino excluído com sucesso: %s', id)
         return {"message": "Treino excluído com sucesso"}
 
     except Exception as e:
-        workouts_logger.error(f'Erro ao excluir treino: {e}')
+        workouts_logger.error('Erro ao excluir treino: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao excluir treino')
     
 # Rota de busca de um treino por id
 @router.get('/workouts/{id}')
-async def get_workout(id: str):
+async def get_workout(
+    request: Request,
+    id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
     try:
-        workouts_logger.info(f'Buscando treino: {id}')
-        workout = await db.workouts.find_one({"_id": ObjectId(id)})
-
-        if not workout:
-            workouts_logger.warning(f'Treino não encontrado: {id}')
-            raise HTTPException(status_code=404, detail='Treino não encontrado')
-
-        workout["_id"] = str(workout["_id"])
-        workouts_logger.info(f'Treino encontrado: {workout}')
-        return workout
+        started_at = time.perf_counter()
+        workouts_logger.info('Buscando treino: %s', id)
+        workout = workouts_cache.get(id)
+        if workout is None:
+            generation = workouts_cache.generation(id)
+            workout = await workouts_flight.do(flight_key("GET /workouts/{id}", id), lambda: db.workouts.find_one({"_id": ObjectId(id)}))
+            
+            if not workout:
+                workouts_logger.warning('Treino não encontrado: %s', id)
+                raise HTTPException(status_code=404, detail='Treino não encontrado')
+            
+            workouts_cache.set(id, workout, generation)
+        
+        # Validadores calculados sobre o documento completo (os campos solicitados fazem parte do ETag);
+        # a resposta 304 dispensa a projeção e a serialização do corpo
+        etag, last_modified = document_validators(request, workout)
+        headers = validator_headers(etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(headers)
+        
+        # O cache guarda o documento completo; a projeção é aplicada na resposta
+        workout = apply_projection(workout, detail_projection("workouts", fields))
+        
+        log_documents(workouts_logger, 'Treino encontrado', workout, started_at)
+        return MongoJSONResponse(workout, headers=headers)
 
     except Exception as e:
-        workouts_logger.error(f'Erro ao buscar treino: {e}')
+        workouts_logger.error('Erro ao buscar treino: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar treino')
 
+# Rota de busca de vários treinos por id em uma única consulta
+@router.post('/workouts/_mget')
+async def get_workouts_by_ids(
+    body: MultiGet,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+):
+    try:
+        started_at = time.perf_counter()
+        workouts_logger.info('Buscando treinos por ids: %d', len(body.ids))
+        workouts = await find_by_ids(db.workouts, body.ids, detail_projection("workouts", fields), cache=workouts_cache)
+        
+        log_documents(workouts_logger, 'Treinos encontrados por ids', workouts["results"], started_at)
+        return MongoJSONResponse(workouts)
+    
+    except Exception as e:
+        workouts_logger.error('Erro ao buscar treinos por ids: %s', e)
+        raise HTTPException(status_code=500, detail='Erro ao buscar treinos por ids')
+    
+# Filtros da listagem de treinos, compartilhados com a exportação
+def workout_filters(
+    subject: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by subject"),
+    type: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by type"),
+    category: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by category"),
+    min_rest_time: Optional[float] = Query(None, ge=0, description="Filter by minimum rest time"),
+    max_rest_time: Optional[float] = Query(None, ge=0, description="Filter by maximum rest time")
+):
+    filters = []
+    
+    if subject:
+        filters.append({"$text": {"$search": subject}})
+    
+    if type:
+        filters.append({"type": type})
+    
+    if category:
+        filters.append({"category": category})
+    
+    if min_rest_time:
+        filters.append({"rest_time": {"$gte": min_rest_time}})
+    
+    if max_rest_time:
+        filters.append({"rest_time": {"$lte": max_rest_time}})
+    
+    return filters
+
 # Rota de listagem de treinos
 @router.get('/workouts')
 async def get_workouts(
+    request: Request,
     page: Optional[int] = Query(1, ge=1, description="Page number, starting from 1"),
     limit: Optional[int] = Query(10, ge=1, le=100, description="Number of results per page (max 100)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
     sort_by: Optional[Literal["title", "type", "category", "rest_time"]] = Query(None, description="Sort by field"),
     order_by: Optional[Literal["asc", "desc"]] = Query(None, description="Order by field"),
-    subject: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by subject"),
-    type: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by type"),
-    category: Optional[str] = Query(None, min_length=3, max_length=120, description="Filter by category"),
-    min_rest_time: Optional[float] = Query(None, ge=0, description="Filter by minimum rest time"),
-    max_rest_time: Optional[float] = Query(None, ge=0, description="Filter by maximum rest time")
+    filters: list = Depends(workout_filters),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all but description)")
 ):
     try:
-        workouts_logger.info(f'Buscando treinos')
-        filters = []
-        
-        if subject:
-            filters.append({"$or": [{"title": {"$regex": subject, "$options": "i"}}, {"description": {"$regex": subject, "$options": "i"}}]})
-        
-        if type:
-            filters.append({"type": type})
-        
-        if category:
-            filters.append({"category": category})
+        started_at = time.perf_counter()
+        workouts_logger.info('Buscando treinos')
         
-        if min_rest_time:
-            filters.append({"rest_time": {"$gte": min_rest_time}})
-        
-        if max_rest_time:
-            filters.append({"rest_time": {"$lte": max_rest_time}})
-        
-        query = {"$and": filters} if filters else {}
-        
-        skip = (page - 1) * limit
+        # A versão da coleção permite responder 304 antes de consultar a coleção
+        etag, last_modified = await list_validators(request, "workouts")
+        validators = validator_headers(etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(validators)
         
         order_direction = None
         if order_by == "asc":
@@ -133,36 +208,38 @@ async def get_workouts(
         elif order_by == "desc":
             order_direction = -1
         
-        workouts = []
-        if sort_by and order_direction:
-            workouts = await db.workouts.find(query).sort(sort_by, order_direction).skip(skip).limit(limit).to_list(length=limit)
-        else:
-            workouts = await db.workouts.find(query).skip(skip).limit(limit).to_list(length=limit)
-        
-        for workout in workouts:
-            workout["_id"] = str(workout["_id"])
+        projection = list_projection("workouts", fields, required=[sort_by])
+        workouts, next_cursor = await workouts_flight.do(
+            flight_key("GET /workouts", filters, page, limit, sort_by, order_direction, cursor, projection),
+            lambda: find_page(db.workouts, filters, page, limit, sort_by, order_direction, cursor, relevance=has_text_search(filters), projection=projection)
+        )
+        headers = {**validators, "X-Next-Cursor": next_cursor} if next_cursor else validators
         
         if len(workouts) > 0:
-            workouts_logger.info(f'Treinos encontrados com sucesso: {workouts}')
-            return workouts
+            log_documents(workouts_logger, 'Treinos encontrados com sucesso', workouts, started_at)
+            return MongoJSONResponse(workouts, headers=headers)
         else:
-            workouts_logger.warning(f'Nenhum treino encontrado')
+            workouts_logger.warning('Nenhum treino encontrado')
             raise HTTPException(status_code=404, detail='Nenhum treino encontrado')
     
+    # Erros da requisição (ex.: cursor inválido) são mantidos
+    except HTTPException:
+        raise
+
     except Exception as e:
-        workouts_logger.error(f'Erro ao buscar treinos: {e}')
+        workouts_logger.error('Erro ao buscar treinos: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar treinos')
     
 # Rota de quantidade de treinos
 @router.get('/quantity/workouts')
 async def get_workouts_quantity():
     try:
-        workouts_logger.info(f'Buscando quantidade de treinos')
-        quantity = await db.workouts.count_documents({})
+        workouts_logger.info('Buscando quantidade de treinos')
+        quantity = await db.workouts.estimated_document_count()
 
-        workouts_logger.info(f'Quantidade de treinos encontrada com sucesso: {quantity}')
+        workouts_logger.info('Quantidade de treinos encontrada com sucesso: %s', quantity)
         return {"quantity": quantity}
 
     except Exception as e:
-        workouts_logger.error(f'Erro ao buscar quantidade de treinos: {e}')
+        workouts_logger.error('Erro ao buscar quantidade de treinos: %s', e)
         raise HTTPException(status_code=500, detail='Erro ao buscar quantidade de treinos')
\ No newline at end of file
@@ -0,0 +1,181 @@
+import asyncio
+import os
+import time
+import pymongo
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from utils.metrics import Counter, Gauge, Histogram, METRICS
+
+'''
+    Controle de admissão por classe de rota, para que agregações pesadas não ocupem todo o pool de
+    conexões do MongoDB e atrasem as buscas simples.
+    - Cada classe (point, list, aggregate, write) tem um limite de requisições simultâneas e uma fila
+      de espera limitada. Com a fila cheia a requisição é recusada na hora com 429; se a espera passar
+      de max_wait segundos, com 503. Ambas as respostas informam Retry-After.
+    - As operações do MongoDB da requisição admitida recebem um prazo (pymongo.timeout, enviado como
+      maxTimeMS), de modo que requisições abandonadas deixam de consumir tempo do banco. O Motor copia o
+      contexto para as threads das operações. Exportações e importações em massa não têm prazo.
+    A configuração pode ser sobrescrita por variáveis de ambiente (ex.: ADMISSION_AGGREGATE_LIMIT=4,
+    ADMISSION_LIST_DEADLINE=3); ADMISSION_CONTROL=false desativa o controle.
+'''
+
+# Configuração padrão de cada classe: requisições simultâneas, tamanho da fila, espera máxima na fila (s),
+# prazo das operações do MongoDB (s, 0 = sem prazo) e o valor do Retry-After (s)
+ADMISSION_CONFIGS = {
+    "point": {"limit": 48, "queue": 256, "max_wait": 1, "deadline": 2, "retry_after": 1},
+    "list": {"limit": 24, "queue": 128, "max_wait": 2, "deadline": 5, "retry_after": 1},
+    "aggregate": {"limit": 8, "queue": 32, "max_wait": 5, "deadline": 15, "retry_after": 2},
+    "write": {"limit": 16, "queue": 64, "max_wait": 5, "deadline": 10, "retry_after": 2},
+}
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+
+# Rotas com agregações ou leituras longas
+AGGREGATE_ROUTES = {
+    "/seller_plans", "/seller_plans/{id}", "/buyer_plans", "/buyer_plans/{id}",
+    "/plans/{id}/full", "/search/plans",
+    "/analytics/sellers/{id}/revenue", "/analytics/sellers/{id}/categories", "/analytics/sellers/{id}/top_plans",
+    "/export/plans", "/export/workouts", "/export/exercises",
+}
+
+# Rotas de leitura pontual sem {id} no caminho (contadores e contagens estimadas)
+POINT_ROUTES = {"/quantity/users", "/quantity/plans", "/quantity/workouts", "/quantity/exercises", "/quantity/plan_workouts", "/quantity/user_plans"}
+
+# Rotas de saúde e diagnóstico, que continuam respondendo sob sobrecarga
+EXEMPT_ROUTES = {"/", "/metrics", "/cache/stats", "/single_flight/stats", "/admission/stats", "/slow_queries", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"}
+
+# Rotas de duração proporcional ao volume de dados, limitadas apenas pela concorrência
+NO_DEADLINE_ROUTES = {"/export/plans", "/export/workouts", "/export/exercises", "/bulk/{collection}"}
+
+admission_requests = Counter("admission_requests_total", "Requests by admission class and outcome", ("class", "outcome"))
+admission_active = Gauge("admission_active_requests", "Admitted requests in progress", ("class",))
+admission_waiting = Gauge("admission_waiting_requests", "Requests waiting in the admission queue", ("class",))
+admission_wait = Histogram("admission_wait_seconds", "Time waiting in the admission queue", ("class",))
+METRICS.extend([admission_requests, admission_active, admission_waiting, admission_wait])
+
+class AdmissionClass:
+    def __init__(self, name, limit, queue, max_wait, deadline, retry_after):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.max_wait = max_wait
+        self.deadline = deadline
+        self.retry_after = retry_after
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+
+    # Admite a requisição ou devolve o status da recusa
+    async def acquire(self):
+        if not self.semaphore.locked():
+            # Com vaga disponível a aquisição é imediata, sem passar pela fila
+            await self.semaphore.acquire()
+        elif self.waiting >= self.queue:
+            admission_requests.inc(self.name, "rejected_queue_full")
+            return 429
+        else:
+            rejection = await self.wait()
+            if rejection:
+                return rejection
+
+        self.active += 1
+        admission_active.set(self.name, value=self.active)
+        admission_requests.inc(self.name, "admitted")
+        return None
+
+    # Aguarda uma vaga na fila por até max_wait segundos
+    async def wait(self):
+        started_at = time.perf_counter()
+        self.waiting += 1
+        admission_waiting.set(self.name, value=self.waiting)
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            admission_requests.inc(self.name, "rejected_timeout")
+            return 503
+        finally:
+            self.waiting -= 1
+            admission_waiting.set(self.name, value=self.waiting)
+            admission_wait.observe(self.name, value=time.perf_counter() - started_at)
+
+        return None
+
+    def release(self):
+        self.active -= 1
+        admission_active.set(self.name, value=self.active)
+        self.semaphore.release()
+
+    def stats(self):
+        return {"limit": self.limit, "queue": self.queue, "active": self.active, "waiting": self.waiting}
+
+# Configuração de uma classe com as variáveis de ambiente (ex.: ADMISSION_POINT_LIMIT)
+def admission_class(name):
+    config = {
+        key: float(os.getenv(f"ADMISSION_{name.upper()}_{key.upper()}", default))
+        for key, default in ADMISSION_CONFIGS[name].items()
+    }
+    return AdmissionClass(name, int(config["limit"]), int(config["queue"]), config["max_wait"], config["deadline"], int(config["retry_after"]))
+
+admission_classes = {name: admission_class(name) for name in ADMISSION_CONFIGS}
+
+# Classe de uma rota pelo método e pelo modelo do caminho
+def route_class(method, path):
+    # Buscas múltiplas por id usam POST apenas para receber a lista de ids no corpo
+    if path.endswith("/_mget"):
+        return "list"
+    if method not in ("GET", "HEAD"):
+        return "write"
+    if path in AGGREGATE_ROUTES:
+        return "aggregate"
+    if path in POINT_ROUTES or path.endswith("{id}"):
+        return "point"
+    return "list"
+
+# Rota da aplicação correspondente à requisição (o roteador só a define depois dos middlewares)
+def match_route(scope):
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+    return None
+
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_CONTROL:
+            await self.app(scope, receive, send)
+            return
+
+        route = match_route(scope)
+        if route is None or route.path in EXEMPT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        # Permite que as métricas identifiquem a rota também das requisições recusadas
+        scope["route"] = route
+
+        admission = admission_classes[route_class(scope["method"], route.path)]
+        rejection = await admission.acquire()
+        if rejection:
+            response = JSONResponse(
+                {"detail": 'Servidor sobrecarregado, tente novamente em instantes'},
+                status_code=rejection,
+                headers={"Retry-After": str(admission.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            if admission.deadline and route.path not in NO_DEADLINE_ROUTES:
+                with pymongo.timeout(admission.deadline):
+                    await self.app(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            admission.release()
+
+# Estado atual de cada classe
+def get_admission_stats():
+    return {name: admission.stats() for name, admission in admission_classes.items()}
@@ -0,0 +1,65 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+
+'''
+    Logging assíncrono: os loggers das rotas apenas enfileiram os registros (QueueHandler)
+    e uma thread em segundo plano (QueueListener) formata e grava nos handlers configurados,
+    evitando escrita em disco e formatação de mensagens no event loop.
+'''
+
+# Formata cada registro como uma linha JSON
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+# Enfileira o registro sem formatá-lo: a mensagem só é montada na thread do listener
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+# Encaminha cada registro para os handlers originais do seu logger
+class LoggerRoutingHandler(logging.Handler):
+    def __init__(self, routes):
+        super().__init__()
+        self.routes = routes
+
+    def handle(self, record):
+        for handler in self.routes.get(record.name, []):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+# Substitui os handlers dos loggers informados por uma fila única consumida em segundo plano
+def setup_queue_logging(logger_names):
+    log_queue = queue.SimpleQueue()
+    routes = {}
+
+    for name in logger_names:
+        logger = logging.getLogger(name)
+        routes[name] = list(logger.handlers)
+        logger.handlers = [LazyQueueHandler(log_queue)]
+
+    listener = logging.handlers.QueueListener(log_queue, LoggerRoutingHandler(routes))
+    listener.start()
+
+    # Garante que os registros pendentes sejam gravados ao encerrar o processo
+    atexit.register(listener.stop)
+    return listener
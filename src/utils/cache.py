@@ -0,0 +1,122 @@
+import os
+import time
+from collections import OrderedDict
+
+'''
+    Cache em memória (LRU + TTL) para as buscas de entidades por id.
+    Cada processo mantém o seu próprio cache, portanto o TTL limita o tempo em que
+    outro worker pode servir um documento desatualizado após uma escrita.
+    Cada chave tem uma geração, alterada por invalidate() e clear(). A leitura captura a geração antes
+    de consultar o banco e a informa em set(); se houve uma escrita durante a consulta, o documento
+    lido (possivelmente anterior à escrita) não é armazenado.
+'''
+
+# Configuração padrão por coleção (max_size = 0 desativa o cache)
+CACHE_CONFIGS = {
+    "plans": {"max_size": 1000, "ttl": 300},
+    "workouts": {"max_size": 1000, "ttl": 300},
+    "exercises": {"max_size": 5000, "ttl": 300},
+    "users": {"max_size": 0, "ttl": 0},  # Nunca armazenado: contém senha, cpf e endereço
+}
+
+# Coleções que nunca são armazenadas, independente das variáveis de ambiente
+UNCACHED_COLLECTIONS = {"users"}
+
+class TTLCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.epoch = 0
+        self.generations = {}
+
+    # Geração atual de uma chave, capturada antes da consulta ao banco
+    def generation(self, key):
+        return self.epoch, self.generations.get(key, 0)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, generation=None):
+        if self.max_size <= 0:
+            return
+
+        # A chave foi invalidada durante a consulta
+        if generation is not None and generation != self.generation(key):
+            return
+
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        if self.entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+        # Limita as gerações guardadas; trocar a época descarta apenas os set() das consultas em andamento
+        if len(self.generations) >= max(self.max_size, 1):
+            self.epoch += 1
+            self.generations.clear()
+        else:
+            self.generations[key] = self.generations.get(key, 0) + 1
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.epoch += 1
+        self.generations.clear()
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+caches = {}
+
+# Retorna o cache de uma coleção, permitindo sobrescrever a configuração por variáveis de ambiente
+# (ex.: CACHE_PLANS_MAX_SIZE=5000, CACHE_PLANS_TTL=60)
+def get_cache(collection):
+    if collection not in caches:
+        config = CACHE_CONFIGS.get(collection, {"max_size": 0, "ttl": 0})
+        max_size = int(os.getenv(f"CACHE_{collection.upper()}_MAX_SIZE", config["max_size"]))
+        ttl = float(os.getenv(f"CACHE_{collection.upper()}_TTL", config["ttl"]))
+
+        if collection in UNCACHED_COLLECTIONS:
+            max_size = 0
+
+        caches[collection] = TTLCache(max_size, ttl)
+
+    return caches[collection]
+
+# Estatísticas de todos os caches
+def get_cache_stats():
+    return {collection: cache.stats() for collection, cache in caches.items()}
@@ -0,0 +1,103 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Response
+from database import db
+from utils.single_flight import forget_flights
+
+'''
+    Requisições condicionais (ETag / Last-Modified). Rotas por id usam o _id e o updated_at
+    (ou created_at) do documento; listagens usam a versão da coleção, mantida na coleção
+    "counters" ({"_id": "version:<coleção>", "value": <versão>, "updated_at": <data>}) e
+    incrementada pelas rotas de escrita. Assim a listagem pode responder 304 sem consultar a coleção.
+    As datas são gravadas em UTC com fuso (datetime.now(timezone.utc)); o MongoDB as devolve sem fuso,
+    ainda em UTC, e as_utc as normaliza antes de formatar ou comparar.
+'''
+
+# Chave da versão de uma coleção
+def version_key(collection):
+    return f"version:{collection}"
+
+# Incrementa a versão de uma coleção após uma escrita. As leituras coalescidas em andamento são
+# esquecidas antes da resposta da escrita, preservando a leitura das próprias escritas do cliente
+async def bump_version(collection):
+    forget_flights(collection)
+    await db.counters.update_one(
+        {"_id": version_key(collection)},
+        {"$inc": {"value": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+# Lê a versão de uma coleção. A leitura não é coalescida: uma versão anterior a uma escrita
+# resultaria em 304 para uma listagem alterada
+async def get_version(collection):
+    version = await db.counters.find_one({"_id": version_key(collection)})
+    if not version:
+        return 0, None
+
+    return version["value"], as_utc(version.get("updated_at"))
+
+# Parâmetros da requisição normalizados, já que alteram a representação (ex.: fields, filtros)
+def request_variant(request):
+    return "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+
+# ETag a partir das partes que identificam uma representação
+def make_etag(*parts):
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+# Data em UTC com fuso. Datas sem fuso são as lidas do MongoDB, que as armazena em UTC
+def as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+
+    return value.astimezone(timezone.utc)
+
+# Data no formato HTTP
+def http_date(value):
+    return format_datetime(as_utc(value), usegmt=True)
+
+# Validadores de um documento
+def document_validators(request, document):
+    last_modified = as_utc(document.get("updated_at") or document.get("created_at"))
+    etag = make_etag(document["_id"], last_modified.isoformat() if last_modified else "", request_variant(request))
+    return etag, last_modified
+
+# Validadores de uma listagem
+async def list_validators(request, collection):
+    version, last_modified = await get_version(collection)
+    etag = make_etag(collection, version, request_variant(request))
+    return etag, last_modified
+
+# Cabeçalhos de validação enviados nas respostas 200 e 304
+def validator_headers(etag, last_modified=None):
+    headers = {"ETag": etag}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+
+    return headers
+
+# Verifica If-None-Match (prioritário) e If-Modified-Since
+def is_not_modified(request, etag, last_modified=None):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = as_utc(parsedate_to_datetime(if_modified_since))
+        except (TypeError, ValueError):
+            return False
+
+        # Datas HTTP têm precisão de segundos
+        return as_utc(last_modified).replace(microsecond=0) <= since
+
+    return False
+
+# Resposta 304 sem corpo
+def not_modified_response(headers):
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from database import db
+
+'''
+    Contadores mantidos na coleção "counters" para as rotas de quantidade por relacionamento.
+    Cada documento tem o formato {"_id": "<coleção>:<campo>:<id>", "value": <quantidade>} e é
+    atualizado com $inc pelas rotas de criação e exclusão.
+    Para (re)construir os contadores a partir dos dados existentes: python -m utils.counters
+'''
+
+# Campos de relacionamento contados em cada coleção
+COUNTED_RELATIONS = {
+    "user_plans": ["seller_id", "buyer_id"],
+    "plan_workouts": ["plan_id"],
+    "exercises": ["workout_id"],
+}
+
+# Chave do contador de documentos de uma coleção que referenciam um id
+def counter_key(collection, field, id):
+    return f"{collection}:{field}:{id}"
+
+# Chaves dos contadores afetados por um documento
+def document_counter_keys(collection, document):
+    return [counter_key(collection, field, document[field]) for field in COUNTED_RELATIONS[collection] if document.get(field)]
+
+# Soma um valor a cada contador informado
+async def increment_counters(amounts):
+    operations = [UpdateOne({"_id": key}, {"$inc": {"value": amount}}, upsert=True) for key, amount in amounts.items() if amount]
+    if operations:
+        await db.counters.bulk_write(operations, ordered=False)
+
+# Registra a criação (amount = 1) ou exclusão (amount = -1) de um documento
+async def count_document(collection, document, amount=1):
+    await increment_counters({key: amount for key in document_counter_keys(collection, document)})
+
+# Desconta os documentos que serão removidos por uma exclusão em massa
+async def discount_matching(collection, query):
+    fields = COUNTED_RELATIONS[collection]
+    pipeline = [
+        {"$match": query},
+        {"$group": {"_id": {field: f"${field}" for field in fields}, "value": {"$sum": 1}}}
+    ]
+
+    amounts = {}
+    async for group in db[collection].aggregate(pipeline):
+        for field, id in group["_id"].items():
+            if id:
+                key = counter_key(collection, field, id)
+                amounts[key] = amounts.get(key, 0) - group["value"]
+
+    await increment_counters(amounts)
+
+# Lê o valor de um contador
+async def get_counter(collection, field, id):
+    counter = await db.counters.find_one({"_id": counter_key(collection, field, id)})
+    return counter["value"] if counter else 0
+
+# Reconstrói os contadores de uma coleção a partir dos documentos existentes
+async def reconcile_collection(collection, field, reconciled_at):
+    prefix = counter_key(collection, field, "")
+    pipeline = [
+        {"$match": {field: {"$exists": True, "$ne": None}}},
+        {"$group": {"_id": {"$concat": [prefix, {"$toString": f"${field}"}]}, "value": {"$sum": 1}}},
+        {"$set": {"reconciled_at": reconciled_at}},
+        {"$merge": {"into": "counters", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+    await db[collection].aggregate(pipeline).to_list(length=None)
+
+    # Remove contadores de ids que não possuem mais documentos
+    await db.counters.delete_many({"_id": {"$regex": f"^{prefix}"}, "reconciled_at": {"$lt": reconciled_at}})
+
+# Reconstrói todos os contadores
+async def reconcile_counters():
+    reconciled_at = datetime.now(timezone.utc)
+    await asyncio.gather(*[
+        reconcile_collection(collection, field, reconciled_at)
+        for collection, fields in COUNTED_RELATIONS.items()
+        for field in fields
+    ])
+
+if __name__ == "__main__":
+    asyncio.run(reconcile_counters())
+    print("Contadores reconstruídos com sucesso")
@@ -12,7 +12,8 @@ def generate_logs():
         "workouts.log",
         "plans.log",
         "plan_workouts.log",
-        "user_plans.log"
+        "user_plans.log",
+        "database.log"
     ]
     
     print("Gerando arquivos de log...");
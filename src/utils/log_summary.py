@@ -0,0 +1,55 @@
+import logging
+import time
+
+'''
+    Política de registro dos dados recebidos e dos resultados por logger:
+    - summary: registra apenas quantidade, ids (e ids referenciados, no caso dos dados recebidos) e latência
+    - full: registra os documentos completos
+    Senha e CPF nunca são registrados, em nenhuma política.
+'''
+
+PAYLOAD_POLICIES = {}
+
+# Campos omitidos dos registros em qualquer política
+SENSITIVE_FIELDS = {"password", "cpf"}
+
+# Campos de identificação registrados dos dados recebidos na política summary
+KEY_FIELDS = ("_id", "seller_id", "buyer_id", "plan_id", "workout_id")
+
+def is_full(logger):
+    return PAYLOAD_POLICIES.get(logger.name, "summary") == "full"
+
+# Documento sem os campos sensíveis
+def redact_sensitive(document):
+    return {key: value for key, value in document.items() if key not in SENSITIVE_FIELDS}
+
+# Registra os dados recebidos por uma rota de escrita (modelo do Pydantic) de acordo com a política do logger
+def log_payload(logger, message, payload, id=None):
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    document = payload.dict(by_alias=True, exclude_none=True)
+    if id:
+        document["_id"] = id
+
+    if is_full(logger):
+        logger.info('%s: %s', message, redact_sensitive(document))
+    else:
+        keys = " ".join(f"{key}={document[key]}" for key in KEY_FIELDS if key in document)
+        logger.info('%s: %s', message, keys or '-')
+
+# Registra o resultado de uma operação de acordo com a política do logger
+def log_documents(logger, message, documents, started_at=None):
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    if isinstance(documents, dict):
+        documents = [documents]
+
+    latency_ms = (time.perf_counter() - started_at) * 1000 if started_at else 0.0
+
+    if is_full(logger):
+        logger.info('%s: %s (latency_ms=%.1f)', message, [redact_sensitive(document) for document in documents], latency_ms)
+    else:
+        ids = [str(document.get("_id")) for document in documents]
+        logger.info('%s: count=%d ids=%s latency_ms=%.1f', message, len(documents), ids, latency_ms)
@@ -0,0 +1,246 @@
+import threading
+import time
+from pymongo import monitoring
+
+'''
+    Métricas da aplicação no formato de texto do Prometheus (rota /metrics).
+    - HTTP: quantidade de requisições, latência e tamanho das respostas por método e modelo de rota
+      (ex.: /plans/{id}), registrados pelo MetricsMiddleware
+    - Serialização: tempo de renderização das respostas JSON (MongoJSONResponse)
+    - MongoDB: latência, quantidade e documentos retornados/afetados por coleção e comando
+      (CommandMetrics) e estado do pool de conexões por servidor (PoolMetrics), registrados pelos
+      listeners do pymongo passados ao AsyncIOMotorClient em database.py
+    Os listeners do pymongo são chamados nas threads do Motor, por isso o registro usa um lock.
+'''
+
+# Limites dos histogramas de latência (segundos) e de tamanho (bytes)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+class Metric:
+    def __init__(self, name, kind, help, labels=()):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def label_text(self, values, extra=()):
+        pairs = list(zip(self.labels, values)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = [(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in pairs]
+        return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, "counter", help, labels)
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        with self.lock:
+            values = list(self.values.items())
+        return self.header() + [f"{self.name}{self.label_text(labels)} {value}" for labels, value in values]
+
+class Gauge(Counter):
+    def __init__(self, name, help, labels=()):
+        Metric.__init__(self, name, "gauge", help, labels)
+
+    def set(self, *labels, value):
+        with self.lock:
+            self.values[labels] = value
+
+class Histogram(Metric):
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, "histogram", help, labels)
+        self.buckets = buckets
+
+    def observe(self, *labels, value):
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][index] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def render(self):
+        with self.lock:
+            values = [(labels, list(entry["buckets"]), entry["sum"], entry["count"]) for labels, entry in self.values.items()]
+
+        lines = self.header()
+        for labels, buckets, total, count in values:
+            cumulative = 0
+            for bound, amount in zip(self.buckets, buckets):
+                cumulative += amount
+                lines.append(f"{self.name}_bucket{self.label_text(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{self.label_text(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{self.label_text(labels)} {total}")
+            lines.append(f"{self.name}_count{self.label_text(labels)} {count}")
+        return lines
+
+http_requests = Counter("http_requests_total", "HTTP requests by method, route template and status", ("method", "route", "status"))
+http_duration = Histogram("http_request_duration_seconds", "HTTP request latency until the last response byte", ("method", "route"))
+http_response_size = Histogram("http_response_size_bytes", "HTTP response body size", ("method", "route"), buckets=SIZE_BUCKETS)
+http_in_progress = Gauge("http_requests_in_progress", "HTTP requests being processed", ("method",))
+render_duration = Histogram("http_response_render_seconds", "Time spent serializing JSON responses")
+mongo_commands = Counter("mongodb_commands_total", "MongoDB commands by collection, command and outcome", ("collection", "command", "status"))
+mongo_duration = Histogram("mongodb_command_duration_seconds", "MongoDB command latency reported by the driver", ("collection", "command"))
+mongo_documents = Counter("mongodb_command_documents_total", "Documents returned or affected by MongoDB commands", ("collection", "command"))
+pool_connections = Gauge("mongodb_pool_connections", "Open connections of the MongoDB connection pool", ("address",))
+pool_checked_out = Gauge("mongodb_pool_checked_out_connections", "Connections in use of the MongoDB connection pool", ("address",))
+pool_waiting = Gauge("mongodb_pool_waiting_operations", "Operations waiting for a MongoDB connection", ("address",))
+pool_wait_duration = Histogram("mongodb_pool_wait_seconds", "Time waiting to check out a MongoDB connection", ("address",))
+pool_clears = Counter("mongodb_pool_clears_total", "MongoDB connection pool clears", ("address",))
+
+METRICS = [
+    http_requests, http_duration, http_response_size, http_in_progress, render_duration,
+    mongo_commands, mongo_duration, mongo_documents,
+    pool_connections, pool_checked_out, pool_waiting, pool_wait_duration, pool_clears,
+]
+
+# Texto de todas as métricas no formato de exposição do Prometheus
+def render_metrics():
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+# Modelo da rota atendida (definido pelo roteador do FastAPI em scope["route"]). Requisições sem
+# rota correspondente são agrupadas para não criar uma série por caminho
+def route_template(scope):
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started_at = time.perf_counter()
+        response = {"status": 500, "size": 0, "recorded": False}
+
+        def record():
+            if response["recorded"]:
+                return
+            response["recorded"] = True
+            route = route_template(scope)
+            http_requests.inc(method, route, str(response["status"]))
+            http_duration.observe(method, route, value=time.perf_counter() - started_at)
+            http_response_size.observe(method, route, value=response["size"])
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # A latência termina no último byte, sem contar as tarefas em segundo plano
+                    record()
+            await send(message)
+
+        http_in_progress.inc(method)
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            http_in_progress.inc(method, amount=-1)
+            record()
+
+# Comandos em que o nome da coleção não é o valor do próprio comando
+COLLECTION_FIELDS = {"getMore": "collection"}
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self.collections = {}
+
+    def started(self, event):
+        field = COLLECTION_FIELDS.get(event.command_name, event.command_name)
+        collection = event.command.get(field)
+        self.collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else "none"
+
+    def succeeded(self, event):
+        collection = self.collections.pop((event.connection_id, event.request_id), "none")
+        mongo_commands.inc(collection, event.command_name, "success")
+        mongo_duration.observe(collection, event.command_name, value=event.duration_micros / 1e6)
+
+        documents = reply_documents(event.reply)
+        if documents:
+            mongo_documents.inc(collection, event.command_name, amount=documents)
+
+    def failed(self, event):
+        collection = self.collections.pop((event.connection_id, event.request_id), "none")
+        mongo_commands.inc(collection, event.command_name, "failure")
+        mongo_duration.observe(collection, event.command_name, value=event.duration_micros / 1e6)
+
+# Quantidade de documentos retornados (cursores e findAndModify) ou afetados (escritas) por um comando
+def reply_documents(reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if "value" in reply:
+        return 1 if reply["value"] else 0
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def address(self, event):
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def pool_created(self, event):
+        pool_connections.set(self.address(event), value=0)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pool_clears.inc(self.address(event))
+
+    def pool_closed(self, event):
+        address = self.address(event)
+        pool_connections.set(address, value=0)
+        pool_checked_out.set(address, value=0)
+
+    def connection_created(self, event):
+        pool_connections.inc(self.address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_connections.inc(self.address(event), amount=-1)
+
+    def connection_check_out_started(self, event):
+        pool_waiting.inc(self.address(event))
+
+    def connection_check_out_failed(self, event):
+        address = self.address(event)
+        pool_waiting.inc(address, amount=-1)
+        if event.duration is not None:
+            pool_wait_duration.observe(address, value=event.duration)
+
+    def connection_checked_out(self, event):
+        address = self.address(event)
+        pool_waiting.inc(address, amount=-1)
+        pool_checked_out.inc(address)
+        if event.duration is not None:
+            pool_wait_duration.observe(address, value=event.duration)
+
+    def connection_checked_in(self, event):
+        pool_checked_out.inc(self.address(event), amount=-1)
+
+# Listeners registrados no cliente do MongoDB (database.py)
+MONGO_LISTENERS = [CommandMetrics(), PoolMetrics()]
@@ -0,0 +1,38 @@
+from bson import ObjectId
+from utils.projection import apply_projection
+
+'''
+    Busca de vários documentos por id (rotas POST /<coleção>/_mget). Os ids são consultados no cache
+    da coleção, quando existe, e os restantes são resolvidos com uma única consulta $in. Os documentos
+    são devolvidos na ordem dos ids informados (ids repetidos aparecem uma vez) e os ids inexistentes
+    ou inválidos são reportados em "missing".
+'''
+
+async def find_by_ids(collection, ids, projection=None, cache=None):
+    ids = list(dict.fromkeys(ids))
+    documents = {}
+
+    pending = []
+    generations = {}
+    for id in ids:
+        document = cache.get(id) if cache else None
+        if document is not None:
+            documents[id] = document
+        elif ObjectId.is_valid(id):
+            pending.append(ObjectId(id))
+            if cache:
+                generations[id] = cache.generation(id)
+
+    if pending:
+        # Com cache os documentos são buscados completos para serem armazenados; a projeção é aplicada depois
+        async for document in collection.find({"_id": {"$in": pending}}, None if cache else projection):
+            id = str(document["_id"])
+            documents[id] = document
+            if id in generations:
+                cache.set(id, document, generations[id])
+
+    results = [documents[id] for id in ids if id in documents]
+    if cache:
+        results = [apply_projection(document, projection) for document in results]
+
+    return {"results": results, "missing": [id for id in ids if id not in documents]}
@@ -0,0 +1,91 @@
+import base64
+from bson import json_util
+from bson.errors import BSONError
+from fastapi import HTTPException
+
+'''
+    Paginação por cursor (keyset): em vez de pular os documentos das páginas anteriores com skip,
+    a próxima página é buscada a partir do último par (campo de ordenação, _id) retornado,
+    o que permite ao MongoDB posicionar-se diretamente no índice.
+    O cursor guarda a ordenação em que foi gerado; cursores alterados, truncados ou de outra
+    ordenação são recusados com 400.
+'''
+
+# Ordenação registrada no cursor (None para a ordenação padrão por _id)
+def cursor_sort(sort_by=None, order_direction=None):
+    return [sort_by, order_direction] if sort_by and order_direction else None
+
+# Gera um cursor opaco a partir do último documento de uma página
+def encode_cursor(document, sort_by=None, order_direction=None):
+    sort = cursor_sort(sort_by, order_direction)
+    values = {"_id": document["_id"]}
+    if sort:
+        values[sort_by] = document.get(sort_by)
+
+    raw = json_util.dumps({"sort": sort, "values": values})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+# Recupera os valores de um cursor gerado por encode_cursor com a mesma ordenação
+def decode_cursor(cursor, sort_by=None, order_direction=None):
+    sort = cursor_sort(sort_by, order_direction)
+    try:
+        decoded = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if decoded["sort"] != sort:
+            raise ValueError('Cursor não corresponde à ordenação solicitada')
+
+        values = decoded["values"]
+        keys = ["_id", sort_by] if sort else ["_id"]
+        return {key: values[key] for key in keys}
+
+    except (ValueError, TypeError, KeyError, BSONError):
+        raise HTTPException(status_code=400, detail='Cursor inválido')
+
+# Monta o filtro que busca os documentos posteriores ao cursor
+def keyset_filter(cursor, sort_by=None, order_direction=None):
+    values = decode_cursor(cursor, sort_by, order_direction)
+
+    if not sort_by or not order_direction:
+        return {"_id": {"$gt": values["_id"]}}
+
+    operator = "$lt" if order_direction == -1 else "$gt"
+
+    return {"$or": [
+        {sort_by: {operator: values[sort_by]}},
+        {sort_by: values[sort_by], "_id": {operator: values["_id"]}}
+    ]}
+
+# Ordenação estável: o _id desempata documentos com o mesmo valor no campo ordenado
+def sort_keys(sort_by=None, order_direction=None):
+    if sort_by and order_direction:
+        return [(sort_by, order_direction), ("_id", order_direction)]
+
+    return [("_id", 1)]
+
+# Verifica se os filtros incluem uma busca textual ($text)
+def has_text_search(filters):
+    return any("$text" in filter for filter in filters)
+
+# Busca uma página por cursor (quando informado) ou por número de página.
+# Com relevance, buscas $text sem ordenação explícita são ordenadas pela relevância (textScore);
+# essa ordenação não é paginável por cursor, portanto nenhum próximo cursor é gerado.
+# A projeção deve manter o campo de ordenação, usado para gerar o próximo cursor.
+async def find_page(collection, filters, page, limit, sort_by=None, order_direction=None, cursor=None, relevance=False, projection=None):
+    if cursor:
+        filters = filters + [keyset_filter(cursor, sort_by, order_direction)]
+
+    ranked = relevance and not cursor and not (sort_by and order_direction)
+    sort = [("score", {"$meta": "textScore"}), ("_id", 1)] if ranked else sort_keys(sort_by, order_direction)
+
+    query = {"$and": filters} if filters else {}
+    documents = collection.find(query, projection).sort(sort)
+
+    if not cursor:
+        documents = documents.skip((page - 1) * limit)
+
+    documents = await documents.limit(limit).to_list(length=limit)
+
+    next_cursor = None
+    if len(documents) == limit and not ranked:
+        next_cursor = encode_cursor(documents[-1], sort_by, order_direction)
+
+    return documents, next_cursor
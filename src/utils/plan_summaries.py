@@ -0,0 +1,143 @@
+import asyncio
+import contextvars
+from datetime import datetime, timezone
+from bson import ObjectId
+from database import db
+
+'''
+    Read model "plan_summaries": um documento por plano com os dados do catálogo que antes exigiam
+    várias consultas (quantidade de treinos e exercícios, volume de treino, compradores e nome do vendedor).
+    As rotas de escrita agendam a atualização apenas dos planos afetados (BackgroundTasks), recalculada
+    por uma agregação que grava o resultado com $merge.
+    Para reconstruir todos os resumos: python -m utils.plan_summaries
+'''
+
+# Agregação dos resumos dos planos informados (todos quando plan_ids é None)
+def summary_pipeline(plan_ids=None, refreshed_at=None):
+    pipeline = []
+    if plan_ids is not None:
+        pipeline.append({"$match": {"_id": {"$in": plan_ids}}})
+
+    # Os ids de plan_workouts, exercises e user_plans são armazenados como string
+    pipeline += [
+        {
+            "$lookup": {
+                "from": "plan_workouts",
+                "let": {"plan_id": {"$toString": "$_id"}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$plan_id", "$$plan_id"]}}},
+                    {
+                        "$lookup": {
+                            "from": "exercises",
+                            "let": {"workout_id": "$workout_id"},
+                            "pipeline": [
+                                {"$match": {"$expr": {"$eq": ["$workout_id", "$$workout_id"]}}},
+                                {"$group": {
+                                    "_id": None,
+                                    "exercises": {"$sum": 1},
+                                    "volume": {"$sum": {"$multiply": ["$n_sections", "$n_reps", "$weight"]}}
+                                }}
+                            ],
+                            "as": "stats"
+                        }
+                    },
+                    {"$unwind": {"path": "$stats", "preserveNullAndEmptyArrays": True}},
+                    {"$group": {
+                        "_id": None,
+                        "workouts": {"$sum": 1},
+                        "exercises": {"$sum": {"$ifNull": ["$stats.exercises", 0]}},
+                        "volume": {"$sum": {"$ifNull": ["$stats.volume", 0]}}
+                    }}
+                ],
+                "as": "workout_stats"
+            }
+        },
+        {
+            "$lookup": {
+                "from": "user_plans",
+                "let": {"plan_id": {"$toString": "$_id"}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$and": [{"$eq": ["$plan_id", "$$plan_id"]}, {"$eq": ["$purchased", True]}]}}},
+                    {"$group": {"_id": "$buyer_id"}},
+                    {"$count": "count"}
+                ],
+                "as": "buyer_stats"
+            }
+        },
+        {
+            "$lookup": {
+                "from": "users",
+                "let": {"seller_id": {"$convert": {"input": "$seller_id", "to": "objectId", "onError": None}}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$seller_id"]}}},
+                    {"$project": {"name": 1}}
+                ],
+                "as": "seller"
+            }
+        },
+        {
+            "$project": {
+                "title": 1,
+                "type": 1,
+                "category": 1,
+                "price": 1,
+                "seller_id": 1,
+                "seller_name": {"$arrayElemAt": ["$seller.name", 0]},
+                "workouts": {"$ifNull": [{"$arrayElemAt": ["$workout_stats.workouts", 0]}, 0]},
+                "exercises": {"$ifNull": [{"$arrayElemAt": ["$workout_stats.exercises", 0]}, 0]},
+                "volume": {"$ifNull": [{"$arrayElemAt": ["$workout_stats.volume", 0]}, 0]},
+                "buyers": {"$ifNull": [{"$arrayElemAt": ["$buyer_stats.count", 0]}, 0]},
+                "refreshed_at": {"$literal": refreshed_at or datetime.now(timezone.utc)}
+            }
+        },
+        {"$merge": {"into": "plan_summaries", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+    return pipeline
+
+# Atualiza os resumos dos planos informados; planos inexistentes têm o resumo removido
+async def refresh_plan_summaries(plan_ids):
+    plan_ids = list({ObjectId(id) for id in plan_ids if ObjectId.is_valid(str(id))})
+    if not plan_ids:
+        return
+
+    await db.plans.aggregate(summary_pipeline(plan_ids)).to_list(length=None)
+
+    existing = await db.plans.find({"_id": {"$in": plan_ids}}, {"_id": 1}).to_list(length=None)
+    removed = set(plan_ids) - {plan["_id"] for plan in existing}
+    if removed:
+        await db.plan_summaries.delete_many({"_id": {"$in": list(removed)}})
+
+# Atualiza os resumos dos planos que contêm os treinos informados (escritas em exercícios)
+async def refresh_workout_summaries(workout_ids):
+    workout_ids = [str(id) for id in workout_ids if id]
+    if not workout_ids:
+        return
+
+    plan_ids = await db.plan_workouts.distinct("plan_id", {"workout_id": {"$in": workout_ids}})
+    await refresh_plan_summaries(plan_ids)
+
+# Atualiza os resumos dos planos de um vendedor (alteração do nome)
+async def refresh_seller_summaries(seller_id):
+    plans = await db.plans.find({"seller_id": str(seller_id)}, {"_id": 1}).to_list(length=None)
+    await refresh_plan_summaries([plan["_id"] for plan in plans])
+
+# Agenda uma atualização para depois da resposta; falhas são registradas no logger da rota
+def schedule_refresh(background_tasks, logger, refresh, *args):
+    async def task():
+        try:
+            # Executada em um contexto novo, sem o prazo (pymongo.timeout) da requisição que a agendou
+            await contextvars.Context().run(asyncio.ensure_future, refresh(*args))
+        except Exception as e:
+            logger.error('Erro ao atualizar resumos dos planos: %s', e)
+
+    background_tasks.add_task(task)
+
+# Reconstrói todos os resumos e remove os de planos excluídos
+async def rebuild_plan_summaries():
+    refreshed_at = datetime.now(timezone.utc)
+    await db.plans.aggregate(summary_pipeline(refreshed_at=refreshed_at)).to_list(length=None)
+    await db.plan_summaries.delete_many({"refreshed_at": {"$lt": refreshed_at}})
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_plan_summaries())
+    print("Resumos dos planos reconstruídos com sucesso")
@@ -0,0 +1,75 @@
+'''
+    Projeções do parâmetro fields. Apenas os campos solicitados são lidos pelo MongoDB e enviados
+    na resposta; sem fields, cada rota usa uma projeção padrão que mantém as listagens pequenas.
+    O campo password nunca pode ser solicitado.
+'''
+
+# Campos que podem ser solicitados em cada coleção, na ordem dos modelos (usada também nas colunas do CSV)
+ALLOWED_FIELDS = {
+    "users": ["_id", "name", "email", "cpf", "phone_number", "address", "plans_sold", "purchased_plans", "created_at", "updated_at"],
+    "plans": ["_id", "title", "description", "type", "category", "price", "seller_id", "created_at", "updated_at"],
+    "workouts": ["_id", "title", "description", "rest_time", "type", "category", "created_at", "updated_at"],
+    "exercises": ["_id", "title", "n_sections", "n_reps", "weight", "tutorial_url", "workout_id", "created_at", "updated_at"],
+}
+
+# Projeções padrão das listagens
+LIST_PROJECTIONS = {
+    "users": {"password": 0, "cpf": 0, "address": 0, "plans_sold": 0, "purchased_plans": 0},
+    "plans": {"description": 0},
+    "workouts": {"description": 0},
+    "exercises": None,
+}
+
+# Projeções padrão das buscas por id
+DETAIL_PROJECTIONS = {
+    "users": {"password": 0},
+    "plans": None,
+    "workouts": None,
+    "exercises": None,
+}
+
+# Projeções padrão dos usuários nas rotas de vendedores e compradores
+SELLER_PROJECTION = {"purchased_plans": 0, "password": 0, "cpf": 0, "address": 0}
+BUYER_PROJECTION = {"plans_sold": 0, "password": 0, "cpf": 0, "address": 0}
+
+# Projeção padrão dos planos incorporados às rotas de vendedores e compradores
+EMBEDDED_PLAN_PROJECTION = {"title": 1, "type": 1, "category": 1, "price": 1}
+
+# Converte uma lista de campos separados por vírgula em uma projeção do MongoDB.
+# Campos fora de allowed são ignorados; sem campos válidos é usada a projeção padrão da rota.
+# Campos em required são sempre incluídos (ex.: campo de ordenação usado pelo cursor).
+def build_projection(fields, allowed=None, default=None, required=()):
+    requested = [field.strip() for field in fields.split(",")] if fields else []
+    requested = [field for field in requested if field and (allowed is None or field in allowed)]
+
+    if not requested:
+        return dict(default) if default else None
+
+    projection = {field: 1 for field in requested}
+    for field in required:
+        if field:
+            projection[field] = 1
+
+    return projection
+
+# Verifica se um campo foi solicitado explicitamente em fields
+def is_requested(fields, field):
+    return bool(fields) and field in (requested.strip() for requested in fields.split(","))
+
+# Projeção de uma listagem da coleção
+def list_projection(collection, fields, required=()):
+    return build_projection(fields, ALLOWED_FIELDS[collection], LIST_PROJECTIONS[collection], required)
+
+# Projeção de uma busca por id da coleção
+def detail_projection(collection, fields, required=()):
+    return build_projection(fields, ALLOWED_FIELDS[collection], DETAIL_PROJECTIONS[collection], required)
+
+# Aplica uma projeção de campos de primeiro nível a um documento já carregado (ex.: vindo do cache)
+def apply_projection(document, projection):
+    if not projection:
+        return document
+
+    if any(projection.values()):
+        return {field: value for field, value in document.items() if field == "_id" or projection.get(field)}
+
+    return {field: value for field, value in document.items() if field not in projection}
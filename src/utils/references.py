@@ -0,0 +1,27 @@
+import asyncio
+from bson import ObjectId
+from fastapi import HTTPException
+from database import db
+
+# Retorna quais dos ids informados existem na coleção, lendo apenas o _id
+async def find_existing_ids(collection, ids):
+    documents = await db[collection].find({"_id": {"$in": list(ids)}}, {"_id": 1}).to_list(length=None)
+    return {document["_id"] for document in documents}
+
+# Verifica a existência dos documentos referenciados por uma escrita.
+# references: lista de (coleção, id, mensagem de erro). Ids de uma mesma coleção são
+# agrupados em uma única consulta $in e as coleções são consultadas em paralelo.
+async def validate_references(references, logger=None):
+    ids_by_collection = {}
+    for collection, id, _ in references:
+        ids_by_collection.setdefault(collection, set()).add(ObjectId(id))
+
+    collections = list(ids_by_collection)
+    results = await asyncio.gather(*[find_existing_ids(collection, ids_by_collection[collection]) for collection in collections])
+    existing = dict(zip(collections, results))
+
+    for collection, id, detail in references:
+        if ObjectId(id) not in existing[collection]:
+            if logger:
+                logger.warning('%s: %s', detail, id)
+            raise HTTPException(status_code=404, detail=detail)
@@ -0,0 +1,40 @@
+import time
+from datetime import datetime, timezone
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from utils.metrics import render_duration
+
+'''
+    Resposta JSON para documentos do MongoDB. O orjson serializa datetime nativamente e o
+    ObjectId é convertido para string durante a serialização, sem percorrer os documentos
+    em Python nem passar pelo jsonable_encoder do FastAPI (as rotas devem retornar a
+    resposta diretamente).
+    Documentos montados em memória (ex.: o documento recém-criado) passam por as_stored, para que as
+    datas tenham o mesmo formato das lidas do MongoDB.
+'''
+
+# Conversão dos tipos que o orjson não serializa nativamente
+def encode_mongo_types(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f'Tipo não serializável: {type(value).__name__}')
+
+# Valor como o MongoDB o armazena e devolve: datas em UTC, sem fuso e com precisão de milissegundos
+def as_stored(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, dict):
+        return {key: as_stored(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [as_stored(item) for item in value]
+    return value
+
+class MongoJSONResponse(JSONResponse):
+    def render(self, content):
+        started_at = time.perf_counter()
+        body = orjson.dumps(content, default=encode_mongo_types, option=orjson.OPT_NON_STR_KEYS)
+        render_duration.observe(value=time.perf_counter() - started_at)
+        return body
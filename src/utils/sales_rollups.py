@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timezone
+from database import db
+
+'''
+    Rollups diários de vendas na coleção "sales_rollups": um documento por (vendedor, dia, plano) com a
+    quantidade de vendas e a receita, atualizado com $inc quando uma compra é confirmada (ou excluída).
+    O preço e a categoria do plano são copiados para o user_plan no momento da compra, de modo que
+    alterações posteriores no plano não mudam o histórico.
+    As rotas de análise leem apenas os rollups do período, independentemente do tamanho do histórico.
+    Para reconstruir os rollups a partir das compras existentes: python -m utils.sales_rollups
+'''
+
+# Chave do rollup de um plano de um vendedor em um dia
+def rollup_key(seller_id, day, plan_id):
+    return f"{seller_id}:{day.strftime('%Y-%m-%d')}:{plan_id}"
+
+# Início do dia de uma data
+def start_of_day(value):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+# Registra uma compra confirmada (amount = 1) ou a exclusão de uma compra (amount = -1)
+async def record_sale(user_plan, amount=1, session=None):
+    if not user_plan.get("purchased") or not user_plan.get("purchased_at"):
+        return
+
+    day = start_of_day(user_plan["purchased_at"])
+    price = user_plan.get("price") or 0
+
+    await db.sales_rollups.update_one(
+        {"_id": rollup_key(user_plan["seller_id"], day, user_plan["plan_id"])},
+        {
+            "$inc": {"sales": amount, "revenue": price * amount},
+            "$set": {"category": user_plan.get("category")},
+            # rebuilt_at marca o rollup como posterior a uma reconstrução em andamento, que não deve removê-lo
+            "$setOnInsert": {"seller_id": user_plan["seller_id"], "plan_id": user_plan["plan_id"], "date": day, "rebuilt_at": datetime.now(timezone.utc)}
+        },
+        upsert=True,
+        session=session
+    )
+
+# Reconstrói os rollups a partir das compras confirmadas. Compras anteriores à cópia do preço
+# usam o preço e a categoria atuais do plano.
+async def rebuild_sales_rollups():
+    rebuilt_at = datetime.now(timezone.utc)
+    pipeline = [
+        {"$match": {"purchased": True, "purchased_at": {"$ne": None}}},
+        {
+            "$lookup": {
+                "from": "plans",
+                "let": {"plan_id": {"$convert": {"input": "$plan_id", "to": "objectId", "onError": None}}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$plan_id"]}}},
+                    {"$project": {"price": 1, "category": 1}}
+                ],
+                "as": "plan"
+            }
+        },
+        {"$set": {
+            "day": {"$dateTrunc": {"date": "$purchased_at", "unit": "day"}},
+            "price": {"$ifNull": ["$price", {"$ifNull": [{"$arrayElemAt": ["$plan.price", 0]}, 0]}]},
+            "category": {"$ifNull": ["$category", {"$arrayElemAt": ["$plan.category", 0]}]}
+        }},
+        {"$group": {
+            "_id": {"seller_id": "$seller_id", "day": "$day", "plan_id": "$plan_id"},
+            "sales": {"$sum": 1},
+            "revenue": {"$sum": "$price"},
+            "category": {"$last": "$category"}
+        }},
+        {"$project": {
+            "_id": {"$concat": [
+                "$_id.seller_id", ":",
+                {"$dateToString": {"date": "$_id.day", "format": "%Y-%m-%d"}}, ":",
+                "$_id.plan_id"
+            ]},
+            "seller_id": "$_id.seller_id",
+            "plan_id": "$_id.plan_id",
+            "date": "$_id.day",
+            "sales": 1,
+            "revenue": 1,
+            "category": 1,
+            "rebuilt_at": {"$literal": rebuilt_at}
+        }},
+        {"$merge": {"into": "sales_rollups", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+    await db.user_plans.aggregate(pipeline).to_list(length=None)
+
+    # Remove rollups sem compras correspondentes. Os criados por record_sale durante a reconstrução
+    # têm rebuilt_at posterior ao seu início e são mantidos
+    await db.sales_rollups.delete_many({"rebuilt_at": {"$lt": rebuilt_at}})
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_sales_rollups())
+    print("Rollups de vendas reconstruídos com sucesso")
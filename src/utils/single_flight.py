@@ -0,0 +1,93 @@
+import asyncio
+import orjson
+from utils.metrics import Counter, Gauge, METRICS
+
+'''
+    Coalescência de leituras idênticas (single-flight). Requisições concorrentes com a mesma chave
+    (rota + parâmetros normalizados) aguardam uma única consulta em andamento e compartilham o resultado,
+    inclusive exceções. A consulta é executada em uma tarefa protegida (asyncio.shield): o cancelamento
+    de uma requisição (ex.: cliente desconectado) não cancela a consulta aguardada pelas demais.
+    Os documentos retornados são compartilhados entre as requisições e não devem ser alterados,
+    como os documentos do cache. As escritas locais esquecem as leituras em andamento da coleção
+    (forget_flights), para que uma requisição iniciada após a escrita não receba um resultado anterior a ela.
+    Métricas: single_flight_calls_total{name, role="leader"|"follower"} e a razão de coalescência
+    (seguidores / total) em single_flight_coalescing_ratio, expostas em /metrics.
+'''
+
+flight_calls = Counter("single_flight_calls_total", "Reads executed (leader) or coalesced into an in-flight read (follower)", ("name", "role"))
+flight_ratio = Gauge("single_flight_coalescing_ratio", "Fraction of reads served by an in-flight identical read", ("name",))
+flight_in_progress = Gauge("single_flight_in_progress", "Distinct reads in flight", ("name",))
+METRICS.extend([flight_calls, flight_ratio, flight_in_progress])
+
+# Chave de uma leitura: rota e parâmetros já validados pelo FastAPI (tipos convertidos e valores padrão
+# preenchidos, independente da ordem da query string). A ordem das chaves é mantida, pois é significativa
+# em ordenações e pipelines
+def flight_key(route, *params):
+    return route + ":" + orjson.dumps(params, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self.calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, fetch):
+        task = self.calls.get(key)
+        if task is None:
+            self.leaders += 1
+            flight_calls.inc(self.name, "leader")
+            task = asyncio.ensure_future(fetch())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self.finish(key, done))
+            flight_in_progress.set(self.name, value=len(self.calls))
+        else:
+            self.followers += 1
+            flight_calls.inc(self.name, "follower")
+
+        flight_ratio.set(self.name, value=self.followers / (self.leaders + self.followers))
+        return await asyncio.shield(task)
+
+    def finish(self, key, task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        flight_in_progress.set(self.name, value=len(self.calls))
+
+        # Evita o aviso de exceção não recuperada quando todos os aguardantes foram cancelados
+        if not task.cancelled():
+            task.exception()
+
+    # Esquece as leituras em andamento; elas terminam normalmente para quem já as aguarda
+    def forget(self):
+        self.calls.clear()
+        flight_in_progress.set(self.name, value=0)
+
+    def stats(self):
+        total = self.leaders + self.followers
+        return {
+            "in_flight": len(self.calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalescing_ratio": self.followers / total if total else 0.0,
+        }
+
+flights = {}
+
+# Retorna o single-flight de um grupo de leituras (ex.: uma coleção)
+def get_single_flight(name):
+    if name not in flights:
+        flights[name] = SingleFlight(name)
+    return flights[name]
+
+# Grupos com leituras que dependem de outras coleções (ex.: /plans/{id}/full consulta os treinos do plano)
+DEPENDENT_FLIGHTS = {"plan_workouts": ("plans",), "workouts": ("plans",), "exercises": ("plans",)}
+
+# Esquece as leituras em andamento afetadas por uma escrita na coleção, já que podem ter começado antes dela
+def forget_flights(collection):
+    for name in (collection, *DEPENDENT_FLIGHTS.get(collection, ())):
+        if name in flights:
+            flights[name].forget()
+
+# Estatísticas de todos os grupos
+def get_single_flight_stats():
+    return {name: flight.stats() for name, flight in flights.items()}
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timezone
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid
+
+'''
+    Registro de consultas lentas. O SlowQueryListener acompanha os comandos find, aggregate e count do
+    cliente compartilhado (database.py) e, quando um deles ultrapassa SLOW_QUERY_MS, agenda no loop da
+    aplicação a execução de explain("executionStats") de uma cópia do comando (amostrada por
+    SLOW_QUERY_SAMPLE_RATE e limitada a SLOW_QUERY_MAX_PENDING explains simultâneos).
+    O resultado é gravado na coleção limitada (capped) "slow_queries" com o formato do filtro, sem os
+    valores (ex.: {"price": {"$gte": "?"}}), docsExamined/keysExamined e se houve COLLSCAN.
+    SLOW_QUERY_MS=0 desativa o registro.
+'''
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1"))
+SLOW_QUERY_MAX_PENDING = int(os.getenv("SLOW_QUERY_MAX_PENDING", "4"))
+SLOW_QUERIES_SIZE = int(os.getenv("SLOW_QUERIES_SIZE", str(16 * 1024 * 1024)))
+
+# Comandos acompanhados e a coleção onde os registros são gravados
+TRACKED_COMMANDS = {"find", "aggregate", "count"}
+SLOW_QUERIES_COLLECTION = "slow_queries"
+
+# Campos adicionados pelo driver que não fazem parte da consulta
+DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "startTransaction", "autocommit", "readConcern", "writeConcern", "maxTimeMS"}
+
+# Estágios que gravam dados e não podem ser executados pelo explain("executionStats")
+WRITE_STAGES = {"$merge", "$out"}
+
+# Formato de um valor sem os dados: as chaves (campos e operadores) são mantidas e os valores substituídos por "?"
+def redact(value):
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = redact(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+# Valores de uma chave em qualquer nível da resposta do explain
+def find_values(document, key):
+    if isinstance(document, dict):
+        for name, value in document.items():
+            if name == key:
+                yield value
+            yield from find_values(value, key)
+    elif isinstance(document, list):
+        for item in document:
+            yield from find_values(item, key)
+
+# Resumo da execução a partir da resposta do explain (find ou aggregate, com ou sem o estágio $cursor)
+def explain_summary(explain):
+    stages = list(find_values(explain, "stage"))
+    return {
+        "docs_examined": sum(value for value in find_values(explain, "totalDocsExamined") if isinstance(value, int)),
+        "keys_examined": sum(value for value in find_values(explain, "totalKeysExamined") if isinstance(value, int)),
+        "n_returned": next((value for value in find_values(explain, "nReturned") if isinstance(value, int)), None),
+        "collscan": "COLLSCAN" in stages,
+        "stages": list(dict.fromkeys(stage for stage in stages if isinstance(stage, str))),
+    }
+
+# Formato do comando gravado no registro
+def command_shape(command_name, command):
+    shape = {}
+    if command_name == "aggregate":
+        shape["pipeline"] = redact(command.get("pipeline", []))
+    else:
+        shape["filter"] = redact(command.get("filter", command.get("query", {})))
+    if "sort" in command:
+        shape["sort"] = dict(command["sort"])
+    if command.get("projection"):
+        shape["projection"] = dict(command["projection"])
+    return shape
+
+class SlowQueryListener(monitoring.CommandListener):
+    def __init__(self):
+        self.loop = None
+        self.db = None
+        self.logger = None
+        self.commands = {}
+        self.pending = set()
+
+    # Ativa o registro no loop da aplicação (chamado na inicialização); os registros são gravados em db
+    def start(self, loop, db, logger):
+        self.loop = loop
+        self.db = db
+        self.logger = logger
+
+    def started(self, event):
+        if self.loop is None or SLOW_QUERY_MS <= 0 or event.command_name not in TRACKED_COMMANDS:
+            return
+        if event.command.get(event.command_name) == SLOW_QUERIES_COLLECTION:
+            return
+        self.commands[(event.connection_id, event.request_id)] = event.command
+
+    def succeeded(self, event):
+        command = self.commands.pop((event.connection_id, event.request_id), None)
+        if command is None:
+            return
+
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < SLOW_QUERY_MS or random.random() >= SLOW_QUERY_SAMPLE_RATE:
+            return
+
+        # Os listeners são chamados nas threads do Motor; o explain é agendado no loop da aplicação
+        query = {key: value for key, value in command.items() if key not in DRIVER_FIELDS}
+        self.loop.call_soon_threadsafe(self.schedule, event.database_name, event.command_name, query, duration_ms)
+
+    def failed(self, event):
+        self.commands.pop((event.connection_id, event.request_id), None)
+
+    def schedule(self, database_name, command_name, query, duration_ms):
+        if len(self.pending) >= SLOW_QUERY_MAX_PENDING:
+            return
+
+        task = asyncio.ensure_future(self.record(database_name, command_name, query, duration_ms))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def record(self, database_name, command_name, query, duration_ms):
+        collection = query.get(command_name)
+        entry = {
+            "database": database_name,
+            "collection": collection,
+            "command": command_name,
+            "duration_ms": round(duration_ms, 3),
+            **command_shape(command_name, query),
+            "created_at": datetime.now(timezone.utc),
+        }
+
+        try:
+            if any(stage.keys() & WRITE_STAGES for stage in query.get("pipeline", []) if isinstance(stage, dict)):
+                entry["explain_error"] = "Pipeline com estágio de escrita"
+            else:
+                explain = await self.db.client[database_name].command({"explain": query, "verbosity": "executionStats"})
+                entry.update(explain_summary(explain))
+        except Exception as e:
+            entry["explain_error"] = str(e)
+
+        try:
+            await self.db[SLOW_QUERIES_COLLECTION].insert_one(entry)
+            self.logger.warning('Consulta lenta registrada: %s.%s duration_ms=%.1f collscan=%s', collection, command_name, duration_ms, entry.get("collscan"))
+        except Exception as e:
+            self.logger.error('Erro ao registrar consulta lenta: %s', e)
+
+# Cria a coleção limitada dos registros, caso ainda não exista. Uma falha não impede a inicialização
+async def ensure_slow_queries_collection(db, logger):
+    try:
+        await db.create_collection(SLOW_QUERIES_COLLECTION, capped=True, size=SLOW_QUERIES_SIZE)
+    except CollectionInvalid:
+        pass
+    except Exception as e:
+        logger.error('Erro ao criar a coleção de consultas lentas: %s', e)
+
+slow_query_listener = SlowQueryListener()